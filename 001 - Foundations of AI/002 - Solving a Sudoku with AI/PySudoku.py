@@ -1,49 +1,63 @@
+import argparse
 import os
-import pygame
+import random
 import sys
 
-sys.path.append(os.path.join("objects"))
+import pygame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "objects"))
 import SudokuSquare
 from utils import *
 from GameResources import *
 
+SIZE = 700, 700
+BACKGROUND = os.path.join(HERE, "images", "sudoku-board-bare.jpg")
+FORMATS = ('png', 'gif')
+
+
+def squares(values):
+    """Return the SudokuSquare of every box of the board, in row order"""
+    theSquares = []
+    startX, startY, editable, number = 0, 0, "N", 0
+    for y in range(9):
+        for x in range(9):
+            if x in (0, 1, 2):  startX = (x * 57) + 38
+            if x in (3, 4, 5):  startX = (x * 57) + 99
+            if x in (6, 7, 8):  startX = (x * 57) + 159
+
+            if y in (0, 1, 2):  startY = (y * 57) + 35
+            if y in (3, 4, 5):  startY = (y * 57) + 100
+            if y in (6, 7, 8):  startY = (y * 57) + 165
+            string_number = values[rows[y] + cols[x]]
+            if len(string_number) > 1 or string_number == '' or string_number == '.':
+                number = None
+            else:
+                number = int(string_number)
+            theSquares.append(SudokuSquare.SudokuSquare(number, startX, startY, editable, x, y))
+    return theSquares
+
+
+def draw_board(screen, background_image, values):
+    """Draw the board and the digits of `values` on `screen`"""
+    screen.blit(background_image, (0, 0))
+    for num in squares(values):
+        num.draw(screen)
+
 
 def play(values, result, history):
     assignments = reconstruct(result, history)
     pygame.init()
 
-    size = width, height = 700, 700
-    screen = pygame.display.set_mode(size)
+    screen = pygame.display.set_mode(SIZE)
 
-    background_image = pygame.image.load("./images/sudoku-board-bare.jpg").convert()
+    background_image = pygame.image.load(BACKGROUND).convert()
 
     clock = pygame.time.Clock()
 
     while True:
         pygame.event.pump()
-        theSquares = []
-        initXLoc = 0
-        initYLoc = 0
-        startX, startY, editable, number = 0, 0, "N", 0
-        for y in range(9):
-            for x in range(9):
-                if x in (0, 1, 2):  startX = (x * 57) + 38
-                if x in (3, 4, 5):  startX = (x * 57) + 99
-                if x in (6, 7, 8):  startX = (x * 57) + 159
-
-                if y in (0, 1, 2):  startY = (y * 57) + 35
-                if y in (3, 4, 5):  startY = (y * 57) + 100
-                if y in (6, 7, 8):  startY = (y * 57) + 165
-                string_number = values[rows[y] + cols[x]]
-                if len(string_number) > 1 or string_number == '' or string_number == '.':
-                    number = None
-                else:
-                    number = int(string_number)
-                theSquares.append(SudokuSquare.SudokuSquare(number, startX, startY, editable, x, y))
-
-        screen.blit(background_image, (0, 0))
-        for num in theSquares:
-            num.draw()
+        draw_board(screen, background_image, values)
 
         pygame.display.flip()
         pygame.display.update()
@@ -51,7 +65,7 @@ def play(values, result, history):
 
         if len(assignments) == 0:
             break
-        box, value = assignments.pop()
+        box, value = assignments.pop(0)
         values[box] = value
 
     # leave game showing until closed by user
@@ -60,3 +74,113 @@ def play(values, result, history):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 quit()
+
+
+def render(values, result, history, path, fmt='png', step=1, duration=200):
+    """Replay a recorded solve off-screen and save it as image frames
+
+    Unlike `play` this needs no window: the board is drawn on an off-screen
+    surface, with SDL's 'dummy' video driver unless another one is set, so it
+    runs in batch jobs without a display. It only reads the recorded history,
+    so the solver itself runs at full speed (see `solution.solve`).
+
+    Parameters
+    ----------
+    values(dict)
+        the starting board, a dictionary of the form {'box_name': '123456789', ...}
+
+    result(dict)
+        the solved board
+
+    history(History)
+        the assignments recorded while solving, see `utils.reconstruct`
+
+    path(string)
+        for 'png', a directory that receives frame_0000.png, frame_0001.png, ...;
+        for 'gif', the file name of the animation
+
+    fmt(string)
+        'png' (default) or 'gif', which requires Pillow
+
+    step(int)
+        draw a frame every `step` assignments; the first and last boards are
+        always drawn
+
+    duration(int)
+        display time of each GIF frame, in milliseconds
+
+    Returns
+    -------
+    list
+        The paths of the files written
+    """
+    if fmt not in FORMATS:
+        raise ValueError("Unknown format {!r}, expected one of {}".format(fmt, FORMATS))
+    if fmt == 'gif':
+        from PIL import Image
+    assignments = reconstruct(result, history)
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+
+    screen = pygame.Surface(SIZE)
+    background_image = pygame.image.load(BACKGROUND)
+    to_bytes = getattr(pygame.image, 'tobytes', None) or pygame.image.tostring
+
+    board = dict(values)
+    written, frames = [], []
+    if fmt == 'png':
+        os.makedirs(path, exist_ok=True)
+    for n in range(len(assignments) + 1):
+        if n:
+            box, value = assignments[n - 1]
+            board[box] = value
+        if n % step and n != len(assignments):
+            continue
+        draw_board(screen, background_image, board)
+        if fmt == 'png':
+            written.append(os.path.join(path, 'frame_{:04d}.png'.format(len(written))))
+            pygame.image.save(screen, written[-1])
+        else:
+            frame = Image.frombytes('RGB', SIZE, to_bytes(screen, 'RGB'))
+            # Every frame shares the palette of the first, which is much
+            # faster than letting each frame pick its own when saving
+            palette = frames[0] if frames else frame.quantize()
+            frames.append(frame.quantize(palette=palette, dither=Image.Dither.NONE))
+    if fmt == 'gif':
+        frames[0].save(path, save_all=True, append_images=frames[1:], duration=duration, loop=0)
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    """Solve a sample of puzzles from a file and render each replay, for batch reports"""
+    import solution
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('grids', help='file with one grid per line')
+    parser.add_argument('out', help='directory that receives the renders')
+    parser.add_argument('--sample', type=int, default=10, help='number of puzzles to render (default 10)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the sample')
+    parser.add_argument('--format', choices=FORMATS, default='gif')
+    parser.add_argument('--step', type=int, default=1, help='assignments per frame')
+    args = parser.parse_args(argv)
+
+    grids = list(solution.read_grids(args.grids))
+    sample = sorted(random.Random(args.seed).sample(range(len(grids)), min(args.sample, len(grids))))
+    for i in sample:
+        history = History()
+        result = solution.solve(grids[i], history=history)
+        if not result:
+            print('puzzle {} has no solution'.format(i))
+            continue
+        target = os.path.join(args.out, 'puzzle_{:04d}'.format(i))
+        if args.format == 'gif':
+            os.makedirs(args.out, exist_ok=True)
+            target += '.gif'
+        written = render(grid2values(grids[i]), result, history, target, args.format, args.step)
+        print('puzzle {}: {} assignments, {}'.format(i, len(history), target if args.format == 'gif' else
+                                                        '{} frames in {}'.format(len(written), target)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Vectorised constraint propagation for large batches of Sudoku puzzles.
+
+Holds N puzzles as an (N, boxes, digits) boolean candidate tensor and applies
+the eliminate and only choice strategies to every puzzle at once with NumPy:
+each strategy is a matrix product of the peer or unit membership matrix
+precomputed from the `Geometry` with the candidates of the whole batch.
+Puzzles that propagation alone does not finish fall back to the depth first
+search of the bitmask engine, starting from the propagated candidates.
+
+Requires NumPy, which the rest of the project does not.
+"""
+import numpy as np
+
+import bitboard
+from geometry import DIAGONAL
+
+_tables = {}
+
+
+def _geometry_tables(geometry):
+    """Return the (peers, membership) matrices of a geometry, built once
+
+    peers is a (boxes, boxes) 0/1 matrix and membership a (units, boxes) 0/1
+    matrix. They are float32 so that products go through BLAS, and counts
+    of at most 25 are exact.
+    """
+    if geometry not in _tables:
+        n_boxes = len(geometry.boxes)
+        peers = np.zeros((n_boxes, n_boxes), dtype=np.float32)
+        for i, box_peers in enumerate(geometry.peer_index):
+            peers[i, list(box_peers)] = 1
+        membership = np.zeros((len(geometry.unit_index), n_boxes), dtype=np.float32)
+        np.put_along_axis(membership, np.array(geometry.unit_index, dtype=np.intp), 1, axis=1)
+        _tables[geometry] = peers, membership
+    return _tables[geometry]
+
+
+def grids2candidates(grids, geometry=DIAGONAL):
+    """Convert grid strings into a boolean candidate tensor
+
+    Parameters
+    ----------
+    grids(sequence)
+        grid strings, '.' for empty boxes
+
+    geometry(Geometry)
+        the board the grids are played on
+
+    Returns
+    -------
+    numpy.ndarray
+        an (N, boxes, digits) boolean array, True where a digit is still possible
+    """
+    n_boxes = len(geometry.boxes)
+    if any(len(grid) != n_boxes for grid in grids):
+        raise ValueError("A {} grid has {} boxes".format(geometry.name, n_boxes))
+    codes = np.frombuffer(''.join(grids).encode('ascii'), dtype=np.uint8).reshape(len(grids), n_boxes)
+    lookup = np.full(256, -1, dtype=np.intp)
+    lookup[np.frombuffer(geometry.digits.encode('ascii'), dtype=np.uint8)] = np.arange(geometry.size)
+    digit = lookup[codes]
+    candidates = digit[..., None] == np.arange(geometry.size)
+    candidates[digit < 0] = True
+    return candidates
+
+
+def _count(planes):
+    """Return the (boxes, N) number of candidates of every box; a matrix product
+    is much faster than summing over the short digit axis"""
+    return planes @ np.ones(planes.shape[2], dtype=np.float32)
+
+
+def eliminate(planes, peers):
+    """Remove the digit of every solved box from its peers, in every puzzle
+
+    Parameters
+    ----------
+    planes(numpy.ndarray)
+        the candidates in box-major layout: a (boxes, N, digits) float32
+        array of 0/1, see `reduce_batch`; modified in place
+
+    peers(numpy.ndarray)
+        the (boxes, boxes) peer matrix of the geometry
+
+    Returns
+    -------
+    numpy.ndarray
+        The planes
+    """
+    n_boxes = len(planes)
+    solved = planes * (_count(planes) == 1).astype(np.float32)[..., None]
+    taken = (peers @ solved.reshape(n_boxes, -1)).reshape(planes.shape)
+    # Both are non-negative and the planes are 0/1, so this clears the taken candidates
+    np.minimum(planes, taken, out=taken)
+    planes -= taken
+    return planes
+
+
+def only_choice(planes, membership):
+    """Assign every digit that fits in a single box of a unit to that box, in every puzzle
+
+    Parameters
+    ----------
+    planes(numpy.ndarray)
+        the candidates in box-major layout, see `eliminate`; modified in place
+
+    membership(numpy.ndarray)
+        the (units, boxes) unit membership matrix of the geometry
+
+    Returns
+    -------
+    numpy.ndarray
+        The planes
+    """
+    flat = planes.reshape(len(planes), -1)
+    single = (membership @ flat == 1).astype(np.float32)
+    forced = membership.T @ single
+    np.minimum(flat, forced, out=forced)
+    forced = forced.reshape(planes.shape)
+    np.copyto(planes, forced, where=(_count(forced) > 0)[..., None])
+    return planes
+
+
+def reduce_batch(candidates, geometry=DIAGONAL):
+    """Apply eliminate and only choice to a batch until no puzzle changes
+
+    The strategies work on a box-major float32 copy of the candidates, so
+    that each one is a single matrix product over the whole batch. Puzzles
+    that stop changing, are solved or hit a contradiction drop out of the
+    working set, so late rounds only touch the puzzles still moving.
+
+    Parameters
+    ----------
+    candidates(numpy.ndarray)
+        an (N, boxes, digits) boolean array, modified in place
+
+    geometry(Geometry)
+        the board the puzzles are played on
+
+    Returns
+    -------
+    numpy.ndarray
+        an (N,) boolean array, False for the puzzles found to be unsolvable
+    """
+    peers, membership = _geometry_tables(geometry)
+    n_boxes = len(geometry.boxes)
+    planes = np.ascontiguousarray(candidates.transpose(1, 0, 2), dtype=np.float32)
+    valid = np.ones(len(candidates), dtype=bool)
+    # Candidates only ever disappear, so a puzzle changed iff its total dropped
+    totals = _count(planes).sum(axis=0)
+    active = np.arange(len(candidates))
+    while len(active):
+        work = only_choice(eliminate(planes[:, active], peers), membership)
+        planes[:, active] = work
+
+        # A box without candidates, or a digit without a place in some unit
+        box_counts = _count(work)
+        unit_counts = (membership @ work.reshape(n_boxes, -1)).reshape(len(membership), len(active), -1)
+        broken = (box_counts.min(axis=0) == 0) | (unit_counts.min(axis=0).min(axis=1) == 0)
+        valid[active[broken]] = False
+        new_totals = box_counts.sum(axis=0)
+        moving = (new_totals < totals[active]) & (new_totals > n_boxes) & ~broken
+        totals[active] = new_totals
+        active = active[moving]
+    candidates[...] = planes.transpose(1, 0, 2) > 0
+    return valid
+
+
+def candidates2masks(candidates):
+    """Convert one puzzle of a candidate tensor into the bitmask engine's list of masks"""
+    weights = 1 << np.arange(candidates.shape[-1], dtype=np.int64)
+    return [int(m) for m in candidates.astype(np.int64) @ weights]
+
+
+def solve_batch(grids, geometry=DIAGONAL, propagation='queue', value_order='ascending'):
+    """Solve a batch of Sudoku puzzles with vectorised propagation
+
+    Parameters
+    ----------
+    grids(sequence)
+        the grid strings to solve
+
+    geometry(Geometry)
+        the board the grids are played on
+
+    propagation(string)
+        the propagation mode of the bitmask search used for puzzles that
+        propagation alone does not solve
+
+    value_order(string)
+        the value order of that search, see `bitboard.VALUE_ORDERS`
+
+    Returns
+    -------
+    list
+        for each grid, the dictionary representation of its solution, or
+        False if it has none
+    """
+    if value_order not in bitboard.VALUE_ORDERS:
+        raise ValueError("Unknown value_order {!r}, expected one of {}".format(value_order, bitboard.VALUE_ORDERS))
+    grids = list(grids)
+    if not grids:
+        return []
+    candidates = grids2candidates(grids, geometry)
+    valid = reduce_batch(candidates, geometry)
+    solved = (candidates.sum(axis=2) == 1).all(axis=1) & valid
+    digits = candidates.argmax(axis=2)
+
+    results = []
+    for n in range(len(grids)):
+        if solved[n]:
+            results.append(dict(zip(geometry.boxes, (geometry.digits[d] for d in digits[n]))))
+        elif not valid[n]:
+            results.append(False)
+        else:
+            masks = bitboard.search(candidates2masks(candidates[n]), propagation, None, geometry,
+                                    value_order=value_order)
+            results.append(masks and bitboard.masks2values(masks, geometry))
+    return results
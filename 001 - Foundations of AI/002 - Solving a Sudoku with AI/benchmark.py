@@ -0,0 +1,320 @@
+"""Speed benchmark for the Sudoku solvers.
+
+Runs `solution.solve` (any engine and option combination) and the `search`
+of the first project (`001 - Applying AI to Sudoku/function.py`) over the
+puzzle corpora bundled in `puzzles/`, and reports puzzles per second, median
+and 99th percentile latency and peak traced memory for every solver/corpus
+pair. Reports can be saved as JSON and compared against a later run, e.g. to
+compare two commits:
+
+    python benchmark.py --save before.json
+    git checkout <other commit>
+    python benchmark.py --compare before.json
+
+or two engines side by side in a single run:
+
+    python benchmark.py --solver dict bitboard --propagation sweep queue
+
+The comparison exits with status 1 when any solver got slower than the
+baseline by more than `--tolerance`.
+"""
+import argparse
+import contextlib
+import importlib.util
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import solution
+from geometry import DIAGONAL, STANDARD
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PUZZLES_DIR = os.path.join(HERE, 'puzzles')
+LEGACY_DIR = os.path.join(HERE, os.pardir, '001 - Applying AI to Sudoku')
+
+# Corpus name -> the board its puzzles are played on
+CORPORA = {'easy': STANDARD, 'hard': STANDARD, 'diagonal': DIAGONAL}
+SOLVERS = ('dict', 'bitboard', 'function')
+
+
+def load_corpus(name):
+    """Return the grid strings of a bundled corpus, see `CORPORA`"""
+    return list(solution.read_grids(os.path.join(PUZZLES_DIR, name + '.txt')))
+
+
+def load_legacy():
+    """Import `function.py` from the first project
+
+    The module runs its classroom exercises (and prints) at import time and
+    does `from utils import *` on its own `utils.py`, so it is imported with
+    its directory on the path and its output discarded, and the `utils`
+    module of this project is put back afterwards.
+    """
+    saved = sys.modules.pop('utils', None)
+    sys.path.insert(0, LEGACY_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location('legacy_function', os.path.join(LEGACY_DIR, 'function.py'))
+        module = importlib.util.module_from_spec(spec)
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+            spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(LEGACY_DIR)
+        sys.modules.pop('utils', None)
+        if saved is not None:
+            sys.modules['utils'] = saved
+    return module
+
+
+def make_solver(name, **options):
+    """Return (label, solve, geometries) for a solver
+
+    Parameters
+    ----------
+    name(string)
+        one of `SOLVERS`: the 'dict' or 'bitboard' engine of `solution.solve`,
+        or 'function' for the first project's `search`
+
+    options
+        keyword arguments for `solution.solve` (propagation, backtracking,
+        ...), ignored by 'function'
+
+    Returns
+    -------
+    tuple
+        a label naming the solver and its options, a function mapping
+        (grid, geometry) to the solved values dictionary (or a false value),
+        and the geometries the solver can play on
+    """
+    if name not in SOLVERS:
+        raise ValueError("Unknown solver {!r}, expected one of {}".format(name, SOLVERS))
+    if name == 'function':
+        legacy = load_legacy()
+        null = open(os.devnull, 'w')
+
+        def solve(grid, geometry):
+            # The legacy reduce_puzzle prints on every sweep
+            with contextlib.redirect_stdout(null):
+                return legacy.search(legacy.grid_values_2(grid))
+
+        return name, solve, (STANDARD,)
+
+    solution._check_options(name, **options)
+
+    def solve(grid, geometry):
+        return solution.solve(grid, engine=name, geometry=geometry, **options)
+
+    label = '/'.join([name] + [str(value) for _, value in sorted(options.items()) if value])
+    return label, solve, (DIAGONAL,) if name == 'dict' else (STANDARD, DIAGONAL)
+
+
+def is_solution(grid, values, geometry):
+    """Return True if `values` solves `grid` on `geometry`"""
+    if not values:
+        return False
+    digits = sorted(geometry.digits)
+    return (all(v == '.' or values[box] == v for box, v in zip(geometry.boxes, grid)) and
+            all(sorted(values[box] for box in unit) == digits for unit in geometry.unitlist))
+
+
+def percentile(samples, q):
+    """Return the nearest-rank `q`th percentile of `samples`"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def run_benchmark(label, solve, grids, geometry, corpus='', repeat=3):
+    """Time a solver on a list of puzzles
+
+    Every puzzle is solved `repeat` times and its fastest time is kept, which
+    filters out most scheduling noise. Memory is measured in a separate pass,
+    as tracing slows the solvers down several times.
+
+    Parameters
+    ----------
+    label(string)
+        the name reported for the solver
+
+    solve(function)
+        maps (grid, geometry) to the solved values, see `make_solver`
+
+    grids(list)
+        the grid strings to solve
+
+    geometry(Geometry)
+        the board the grids are played on
+
+    corpus(string)
+        the name reported for the grids
+
+    repeat(int)
+        number of timed runs per puzzle
+
+    Returns
+    -------
+    dict
+        the solver and corpus names, the number of puzzles and of correct
+        solutions, puzzles per second, p50 / p99 latency in milliseconds and
+        the peak traced memory of any single puzzle in KiB
+    """
+    latencies = []
+    solved = 0
+    for grid in grids:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            values = solve(grid, geometry)
+            best = min(best, time.perf_counter() - start)
+        latencies.append(best)
+        solved += is_solution(grid, values, geometry)
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    peak = 0
+    for grid in grids:
+        tracemalloc.clear_traces()
+        baseline = tracemalloc.get_traced_memory()[0]
+        solve(grid, geometry)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    if not was_tracing:
+        tracemalloc.stop()
+
+    return {'solver': label, 'corpus': corpus, 'puzzles': len(grids), 'solved': solved,
+            'puzzles_per_sec': len(grids) / sum(latencies),
+            'p50_ms': 1000 * percentile(latencies, 50), 'p99_ms': 1000 * percentile(latencies, 99),
+            'peak_kib': peak / 1024}
+
+
+def run_all(solvers, corpora, repeat=3):
+    """Run every solver on every corpus it can play on
+
+    Parameters
+    ----------
+    solvers(list)
+        (label, solve, geometries) triples from `make_solver`
+
+    corpora(list)
+        names of bundled corpora, see `CORPORA`
+
+    Returns
+    -------
+    list
+        one `run_benchmark` result per solver and corpus
+    """
+    grids = dict((name, load_corpus(name)) for name in corpora)
+    results = []
+    for name in corpora:
+        for label, solve, geometries in solvers:
+            if CORPORA[name] in geometries:
+                results.append(run_benchmark(label, solve, grids[name], CORPORA[name], name, repeat))
+    return results
+
+
+def _commit():
+    """Return the current git commit, or None outside a git checkout"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_report(results):
+    """Wrap benchmark results with the commit and interpreter they were measured on"""
+    return {'commit': _commit(), 'python': platform.python_version(), 'results': results}
+
+
+def format_results(results):
+    """Return the results as a text table"""
+    lines = ['{:<10} {:<28} {:>7} {:>10} {:>9} {:>9} {:>10}'.format(
+        'corpus', 'solver', 'solved', 'puzzles/s', 'p50 ms', 'p99 ms', 'peak KiB')]
+    for r in results:
+        lines.append('{:<10} {:<28} {:>3}/{:<3} {:>10.1f} {:>9.2f} {:>9.2f} {:>10.1f}'.format(
+            r['corpus'], r['solver'], r['solved'], r['puzzles'], r['puzzles_per_sec'], r['p50_ms'], r['p99_ms'],
+            r['peak_kib']))
+    return '\n'.join(lines)
+
+
+def compare(baseline, results, tolerance=0.1):
+    """Compare results with a saved baseline report
+
+    Parameters
+    ----------
+    baseline(dict)
+        a report saved by an earlier run, see `make_report`
+
+    results(list)
+        the results of this run
+
+    tolerance(float)
+        the fraction of throughput a solver may lose before it counts as a regression
+
+    Returns
+    -------
+    tuple
+        the comparison as a text table, and the (corpus, solver) pairs that regressed
+    """
+    before = dict(((r['corpus'], r['solver']), r) for r in baseline['results'])
+    lines = ['baseline: {}'.format(baseline.get('commit') or 'unknown commit'),
+             '{:<10} {:<28} {:>12} {:>12} {:>8} {:>10} {:>10}'.format(
+                 'corpus', 'solver', 'before/s', 'after/s', 'speedup', 'p99 before', 'p99 after')]
+    regressions = []
+    for r in results:
+        key = (r['corpus'], r['solver'])
+        if key not in before:
+            continue
+        old = before[key]
+        speedup = r['puzzles_per_sec'] / old['puzzles_per_sec']
+        flag = ''
+        if speedup < 1 - tolerance or r['solved'] < old['solved']:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        lines.append('{:<10} {:<28} {:>12.1f} {:>12.1f} {:>7.2f}x {:>10.2f} {:>10.2f}{}'.format(
+            r['corpus'], r['solver'], old['puzzles_per_sec'], r['puzzles_per_sec'], speedup, old['p99_ms'],
+            r['p99_ms'], flag))
+    return '\n'.join(lines), regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--solver', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument('--corpus', nargs='+', choices=sorted(CORPORA), default=['easy', 'hard', 'diagonal'])
+    parser.add_argument('--propagation', nargs='+', choices=solution.PROPAGATIONS, default=['sweep'])
+    parser.add_argument('--backtracking', nargs='+', choices=solution.BACKTRACKINGS, default=['copy'])
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per puzzle, the fastest is kept')
+    parser.add_argument('--save', metavar='FILE', help='write the report as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='compare with a report saved by --save')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='throughput loss reported as a regression (default 0.1)')
+    args = parser.parse_args(argv)
+
+    solvers = []
+    for name in args.solver:
+        if name == 'function':
+            solvers.append(make_solver(name))
+            continue
+        for propagation, backtracking in itertools.product(args.propagation, args.backtracking):
+            solvers.append(make_solver(name, propagation=propagation, backtracking=backtracking))
+
+    results = run_all(solvers, args.corpus, args.repeat)
+    print(format_results(results))
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump(make_report(results), handle, indent=2)
+    if args.compare:
+        with open(args.compare) as handle:
+            table, regressions = compare(json.load(handle), results, args.tolerance)
+        print()
+        print(table)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,773 @@
+"""Bitmask engine for the Sudoku solver.
+
+The dictionary representation used in `solution.py` is convenient for the
+visualiser, but every strategy rebuilds candidate strings with `str.replace`.
+This module keeps the candidates of each box as an integer (bit `i` is set
+while the `i`-th digit is still possible) in a flat list of masks, indexed in
+the same row-major order as the geometry's boxes. Units and peers come from
+the precomputed index tables of a `geometry.Geometry`, so the strategies
+never touch box names. Every function takes the geometry as an argument
+and defaults to the 9×9 diagonal board of the project.
+
+The public entry point is `solve(grid)`, which honours the same contract as
+`solution.solve` and returns the same dictionary representation.
+"""
+from timeit import default_timer
+
+from geometry import DIAGONAL
+from strategies import PLUGINS
+
+DIGITS = DIAGONAL.digits
+ALL_DIGITS = DIAGONAL.all_digits
+DIGIT_MASK = DIAGONAL.digit_mask
+MASK_DIGITS = DIAGONAL.mask_digits
+BIT_COUNT = DIAGONAL.bit_count
+BOX_INDEX = DIAGONAL.box_index
+UNITS = DIAGONAL.unit_index
+UNITS_OF = DIAGONAL.units_of
+PEERS = DIAGONAL.peer_index
+
+VALUE_ORDERS = ('ascending', 'lcv')
+
+
+class SearchStats(object):
+    """Counters collected while solving a puzzle.
+
+    Attributes
+    ----------
+    nodes : int
+        Calls to the search function, i.e. boards reduced.
+
+    guesses : int
+        Digits tried on guessed boxes.
+
+    backtracks : int
+        Guesses that led to a contradiction.
+
+    max_depth : int
+        Longest chain of nested guesses.
+
+    propagation_rounds : int
+        Sweeps over the board ('sweep') or runs of the work queue ('queue').
+
+    strategy_time : dict
+        Seconds spent in each strategy, keyed by function name.
+
+    strategy_changes : dict
+        Boxes changed by each plug-in strategy, keyed by function name.
+
+    elapsed : float
+        Seconds spent in `solve`.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.guesses = 0
+        self.backtracks = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.propagation_rounds = 0
+        self.strategy_time = {}
+        self.strategy_changes = {}
+        self.elapsed = 0.
+
+    def timed(self, strategy, *args):
+        """Call `strategy(*args)` and add its running time to `strategy_time`"""
+        start = default_timer()
+        result = strategy(*args)
+        name = strategy.__name__
+        self.strategy_time[name] = self.strategy_time.get(name, 0.) + default_timer() - start
+        return result
+
+    def as_dict(self):
+        """Return the counters as a plain dictionary, e.g. for JSON reports"""
+        return {'nodes': self.nodes, 'guesses': self.guesses, 'backtracks': self.backtracks,
+                'max_depth': self.max_depth, 'propagation_rounds': self.propagation_rounds,
+                'strategy_time': dict(self.strategy_time), 'strategy_changes': dict(self.strategy_changes),
+                'elapsed': self.elapsed}
+
+    def __repr__(self):
+        return 'SearchStats({})'.format(', '.join('{}={!r}'.format(k, v) for k, v in self.as_dict().items()))
+
+
+def grid2masks(grid, geometry=DIAGONAL):
+    """Convert a grid string into a list of candidate masks.
+
+    Parameters
+    ----------
+    grid(string)
+        a string representing a sudoku grid, with '.' for empty boxes
+
+    geometry(Geometry)
+        the board the grid is laid out on
+
+    Returns
+    -------
+    list
+        A list of integers, one candidate mask per box
+    """
+    if len(grid) != len(geometry.boxes):
+        raise ValueError("A {} grid has {} boxes, got {}".format(geometry.name, len(geometry.boxes), len(grid)))
+    all_digits, digit_mask = geometry.all_digits, geometry.digit_mask
+    return [all_digits if val == '.' else digit_mask[val] for val in grid]
+
+
+def masks2values(masks, geometry=DIAGONAL):
+    """Convert a list of candidate masks into the dictionary representation.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    dict
+        a dictionary of the form {'box_name': '123456789', ...}
+    """
+    mask_digits = geometry.mask_digits
+    return dict((box, mask_digits[m]) for box, m in zip(geometry.boxes, masks))
+
+
+def values2masks(values, geometry=DIAGONAL):
+    """Convert the dictionary representation into a list of candidate masks.
+
+    Parameters
+    ----------
+    values(dict)
+        a dictionary of the form {'box_name': '123456789', ...}
+
+    geometry(Geometry)
+        the board the values belong to
+
+    Returns
+    -------
+    list
+        A list of integers, one candidate mask per box
+    """
+    masks = []
+    for box in geometry.boxes:
+        m = 0
+        for digit in values[box]:
+            m |= geometry.digit_mask[digit]
+        masks.append(m)
+    return masks
+
+
+def eliminate(masks, geometry=DIAGONAL):
+    """Remove the digit of every solved box from the candidates of its peers.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    list
+        The masks with the assigned values eliminated from peers
+    """
+    all_digits, bit_count, peers = geometry.all_digits, geometry.bit_count, geometry.peer_index
+    for i, m in enumerate(masks):
+        if bit_count[m] == 1:
+            keep = all_digits ^ m
+            for peer in peers[i]:
+                if masks[peer] & m:
+                    masks[peer] &= keep
+    return masks
+
+
+def only_choice(masks, geometry=DIAGONAL):
+    """Assign every digit that fits in exactly one box of a unit to that box.
+
+    A box that turns out to be the only place for two different digits of the
+    same unit cannot be completed, so it is emptied to flag the contradiction.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    list
+        The masks with all the only choices assigned
+    """
+    bit_count = geometry.bit_count
+    for unit in geometry.unit_index:
+        seen_once = seen_twice = 0
+        for i in unit:
+            m = masks[i]
+            seen_twice |= seen_once & m
+            seen_once |= m
+        singles = seen_once & ~seen_twice
+        if singles:
+            for i in unit:
+                m = masks[i] & singles
+                if m and m != masks[i]:
+                    masks[i] = m if bit_count[m] == 1 else 0
+    return masks
+
+
+def naked_twins(masks, geometry=DIAGONAL):
+    """Remove the digits of every pair of naked twins from the rest of the unit.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    list
+        The masks with the naked twins eliminated from their units
+    """
+    all_digits, bit_count = geometry.all_digits, geometry.bit_count
+    for unit in geometry.unit_index:
+        pairs = set()
+        twins = []
+        for i in unit:
+            m = masks[i]
+            if bit_count[m] == 2:
+                if m in pairs:
+                    twins.append(m)
+                else:
+                    pairs.add(m)
+        for twin in twins:
+            keep = all_digits ^ twin
+            for i in unit:
+                if masks[i] != twin and masks[i] & twin:
+                    masks[i] &= keep
+    return masks
+
+
+def propagate(masks, changed=None, geometry=DIAGONAL, trail=None):
+    """Apply eliminate, only choice and naked twins from a work queue.
+
+    Only the peers of boxes that just became solved and the units of boxes
+    whose candidates just changed are revisited, instead of the whole board.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    changed(iterable)
+        indices of the boxes changed since the masks were last propagated;
+        all boxes when omitted
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    trail(list)
+        when given, the index and previous mask of every box changed are
+        appended to it, see `undo`
+
+    Returns
+    -------
+    list or False
+        The propagated masks, or False if the puzzle is unsolvable
+    """
+    all_digits, bit_count = geometry.all_digits, geometry.bit_count
+    units, units_of, peers = geometry.unit_index, geometry.units_of, geometry.peer_index
+    if changed is None:
+        changed = range(len(masks))
+    solved = [i for i in changed if bit_count[masks[i]] == 1]
+    dirty = set(u for i in changed for u in units_of[i])
+
+    while solved or dirty:
+        while solved:
+            i = solved.pop()
+            digit = masks[i]
+            keep = all_digits ^ digit
+            for peer in peers[i]:
+                m = masks[peer]
+                if m & digit:
+                    if trail is not None:
+                        trail.append(peer)
+                        trail.append(m)
+                    m &= keep
+                    if not m:
+                        return False
+                    masks[peer] = m
+                    if bit_count[m] == 1:
+                        solved.append(peer)
+                    dirty.update(units_of[peer])
+        if not dirty:
+            break
+
+        unit = units[dirty.pop()]
+        seen_once = seen_twice = 0
+        pairs = set()
+        twins = []
+        for i in unit:
+            m = masks[i]
+            seen_twice |= seen_once & m
+            seen_once |= m
+            if bit_count[m] == 2:
+                if m in pairs:
+                    twins.append(m)
+                else:
+                    pairs.add(m)
+        if seen_once != all_digits:
+            return False
+
+        singles = seen_once & ~seen_twice
+        for i in unit:
+            m = masks[i]
+            single = m & singles
+            if single and single != m:
+                if bit_count[single] != 1:
+                    return False
+                if trail is not None:
+                    trail.append(i)
+                    trail.append(m)
+                masks[i] = single
+                solved.append(i)
+                dirty.update(units_of[i])
+
+        for twin in twins:
+            keep = all_digits ^ twin
+            for i in unit:
+                m = masks[i]
+                if m != twin and m & twin:
+                    if trail is not None:
+                        trail.append(i)
+                        trail.append(m)
+                    m &= keep
+                    if not m:
+                        return False
+                    masks[i] = m
+                    if bit_count[m] == 1:
+                        solved.append(i)
+                    dirty.update(units_of[i])
+    return masks
+
+
+def _record_changes(trail, before, masks):
+    """Append to `trail` the index and previous mask of every box that differs from `before`"""
+    for i, m in enumerate(before):
+        if m != masks[i]:
+            trail.append(i)
+            trail.append(m)
+
+
+def _run_plugins(masks, strategies, geometry, stats):
+    """Run the plug-in strategies once, returning the boxes they changed or False"""
+    changed = []
+    for strategy in strategies:
+        if stats is None:
+            found = strategy(masks, geometry)
+        else:
+            found = stats.timed(strategy, masks, geometry)
+        if found is False:
+            return False
+        if stats is not None:
+            name = strategy.__name__
+            stats.strategy_changes[name] = stats.strategy_changes.get(name, 0) + len(found)
+        changed.extend(found)
+    return changed
+
+
+def reduce_puzzle(masks, propagation='sweep', changed=None, geometry=DIAGONAL, strategies=(), stats=None,
+                  trail=None):
+    """Repeatedly apply all constraint strategies until no more boxes are solved.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    propagation(string)
+        'sweep' (default) reapplies every strategy to the whole board,
+        'queue' uses the incremental `propagate`
+
+    changed(iterable)
+        indices of the boxes changed since the last reduction, only used by 'queue'
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    strategies(sequence)
+        plug-in strategies (see `strategies.py`) applied after the built-in ones
+
+    stats(SearchStats)
+        collects propagation rounds and time per strategy when given
+
+    trail(list)
+        when given, every box changed is recorded on it, see `undo`
+
+    Returns
+    -------
+    list or False
+        The reduced masks, or False if the puzzle is unsolvable
+    """
+    if propagation == 'queue':
+        while True:
+            if stats is None:
+                masks = propagate(masks, changed, geometry, trail)
+            else:
+                stats.propagation_rounds += 1
+                masks = stats.timed(propagate, masks, changed, geometry, trail)
+            if masks is False or not strategies:
+                return masks
+            # Plug-ins write through plain item assignment, so their changes
+            # are found by comparing the board with a snapshot
+            before = masks[:] if trail is not None else None
+            changed = _run_plugins(masks, strategies, geometry, stats)
+            if trail is not None:
+                _record_changes(trail, before, masks)
+            if changed is False:
+                return False
+            if not changed:
+                return masks
+
+    bit_count = geometry.bit_count
+    solved_after = sum(1 for m in masks if bit_count[m] == 1)
+    while True:
+        solved_before = solved_after
+        # The sweeps write all over the board, so their changes are found by
+        # comparing it with a snapshot once per round
+        before = masks[:] if trail is not None else None
+        if stats is None:
+            eliminate(masks, geometry)
+            only_choice(masks, geometry)
+            naked_twins(masks, geometry)
+        else:
+            stats.propagation_rounds += 1
+            for strategy in (eliminate, only_choice, naked_twins):
+                stats.timed(strategy, masks, geometry)
+        found = strategies and _run_plugins(masks, strategies, geometry, stats)
+        if trail is not None:
+            _record_changes(trail, before, masks)
+        if found is False or 0 in masks:
+            return False
+        solved_after = sum(1 for m in masks if bit_count[m] == 1)
+        if solved_before == solved_after and not found:
+            return masks
+
+
+def _value_order(masks, candidate, geometry, value_order):
+    """Return the candidate digits of a box, as single-bit masks, in the order to try them
+
+    'ascending' tries the digits from smallest to largest, 'lcv' (least
+    constraining value) first tries the digits that fewest peers could take.
+    """
+    remaining = masks[candidate]
+    bits = []
+    while remaining:
+        bit = remaining & -remaining
+        remaining ^= bit
+        bits.append(bit)
+    if value_order == 'lcv':
+        peers = geometry.peer_index[candidate]
+        bits.sort(key=lambda bit: sum(1 for peer in peers if masks[peer] & bit))
+    return bits
+
+
+def _fewest_candidates(masks, geometry):
+    """Return the index of the first unsolved box with the fewest candidates, or None"""
+    bit_count = geometry.bit_count
+    candidate, fewest = None, geometry.size + 1
+    for i, m in enumerate(masks):
+        count = bit_count[m]
+        if 1 < count < fewest:
+            candidate, fewest = i, count
+            if count == 2:
+                break
+    return candidate
+
+
+def undo(masks, trail, mark):
+    """Restore every box recorded on `trail` since `mark`, its length at the time
+
+    The trail is a flat list of alternating box indices and previous masks,
+    appended to by `propagate` and `reduce_puzzle`. The recorded masks are
+    the int objects the board held, so recording a change allocates nothing
+    beyond the growth of the trail itself.
+    """
+    # Newest first, so that a box changed twice ends up with its oldest mask
+    entries = reversed(trail[mark:])
+    for m, i in zip(entries, entries):
+        masks[i] = m
+    del trail[mark:]
+
+
+def search_trail(masks, propagation='sweep', changed=None, geometry=DIAGONAL, strategies=(),
+                 value_order='ascending', stats=None, trail=None):
+    """Depth first search on a single board, undoing guesses from its trail.
+
+    The board stays a plain list, so that propagation reads and writes it at
+    full speed, and every change is recorded on the side in `trail`.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks; searched in place when `trail` is given,
+        otherwise a copy is searched
+
+    propagation(string)
+        the propagation mode passed on to `reduce_puzzle`
+
+    changed(iterable)
+        indices of the boxes changed since the last reduction, all boxes when omitted
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    strategies(sequence)
+        plug-in strategies passed on to `reduce_puzzle`
+
+    value_order(string)
+        the order in which the digits of the guessed box are tried, see `VALUE_ORDERS`
+
+    stats(SearchStats)
+        collects search counters when given
+
+    trail(list)
+        the undo trail of `masks`, see `undo`
+
+    Returns
+    -------
+    list or False
+        The solved masks, or False if no solution exists
+    """
+    if stats is not None:
+        stats.nodes += 1
+    if trail is None:
+        # Nothing before the first guess is ever undone, so the first
+        # reduction is not recorded
+        masks = list(masks)
+        if reduce_puzzle(masks, propagation, changed, geometry, strategies, stats) is False:
+            return False
+        trail = []
+    elif reduce_puzzle(masks, propagation, changed, geometry, strategies, stats, trail) is False:
+        return False
+
+    candidate = _fewest_candidates(masks, geometry)
+    if candidate is None:
+        return masks
+
+    for bit in _value_order(masks, candidate, geometry, value_order):
+        mark = len(trail)
+        trail.append(candidate)
+        trail.append(masks[candidate])
+        masks[candidate] = bit
+        if stats is not None:
+            stats.guesses += 1
+            stats.depth += 1
+            stats.max_depth = max(stats.max_depth, stats.depth)
+        attempt = search_trail(masks, propagation, (candidate,), geometry, strategies, value_order, stats, trail)
+        if stats is not None:
+            stats.depth -= 1
+        if attempt:
+            return masks
+        if stats is not None:
+            stats.backtracks += 1
+        undo(masks, trail, mark)
+    return False
+
+
+def search(masks, propagation='sweep', changed=None, geometry=DIAGONAL, strategies=(), value_order='ascending',
+           stats=None):
+    """Depth first search over the box with the fewest candidates.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks
+
+    propagation(string)
+        the propagation mode passed on to `reduce_puzzle`
+
+    changed(iterable)
+        indices of the boxes changed since the last reduction, all boxes when omitted
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    strategies(sequence)
+        plug-in strategies passed on to `reduce_puzzle`
+
+    value_order(string)
+        the order in which the digits of the guessed box are tried, see `VALUE_ORDERS`
+
+    stats(SearchStats)
+        collects search counters when given
+
+    Returns
+    -------
+    list or False
+        The masks with all boxes assigned, or False if no solution exists
+    """
+    if stats is not None:
+        stats.nodes += 1
+    masks = reduce_puzzle(masks, propagation, changed, geometry, strategies, stats)
+    if masks is False:
+        return False
+
+    candidate = _fewest_candidates(masks, geometry)
+    if candidate is None:
+        return masks
+
+    for bit in _value_order(masks, candidate, geometry, value_order):
+        masks_case = masks[:]
+        masks_case[candidate] = bit
+        if stats is not None:
+            stats.guesses += 1
+            stats.depth += 1
+            stats.max_depth = max(stats.max_depth, stats.depth)
+        attempt = search(masks_case, propagation, (candidate,), geometry, strategies, value_order, stats)
+        if stats is not None:
+            stats.depth -= 1
+        if attempt:
+            return attempt
+        if stats is not None:
+            stats.backtracks += 1
+    return False
+
+
+def iter_search(masks, propagation='sweep', changed=None, geometry=DIAGONAL, strategies=(), value_order='ascending',
+                stats=None):
+    """Depth first search that yields every solution instead of stopping at the first
+
+    Explores the same tree in the same order as `search`, so the first
+    solution yielded is the one `search` returns; closing the generator early
+    abandons the rest of the tree.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks
+
+    propagation(string)
+        the propagation mode passed on to `reduce_puzzle`
+
+    changed(iterable)
+        indices of the boxes changed since the last reduction, all boxes when omitted
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    strategies(sequence)
+        plug-in strategies passed on to `reduce_puzzle`
+
+    value_order(string)
+        the order in which the digits of the guessed box are tried, see `VALUE_ORDERS`
+
+    stats(SearchStats)
+        collects search counters when given
+
+    Returns
+    -------
+    generator
+        The masks of each solution, with all boxes assigned
+    """
+    if stats is not None:
+        stats.nodes += 1
+    masks = reduce_puzzle(masks, propagation, changed, geometry, strategies, stats)
+    if masks is False:
+        return
+
+    candidate = _fewest_candidates(masks, geometry)
+    if candidate is None:
+        yield masks
+        return
+
+    for bit in _value_order(masks, candidate, geometry, value_order):
+        masks_case = masks[:]
+        masks_case[candidate] = bit
+        if stats is not None:
+            stats.guesses += 1
+            stats.depth += 1
+            stats.max_depth = max(stats.max_depth, stats.depth)
+        yield from iter_search(masks_case, propagation, (candidate,), geometry, strategies, value_order, stats)
+        if stats is not None:
+            stats.depth -= 1
+            stats.backtracks += 1
+
+
+def _resolve_options(value_order, strategies):
+    """Validate `value_order` and turn strategy names into functions"""
+    if value_order not in VALUE_ORDERS:
+        raise ValueError("Unknown value_order {!r}, expected one of {}".format(value_order, VALUE_ORDERS))
+    return tuple(PLUGINS[s] if isinstance(s, str) else s for s in strategies)
+
+
+def solve(grid, propagation='sweep', backtracking='copy', geometry=DIAGONAL, strategies=(),
+          value_order='ascending', stats=None):
+    """Find the solution to a Sudoku puzzle using the bitmask engine
+
+    Parameters
+    ----------
+    grid(string)
+        a string representing a sudoku grid.
+
+        Ex. '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    propagation(string)
+        'sweep' (default) or 'queue', see `reduce_puzzle`
+
+    backtracking(string)
+        'copy' (default) copies the masks for every guess, 'trail' uses `search_trail`
+
+    geometry(Geometry)
+        the board to solve on, the 9×9 diagonal Sudoku by default
+
+    strategies(sequence)
+        extra strategies, given as names from `strategies.PLUGINS` or as functions
+
+    value_order(string)
+        'ascending' (default) or 'lcv', see `VALUE_ORDERS`
+
+    stats(SearchStats)
+        filled with the search counters when given
+
+    Returns
+    -------
+    dict or False
+        The dictionary representation of the final sudoku grid or False if no solution exists.
+    """
+    strategies = _resolve_options(value_order, strategies)
+    start = default_timer()
+    searcher = search_trail if backtracking == 'trail' else search
+    masks = searcher(grid2masks(grid, geometry), propagation, None, geometry, strategies, value_order, stats)
+    if stats is not None:
+        stats.elapsed += default_timer() - start
+    if masks is False:
+        return False
+    return masks2values(masks, geometry)
+
+
+def iter_solutions(grid, propagation='sweep', geometry=DIAGONAL, strategies=(), value_order='ascending', stats=None):
+    """Yield every solution of a Sudoku puzzle, see `iter_search`
+
+    Parameters
+    ----------
+    grid(string)
+        a string representing a sudoku grid
+
+    propagation, geometry, strategies, value_order, stats
+        as for `solve`
+
+    Returns
+    -------
+    generator
+        The dictionary representation of each solution
+    """
+    strategies = _resolve_options(value_order, strategies)
+    for masks in iter_search(grid2masks(grid, geometry), propagation, None, geometry, strategies, value_order,
+                             stats):
+        yield masks2values(masks, geometry)
@@ -0,0 +1,223 @@
+"""Generate Sudoku puzzles with a unique solution and a target difficulty.
+
+A puzzle is made by filling a random solution and then removing clues in a
+random order, keeping each removal only while the puzzle still has a single
+solution (`solution.count_solutions`) and is not harder than requested.
+Difficulty is the number of guesses the bitmask engine needs to solve the
+puzzle (`bitboard.SearchStats.guesses`), so it measures how far constraint
+propagation alone gets, as seen by this project's own solver.
+
+`generate_many` spreads the work over a pool of processes; each puzzle is
+derived from its own seed, so a run is reproducible whatever the number of
+workers. From the command line:
+
+    python generator.py 100 --difficulty hard > puzzles/new.txt
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import bitboard
+from geometry import DIAGONAL
+from solution import _drain, count_solutions, solve_with_stats
+
+# Difficulty name -> (fewest, most) guesses, None for no upper bound
+DIFFICULTIES = {
+    'easy': (0, 0),
+    'medium': (1, 9),
+    'hard': (10, None),
+}
+# The solver configuration whose counters define difficulty
+RATING_OPTIONS = {'engine': 'bitboard', 'propagation': 'queue'}
+
+
+def rate(grid, geometry=DIAGONAL):
+    """Return the number of guesses the solver needs for a puzzle, see `RATING_OPTIONS`"""
+    _, stats = solve_with_stats(grid, geometry=geometry, **RATING_OPTIONS)
+    return stats.guesses
+
+
+def random_solution(rnd, geometry=DIAGONAL):
+    """Return a random solved grid, built by guessing random candidates with propagation
+
+    Parameters
+    ----------
+    rnd(random.Random)
+        the source of randomness
+
+    geometry(Geometry)
+        the board to fill
+
+    Returns
+    -------
+    string
+        the solved grid
+    """
+    size = len(geometry.boxes)
+    while True:
+        masks = bitboard.reduce_puzzle([geometry.all_digits] * size, 'queue', None, geometry)
+        while masks:
+            open_boxes = [i for i, m in enumerate(masks) if geometry.bit_count[m] > 1]
+            if not open_boxes:
+                return ''.join(geometry.mask_digits[m] for m in masks)
+            box = rnd.choice(open_boxes)
+            bits = [1 << d for d in range(geometry.size) if masks[box] >> d & 1]
+            masks[box] = rnd.choice(bits)
+            masks = bitboard.reduce_puzzle(masks, 'queue', (box,), geometry)
+        # A random guess hit a contradiction, start over
+
+
+def dig(grid, rnd, difficulty='hard', geometry=DIAGONAL):
+    """Remove clues from a solved grid while the puzzle stays unique and within difficulty
+
+    Parameters
+    ----------
+    grid(string)
+        a solved grid
+
+    rnd(random.Random)
+        the source of randomness, used for the order in which clues are tried
+
+    difficulty(string or tuple)
+        a name from `DIFFICULTIES` or a (fewest, most) guesses pair
+
+    geometry(Geometry)
+        the board the grid is played on
+
+    Returns
+    -------
+    (string, int)
+        the puzzle and its rating, which may be below the requested range
+        when no further clue could be removed
+    """
+    _, most = DIFFICULTIES.get(difficulty, difficulty)
+    puzzle = list(grid)
+    order = list(range(len(puzzle)))
+    rnd.shuffle(order)
+    rating = 0
+    for i in order:
+        clue, puzzle[i] = puzzle[i], '.'
+        candidate = ''.join(puzzle)
+        if count_solutions(candidate, geometry=geometry, **RATING_OPTIONS) == 1:
+            candidate_rating = rate(candidate, geometry)
+            if most is None or candidate_rating <= most:
+                rating = candidate_rating
+                continue
+        puzzle[i] = clue
+    return ''.join(puzzle), rating
+
+
+def generate(rnd, difficulty='hard', geometry=DIAGONAL, max_attempts=None):
+    """Generate one puzzle with a unique solution within the requested difficulty
+
+    Parameters
+    ----------
+    rnd(random.Random)
+        the source of randomness
+
+    difficulty(string or tuple)
+        a name from `DIFFICULTIES` or a (fewest, most) guesses pair
+
+    geometry(Geometry)
+        the board to generate for
+
+    max_attempts(int)
+        give up after this many solved grids have been dug, None to never give up
+
+    Returns
+    -------
+    (string, int) or None
+        the puzzle and its rating, or None if `max_attempts` ran out
+    """
+    if isinstance(difficulty, str) and difficulty not in DIFFICULTIES:
+        raise ValueError("Unknown difficulty {!r}, expected one of {}".format(difficulty, sorted(DIFFICULTIES)))
+    fewest, _ = DIFFICULTIES.get(difficulty, difficulty)
+    for _ in itertools.count() if max_attempts is None else range(max_attempts):
+        puzzle, rating = dig(random_solution(rnd, geometry), rnd, difficulty, geometry)
+        if rating >= fewest:
+            return puzzle, rating
+    return None
+
+
+def _generate_chunk(seeds, difficulty, geometry):
+    """Generate one puzzle per seed inside a worker process"""
+    return [generate(random.Random(seed), difficulty, geometry) for seed in seeds]
+
+
+def generate_many(count=None, difficulty='hard', workers=None, seed=None, ordered=False, geometry=DIAGONAL):
+    """Generate puzzles on a pool of worker processes
+
+    Parameters
+    ----------
+    count(int)
+        number of puzzles, None for an endless stream
+
+    difficulty(string or tuple)
+        a name from `DIFFICULTIES` or a (fewest, most) guesses pair
+
+    workers(int)
+        number of worker processes, defaults to the number of CPUs; with a
+        single worker the puzzles are generated in the calling process
+
+    seed(int or string)
+        makes the run reproducible: puzzle i always comes from the seed
+        '<seed>-<i>'; a random base seed is drawn when omitted
+
+    ordered(bool)
+        yield puzzles in index order, or (default) as soon as each is ready
+
+    geometry(Geometry)
+        the board to generate for
+
+    Returns
+    -------
+    generator
+        (puzzle, rating) pairs
+    """
+    if isinstance(difficulty, str) and difficulty not in DIFFICULTIES:
+        raise ValueError("Unknown difficulty {!r}, expected one of {}".format(difficulty, sorted(DIFFICULTIES)))
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    indices = itertools.count() if count is None else range(count)
+    seeds = ('{}-{}'.format(seed, i) for i in indices)
+    # One puzzle per task: generation times vary far more than solve times
+    chunks = ([s] for s in seeds)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            yield from _generate_chunk(chunk, difficulty, geometry)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(_generate_chunk, chunk, difficulty, geometry)))
+            if len(pending) >= 2 * workers:
+                for _, puzzle in _drain(pending, ordered):
+                    yield puzzle
+        while pending:
+            for _, puzzle in _drain(pending, ordered):
+                yield puzzle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('count', type=int, help='number of puzzles to generate')
+    parser.add_argument('--difficulty', choices=sorted(DIFFICULTIES), default='hard')
+    parser.add_argument('--workers', type=int, help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('--seed', help='base seed, for a reproducible run')
+    parser.add_argument('--ratings', action='store_true', help='append the rating to each puzzle')
+    args = parser.parse_args(argv)
+
+    for puzzle, rating in generate_many(args.count, args.difficulty, args.workers, args.seed):
+        print('{} {}'.format(puzzle, rating) if args.ratings else puzzle)
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
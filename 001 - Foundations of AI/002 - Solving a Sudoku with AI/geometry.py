@@ -0,0 +1,164 @@
+"""Board geometry for N²×N² Sudoku variants.
+
+A `Geometry` generates the boxes, units and peers of a board made of N×N
+squares (N = 3 for the classic 9×9 board, 4 for 16×16, 5 for 25×25) plus any
+extra units a variant adds (the two diagonals, windoku windows, ...). Besides
+the box-name tables used by the dictionary representation it precomputes
+index tables and candidate-mask lookups for the bitmask engine in
+`bitboard.py`, so larger boards never go through box names while solving.
+"""
+from utils import cross
+
+ROW_LABELS = 'ABCDEFGHIJKLMNOPQRSTUVWXY'
+DIGIT_SYMBOLS = '123456789ABCDEFGHIJKLMNOP'
+
+# Above this many digits the lookup tables would not fit in memory
+MAX_TABLE_DIGITS = 16
+
+
+class _BitCount(object):
+    """Stand-in for the bit count table of boards too large to tabulate"""
+
+    if hasattr(int, 'bit_count'):
+        __getitem__ = staticmethod(int.bit_count)
+    else:
+        def __getitem__(self, m):
+            return bin(m).count('1')
+
+
+class _MaskDigits(object):
+    """Stand-in for the mask to digits table of boards too large to tabulate"""
+
+    def __init__(self, digits):
+        self.digits = digits
+
+    def __getitem__(self, m):
+        return ''.join(d for i, d in enumerate(self.digits) if m >> i & 1)
+
+
+class Geometry(object):
+    """Boxes, units and peers of an N²×N² Sudoku board.
+
+    Parameters
+    ----------
+    box_size : int (optional)
+        The side N of each square; the board has N² rows, columns and digits.
+        Must be between 2 and 5.
+
+    extra_units : iterable (optional)
+        Additional units, each a list of box names (e.g. the output of
+        `diagonal_units`), that must also hold every digit exactly once.
+
+    name : str (optional)
+        A label used in reports and error messages.
+    """
+
+    def __init__(self, box_size=3, extra_units=(), name=None):
+        if not 2 <= box_size <= 5:
+            raise ValueError("box_size must be between 2 and 5, got {}".format(box_size))
+        size = box_size * box_size
+        self.box_size = box_size
+        self.size = size
+        self.name = name or '{0}x{0}'.format(size)
+
+        self.rows = ROW_LABELS[:size]
+        self.cols = [str(c) for c in range(1, size + 1)]
+        self.digits = DIGIT_SYMBOLS[:size]
+        self.boxes = cross(self.rows, self.cols)
+
+        row_bands = [self.rows[i:i + box_size] for i in range(0, size, box_size)]
+        col_bands = [self.cols[i:i + box_size] for i in range(0, size, box_size)]
+        self.row_units = [cross(r, self.cols) for r in self.rows]
+        self.column_units = [cross(self.rows, [c]) for c in self.cols]
+        self.square_units = [cross(rs, cs) for rs in row_bands for cs in col_bands]
+        self.extra_units = [list(unit) for unit in extra_units]
+        for unit in self.extra_units:
+            if len(unit) != size or len(set(unit)) != size or not set(unit) <= set(self.boxes):
+                raise ValueError("Extra unit {} is not {} distinct boxes of the board".format(unit, size))
+        self.unitlist = self.row_units + self.column_units + self.square_units + self.extra_units
+
+        self.units = dict((s, [u for u in self.unitlist if s in u]) for s in self.boxes)
+        self.peers = dict((s, set(sum(self.units[s], [])) - {s}) for s in self.boxes)
+
+        # Index based tables for the bitmask engine
+        self.box_index = dict((box, i) for i, box in enumerate(self.boxes))
+        self.unit_index = tuple(tuple(self.box_index[box] for box in unit) for unit in self.unitlist)
+        self.units_of = tuple(tuple(u for u, unit in enumerate(self.unit_index) if i in unit)
+                              for i in range(len(self.boxes)))
+        self.peer_index = tuple(tuple(sorted(self.box_index[peer] for peer in self.peers[box]))
+                                for box in self.boxes)
+
+        self.all_digits = (1 << size) - 1
+        self.digit_mask = dict((d, 1 << i) for i, d in enumerate(self.digits))
+        if size <= MAX_TABLE_DIGITS:
+            self.bit_count = [bin(m).count('1') for m in range(self.all_digits + 1)]
+            self.mask_digits = [''.join(d for i, d in enumerate(self.digits) if m >> i & 1)
+                                for m in range(self.all_digits + 1)]
+        else:
+            self.bit_count = _BitCount()
+            self.mask_digits = _MaskDigits(self.digits)
+
+    def __repr__(self):
+        return 'Geometry({!r})'.format(self.name)
+
+    def __reduce__(self):
+        # Rebuilding the tables is costly for large boards, so worker
+        # processes build each geometry once and reuse it for every task
+        return _cached_geometry, (self.box_size, tuple(map(tuple, self.extra_units)), self.name)
+
+    def grid2values(self, grid):
+        """Convert a grid string into the dictionary representation
+
+        Parameters
+        ----------
+        grid(string)
+            one symbol per box in row-major order, '.' for empty boxes
+
+        Returns
+        -------
+        dict
+            a dictionary of the form {'box_name': '123456789', ...}
+        """
+        if len(grid) != len(self.boxes):
+            raise ValueError("A {} grid has {} boxes, got {}".format(self.name, len(self.boxes), len(grid)))
+        return dict((box, self.digits if val == '.' else val) for box, val in zip(self.boxes, grid))
+
+    def values2grid(self, values):
+        """Convert the dictionary representation into a grid string"""
+        return ''.join(values[box] if len(values[box]) == 1 else '.' for box in self.boxes)
+
+
+_geometries = {}
+
+
+def _cached_geometry(box_size, extra_units, name):
+    """Return the geometry with these arguments, building it on first use"""
+    key = (box_size, extra_units, name)
+    if key not in _geometries:
+        _geometries[key] = Geometry(box_size, extra_units, name)
+    return _geometries[key]
+
+
+def diagonal_units(box_size=3):
+    """Return the descending and ascending main diagonals as units"""
+    size = box_size * box_size
+    rows, cols = ROW_LABELS[:size], [str(c) for c in range(1, size + 1)]
+    return [[rows[i] + cols[i] for i in range(size)],
+            [rows[size - 1 - i] + cols[i] for i in range(size)]]
+
+
+def anti_diagonal_units(box_size=3):
+    """Return the ascending main diagonal (bottom-left to top-right) as a unit"""
+    return diagonal_units(box_size)[1:]
+
+
+def windoku_units(box_size=3):
+    """Return the windoku windows: squares offset by one box from the regular ones"""
+    size = box_size * box_size
+    rows, cols = ROW_LABELS[:size], [str(c) for c in range(1, size + 1)]
+    starts = range(1, size - box_size + 1, box_size + 1)
+    return [cross(rows[r:r + box_size], cols[c:c + box_size]) for r in starts for c in starts]
+
+
+STANDARD = _cached_geometry(3, (), 'standard')
+DIAGONAL = _cached_geometry(3, tuple(map(tuple, diagonal_units(3))), 'diagonal')
@@ -42,6 +42,17 @@ def AAfilledRoundedRect(surface, rect, color, radius=0.4):
     return surface.blit(rectangle, pos)
 
 
+_fonts = {}
+
+
+def get_font(name, size):
+    """Return a system font, loading each name and size once: SysFont scans the
+    installed fonts on every call, which dominated the time to draw a board"""
+    if (name, size) not in _fonts:
+        _fonts[name, size] = pygame.font.SysFont(name, size)
+    return _fonts[name, size]
+
+
 class SudokuSquare:
     """A sudoku square class."""
 
@@ -53,7 +64,7 @@ class SudokuSquare:
             number = ""
             self.color = (255, 255, 255)
         # print("FONTS", pygame.font.get_fonts())
-        self.font = pygame.font.SysFont('opensans', 21)
+        self.font = get_font('opensans', 21)
         self.text = self.font.render(number, 1, (255, 255, 255))
         self.textpos = self.text.get_rect()
         self.textpos = self.textpos.move(offsetX + 17, offsetY + 4)
@@ -72,8 +83,9 @@ class SudokuSquare:
         self.offsetX = offsetX
         self.offsetY = offsetY
 
-    def draw(self):
-        screen = pygame.display.get_surface()
+    def draw(self, screen=None):
+        if screen is None:
+            screen = pygame.display.get_surface()
         AAfilledRoundedRect(screen, (self.offsetX, self.offsetY, 45, 40), self.color)
 
         # screen.blit(self.collide, self.collideRect)
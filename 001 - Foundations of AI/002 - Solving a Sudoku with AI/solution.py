@@ -1,5 +1,13 @@
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
 from utils import *
 
+import bitboard
+from geometry import DIAGONAL
+
 row_units = [cross(r, cols) for r in rows]
 column_units = [cross(rows, c) for c in cols]
 square_units = [cross(rs, cs) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')]
@@ -10,8 +18,9 @@ unitlist = row_units + column_units + square_units + diagonal_desc_units + diago
 units = dict((s, [u for u in unitlist if s in u]) for s in boxes)
 peers = dict((s, set(sum(units[s], [])) - set([s])) for s in boxes)
 
-letter_translator = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4, 'F': 5, 'G': 6, 'H': 7, 'I': 8}
-
+ENGINES = ('dict', 'bitboard')
+PROPAGATIONS = ('sweep', 'queue')
+BACKTRACKINGS = ('copy', 'trail')
 
 def remove_from_line(values, candidate, candidate_twin):
     """
@@ -24,24 +33,12 @@ def remove_from_line(values, candidate, candidate_twin):
     :type candidate_twin: str
     :return: values
     """
-    if [x for x in square_units if candidate in x and candidate_twin in x]:  # Square elimination
-        elements_aligned = set([x for x in square_units if candidate in x][0]) - {candidate} - {candidate_twin}
-    elif candidate[0] == candidate_twin[0]:  # Row elimination
-        elements_aligned = set(row_units[letter_translator[candidate[0]]]) - {candidate} - {candidate_twin}
-    elif candidate[1] == candidate_twin[1]:  # Column elimination
-        elements_aligned = set(column_units[int(candidate[1]) - 1]) - {candidate} - {candidate_twin}
-    elif (letter_translator[candidate[0]] + 1 == int(candidate[1])) and \
-            (letter_translator[candidate_twin[0]] + 1 == int(candidate_twin[1])):  # Diagonal descending elimination
-        elements_aligned = set(diagonal_desc_units) - {candidate} - {candidate_twin}
-    elif (letter_translator[candidate[0]] + 1 + int(candidate[1]) == 10) and \
-            (letter_translator[candidate_twin[0]] + 1 + int(candidate_twin[1]) == 10):  # Diagonal ascending elimination
-        elements_aligned = set(diagonal_asc_units) - {candidate} - {candidate_twin}
-    else:  # Dummy case
-        elements_aligned = []
+    elements_aligned = set(box for unit in units[candidate] if candidate_twin in unit for box in unit)
+    elements_aligned -= {candidate, candidate_twin}
 
     for element_aligned in elements_aligned:
-        values[element_aligned] = values[element_aligned].replace(values[candidate][0], '')
-        values[element_aligned] = values[element_aligned].replace(values[candidate][1], '')
+        digits = values[element_aligned].replace(values[candidate][0], '').replace(values[candidate][1], '')
+        assign_value(values, element_aligned, digits)
 
     return values
 
@@ -80,7 +77,8 @@ def naked_twins(values):
         candidate_twins = [x for x in peers[candidate] if x in (candidates_comparable - {candidate})]
         if candidate_twins:
             for candidate_twin in candidate_twins:
-                if values[candidate] == values[candidate_twin]:
+                # An earlier pair may have shrunk this one, leaving a box solved or empty
+                if len(values[candidate]) == 2 and values[candidate] == values[candidate_twin]:
                     values = remove_from_line(values=values, candidate=candidate, candidate_twin=candidate_twin)
         candidates_comparable.remove(candidate)
     return values
@@ -103,9 +101,11 @@ def eliminate(values):
         The values dictionary with the assigned values eliminated from peers
     """
     for box in values:
-        if len(values[box]) == 1:
+        digit = values[box]
+        if len(digit) == 1:
             for peer in peers[box]:
-                values[peer] = values[peer].replace(values[box], '')
+                if digit in values[peer]:
+                    assign_value(values, peer, values[peer].replace(digit, ''))
     return values
 
 
@@ -133,11 +133,88 @@ def only_choice(values):
         for digit in '123456789':
             digit_position = [box for box in unit if digit in values[box]]
             if len(digit_position) == 1:
-                values[digit_position[0]] = digit
+                assign_value(values, digit_position[0], digit)
     return values
 
 
-def reduce_puzzle(values):
+def propagate(values, changed=None, trail=None):
+    """Apply the eliminate, only choice and naked twins strategies from a work queue
+
+    Instead of sweeping the whole board until nothing changes, only the peers
+    of boxes that just became solved and the units of boxes whose candidates
+    just changed are revisited.
+
+    Parameters
+    ----------
+    values(dict)
+        a dictionary of the form {'box_name': '123456789', ...}
+
+    changed(iterable)
+        the boxes whose candidates changed since the board was last propagated;
+        all boxes when omitted
+
+    trail(list)
+        when given, the name and previous value of every box changed are
+        appended to it, see `undo`
+
+    Returns
+    -------
+    dict or False
+        The values dictionary once the queue is empty, or False if the puzzle is unsolvable
+    """
+    if changed is None:
+        changed = boxes
+    solved = [box for box in changed if len(values[box]) == 1]
+    dirty_units = {}
+    for box in changed:
+        for unit in units[box]:
+            dirty_units[id(unit)] = unit
+
+    def update(box, digits):
+        if not digits:
+            return False
+        if trail is not None:
+            trail.append(box)
+            trail.append(values[box])
+        assign_value(values, box, digits)
+        if len(digits) == 1:
+            solved.append(box)
+        for unit in units[box]:
+            dirty_units[id(unit)] = unit
+        return True
+
+    while solved or dirty_units:
+        # Eliminate the digit of every newly solved box from its peers
+        while solved:
+            box = solved.pop()
+            digit = values[box]
+            for peer in peers[box]:
+                if digit in values[peer] and not update(peer, values[peer].replace(digit, '')):
+                    return False
+        if not dirty_units:
+            break
+
+        _, unit = dirty_units.popitem()
+        # Only choice: a digit with a single place in the unit goes there
+        for digit in '123456789':
+            digit_position = [box for box in unit if digit in values[box]]
+            if not digit_position:
+                return False
+            if len(digit_position) == 1 and values[digit_position[0]] != digit:
+                update(digit_position[0], digit)
+        # Naked twins: two boxes sharing the same two digits own them in the unit
+        pairs = [box for box in unit if len(values[box]) == 2]
+        for i, box in enumerate(pairs):
+            twin = values[box]
+            if len(twin) == 2 and any(values[other] == twin for other in pairs[i + 1:]):
+                for peer in unit:
+                    if values[peer] != twin and (twin[0] in values[peer] or twin[1] in values[peer]):
+                        if not update(peer, values[peer].replace(twin[0], '').replace(twin[1], '')):
+                            return False
+    return values
+
+
+def reduce_puzzle(values, propagation='sweep', changed=None, trail=None):
     """Reduce a Sudoku puzzle by repeatedly applying all constraint strategies
 
     Parameters
@@ -145,16 +222,32 @@ def reduce_puzzle(values):
     values(dict)
         a dictionary of the form {'box_name': '123456789', ...}
 
+    propagation(string)
+        'sweep' (default) reapplies every strategy to the whole board until
+        nothing changes, 'queue' uses the incremental `propagate`
+
+    changed(iterable)
+        the boxes changed since the last reduction, only used by 'queue'
+
+    trail(list)
+        when given, every box changed is recorded on it, see `undo`
+
     Returns
     -------
     dict or False
         The values dictionary after continued application of the constraint strategies
         no longer produces any changes, or False if the puzzle is unsolvable 
     """
+    if propagation == 'queue':
+        return propagate(values, changed, trail)
+
     stalled = False
     while not stalled:
         # Check how many boxes have a determined value
         solved_values_before = len([box for box in values.keys() if len(values[box]) == 1])
+        # The strategies assign through `assign_value`, which knows nothing of
+        # the trail: a round's changes are found against a copy taken before it
+        before = dict(values) if trail is not None else None
 
         # Your code here: Use the Eliminate Strategy
         values = eliminate(values)
@@ -164,6 +257,11 @@ def reduce_puzzle(values):
         values = naked_twins(values)
         # Check how many boxes have a determined value, to compare
         solved_values_after = len([box for box in values.keys() if len(values[box]) == 1])
+        if trail is not None:
+            for box, value in before.items():
+                if values[box] != value:
+                    trail.append(box)
+                    trail.append(value)
         # If no new values were added, stop the loop.
         stalled = solved_values_before == solved_values_after
         # Sanity check, return False if there is a box with zero available values:
@@ -172,7 +270,77 @@ def reduce_puzzle(values):
     return values
 
 
-def search(values):
+def undo(values, trail, mark):
+    """Restore every box recorded on `trail` since `mark`, its length at the time
+
+    The trail is a flat list of alternating box names and previous values,
+    appended to by `propagate` and `reduce_puzzle`.
+    """
+    # Newest first, so that a box changed twice ends up with its oldest value
+    entries = reversed(trail[mark:])
+    for value, box in zip(entries, entries):
+        values[box] = value
+    del trail[mark:]
+
+
+def search_trail(values, propagation='sweep', changed=None, trail=None):
+    """Depth first search on a single board, undoing guesses from its trail
+
+    Behaves like `search`, but instead of copying the values dictionary for
+    every guess it assigns the guess in place and, when the branch fails,
+    restores the board from the undo trail that the reductions filled.
+
+    Parameters
+    ----------
+    values(dict)
+        a dictionary of the form {'box_name': '123456789', ...}; searched in
+        place when `trail` is given, otherwise a copy is searched
+
+    propagation(string)
+        the propagation mode passed on to `reduce_puzzle`
+
+    changed(iterable)
+        the boxes changed since the last reduction, all boxes when omitted
+
+    trail(list)
+        the undo trail of `values`, see `undo`
+
+    Returns
+    -------
+    dict or False
+        The solved values dictionary or False
+    """
+    if trail is None:
+        # Nothing before the first guess is ever undone, so the first
+        # reduction is not recorded
+        values = dict(values)
+        if reduce_puzzle(values, propagation, changed) is False:
+            return False
+        trail = []
+    elif reduce_puzzle(values, propagation, changed, trail) is False:
+        return False
+
+    fewest, candidate = 10, None
+    for box in boxes:
+        count = len(values[box])
+        if 1 < count < fewest:
+            fewest, candidate = count, box
+    if candidate is None:
+        return values
+
+    for case in values[candidate]:
+        mark, history = len(trail), history_mark()
+        trail.append(candidate)
+        trail.append(values[candidate])
+        assign_value(values, candidate, case)
+        if search_trail(values, propagation, [candidate], trail):
+            return values
+        undo(values, trail, mark)
+        history_undo(history)
+    return False
+
+
+def search(values, propagation='sweep', changed=None):
     """Apply depth first search to solve Sudoku puzzles in order to solve puzzles
     that cannot be solved by repeated reduction alone.
 
@@ -181,6 +349,12 @@ def search(values):
     values(dict)
         a dictionary of the form {'box_name': '123456789', ...}
 
+    propagation(string)
+        the propagation mode passed on to `reduce_puzzle`
+
+    changed(iterable)
+        the boxes changed since the last reduction, all boxes when omitted
+
     Returns
     -------
     dict or False
@@ -193,7 +367,7 @@ def search(values):
     """
 
     # First, reduce the puzzle using the previous function
-    values = reduce_puzzle(values)
+    values = reduce_puzzle(values, propagation, changed)
     # Return if arrived to end condition
     if values is False:
         return False
@@ -206,14 +380,68 @@ def search(values):
     # return that answer!
     for case in values[candidate]:
         values_case = values.copy()
-        values_case[candidate] = case
-        attempt = search(values_case)
+        history = history_mark()
+        assign_value(values_case, candidate, case)
+        attempt = search(values_case, propagation, [candidate])
         if attempt:
             return attempt
+        history_undo(history)
     return False
 
 
-def solve(grid):
+def iter_search(values, propagation='sweep', changed=None):
+    """Depth first search that yields every solution instead of stopping at the first
+
+    Explores the same tree in the same order as `search`, so the first
+    solution yielded is the one `search` returns.
+
+    Parameters
+    ----------
+    values(dict)
+        a dictionary of the form {'box_name': '123456789', ...}
+
+    propagation(string)
+        the propagation mode passed on to `reduce_puzzle`
+
+    changed(iterable)
+        the boxes changed since the last reduction, all boxes when omitted
+
+    Returns
+    -------
+    generator
+        The values dictionary of each solution
+    """
+    values = reduce_puzzle(values, propagation, changed)
+    if values is False:
+        return
+    if all(len(values[s]) == 1 for s in boxes):
+        yield values
+        return
+    _, candidate = min((len(values[s]), s) for s in boxes if len(values[s]) > 1)
+
+    for case in values[candidate]:
+        values_case = values.copy()
+        assign_value(values_case, candidate, case)
+        yield from iter_search(values_case, propagation, [candidate])
+
+
+def _check_options(engine='dict', propagation='sweep', backtracking='copy', geometry=DIAGONAL, strategies=(),
+                   value_order='ascending', stats=None, history=None):
+    """Raise ValueError for an unknown option, or one the selected engine does not support"""
+    for name, option, choices in (('engine', engine, ENGINES), ('propagation', propagation, PROPAGATIONS),
+                                  ('backtracking', backtracking, BACKTRACKINGS),
+                                  ('value_order', value_order, bitboard.VALUE_ORDERS)):
+        if option not in choices:
+            raise ValueError("Unknown {} {!r}, expected one of {}".format(name, option, choices))
+    if engine == 'dict' and (geometry is not DIAGONAL or strategies or value_order != 'ascending' or stats):
+        raise ValueError("The 'dict' engine only solves diagonal 9x9 puzzles with the built-in strategies, "
+                         "use engine='bitboard'")
+    if engine == 'bitboard' and history is not None:
+        raise ValueError("Only the 'dict' engine records a history, use engine='dict'")
+
+
+def solve(grid, engine='dict', propagation='sweep', backtracking='copy', geometry=DIAGONAL, strategies=(),
+          value_order='ascending', stats=None, history=None):
     """Find the solution to a Sudoku puzzle using search and constraint propagation
 
     Parameters
@@ -223,28 +451,235 @@ def solve(grid):
         
         Ex. '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
 
+    engine(string)
+        'dict' (default) solves on the dictionary representation used by the
+        visualiser, 'bitboard' solves on the candidate masks of `bitboard.py`
+
+    propagation(string)
+        'sweep' (default) rescans the whole board on every reduction, 'queue'
+        only revisits the peers and units of boxes that changed
+
+    backtracking(string)
+        'copy' (default) copies the board for every guess, 'trail' guesses on
+        a single board and undoes the changes when a branch fails
+
+    geometry(Geometry)
+        the board to solve on (see `geometry.py`); only the 'bitboard' engine
+        accepts anything but the default 9x9 diagonal board
+
+    strategies(sequence)
+        extra strategies for the 'bitboard' engine, e.g. ('hidden_pairs', 'x_wing');
+        see `strategies.py`
+
+    value_order(string)
+        'ascending' (default) or 'lcv' (least constraining value first), the
+        order in which the 'bitboard' engine tries the digits of a guessed box
+
+    stats(bitboard.SearchStats)
+        filled with search counters by the 'bitboard' engine when given
+
+    history(utils.History)
+        filled by the 'dict' engine with the (box, value) assignments leading
+        to the solution, for `reconstruct` and the visualiser; nothing is
+        recorded when omitted
+
     Returns
     -------
     dict or False
         The dictionary representation of the final sudoku grid or False if no solution exists.
     """
+    _check_options(engine, propagation, backtracking, geometry, strategies, value_order, stats, history)
+    if engine == 'bitboard':
+        return bitboard.solve(grid, propagation, backtracking, geometry, strategies, value_order, stats)
+
     values = grid2values(grid)
-    values = search(values)
+    with recording(history):
+        if backtracking == 'trail':
+            return search_trail(values, propagation)
+        values = search(values, propagation)
     return values
 
 
+def iter_solutions(grid, engine='dict', propagation='sweep', geometry=DIAGONAL, strategies=(),
+                   value_order='ascending', stats=None):
+    """Yield every solution of a Sudoku puzzle, lazily and in search order
+
+    Parameters
+    ----------
+    grid(string)
+        a string representing a sudoku grid
+
+    engine, propagation, geometry, strategies, value_order, stats
+        as for `solve`
+
+    Returns
+    -------
+    generator
+        The dictionary representation of each solution
+    """
+    _check_options(engine, propagation, 'copy', geometry, strategies, value_order, stats)
+    if engine == 'bitboard':
+        return bitboard.iter_solutions(grid, propagation, geometry, strategies, value_order, stats)
+    return iter_search(grid2values(grid), propagation)
+
+
+def count_solutions(grid, limit=2, **options):
+    """Count the solutions of a Sudoku puzzle, stopping once `limit` are found
+
+    With the default limit this is a uniqueness check: it returns 0 for an
+    unsolvable puzzle, 1 for a proper puzzle and 2 for one with several
+    solutions, searching no further than the second solution.
+
+    Parameters
+    ----------
+    grid(string)
+        a string representing a sudoku grid
+
+    limit(int)
+        the most solutions to look for, None to count them all
+
+    options
+        any keyword argument of `iter_solutions`
+
+    Returns
+    -------
+    int
+        The number of solutions found, at most `limit`
+    """
+    return sum(1 for _ in islice(iter_solutions(grid, **options), limit))
+
+
+def solve_with_stats(grid, **options):
+    """Solve a puzzle with the 'bitboard' engine and report how much work it took
+
+    Parameters
+    ----------
+    grid(string)
+        a string representing a sudoku grid
+
+    options
+        any other keyword argument of `solve`
+
+    Returns
+    -------
+    (dict or False, bitboard.SearchStats)
+        The result of `solve` and the counters collected while solving
+    """
+    options.setdefault('engine', 'bitboard')
+    stats = bitboard.SearchStats()
+    return solve(grid, stats=stats, **options), stats
+
+
+def read_grids(source):
+    """Read Sudoku grids, one per line, from a file
+
+    Parameters
+    ----------
+    source(string or file)
+        a path or an open text file; blank lines and lines starting with '#'
+        are skipped
+
+    Returns
+    -------
+    generator
+        The grid strings in file order
+    """
+    if isinstance(source, str):
+        with open(source) as handle:
+            yield from read_grids(handle)
+        return
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def _solve_chunk(grids, options):
+    """Solve a chunk of grids inside a worker process"""
+    return [solve(grid, **options) for grid in grids]
+
+
+def solve_many(grids, workers=None, chunksize=64, ordered=True, **options):
+    """Solve a stream of Sudoku puzzles on a pool of worker processes
+
+    The input is consumed lazily: at most two chunks per worker are in flight
+    at any time, so `grids` may be an unbounded generator (e.g. `read_grids`).
+
+    Parameters
+    ----------
+    grids(iterable)
+        the grid strings to solve
+
+    workers(int)
+        number of worker processes, defaults to the number of CPUs; with a
+        single worker the puzzles are solved in the calling process
+
+    chunksize(int)
+        number of grids sent to a worker at a time
+
+    ordered(bool)
+        yield results in input order (default) or as soon as each chunk completes
+
+    options
+        keyword arguments passed on to `solve` (engine, propagation, ...),
+        except `stats` and `history`, which cannot be collected across
+        processes; batch runs never record a history
+
+    Returns
+    -------
+    generator
+        (grid, result) pairs, where result is what `solve` returns for the grid
+    """
+    if options.get('stats') is not None or options.get('history') is not None:
+        raise ValueError("solve_many cannot collect stats or history, use solve on each grid")
+    _check_options(**options)
+    grids = iter(grids)
+    chunks = iter(lambda: list(islice(grids, chunksize)), [])
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            yield from zip(chunk, _solve_chunk(chunk, options))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(_solve_chunk, chunk, options)))
+            if len(pending) >= 2 * workers:
+                yield from _drain(pending, ordered)
+        while pending:
+            yield from _drain(pending, ordered)
+
+
+def _drain(pending, ordered):
+    """Remove the next finished chunk from `pending` and return its (grid, result) pairs"""
+    if ordered:
+        chunk, future = pending.popleft()
+    else:
+        done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+        chunk, future = next(entry for entry in pending if entry[1] in done)
+        pending.remove((chunk, future))
+    return zip(chunk, future.result())
+
+
 if __name__ == "__main__":
     diag_sudoku_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
     display(grid2values(diag_sudoku_grid))
-    result = solve(diag_sudoku_grid)
+    history = History()
+    result = solve(diag_sudoku_grid, history=history)
     display(result)
 
     try:
         import PySudoku
-
-        PySudoku.play(grid2values(diag_sudoku_grid), result, history)
-
-    except SystemExit:
-        pass
-    except:
-        print('We could not visualize your board due to a pygame issue. Not a problem! It is not a requirement.')
+    except ImportError:
+        print('We could not visualize your board because pygame is not installed. Not a problem! '
+              'It is not a requirement.')
+    else:
+        try:
+            PySudoku.play(grid2values(diag_sudoku_grid), result, history)
+        except SystemExit:
+            pass
+        except PySudoku.pygame.error as error:
+            print('We could not visualize your board due to a pygame issue ({}). Not a problem! '
+                  'It is not a requirement.'.format(error))
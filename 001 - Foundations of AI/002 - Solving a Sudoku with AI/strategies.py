@@ -0,0 +1,156 @@
+"""Optional constraint strategies for the bitmask engine.
+
+Each plug-in takes the candidate masks and the `geometry.Geometry` they
+belong to, removes candidates in place and returns the list of box indices
+it changed (empty when it found nothing), or False if it uncovered a
+contradiction. `bitboard.reduce_puzzle` runs the selected plug-ins after the
+eliminate / only choice / naked twins strategies and keeps propagating from
+the boxes they changed.
+"""
+_overlaps = {}
+
+
+def _unit_overlaps(geometry):
+    """Return (unit, inside, outside) triples for every pair of units sharing
+    two or more boxes: `inside` is the shared boxes, `outside` the rest of the
+    other unit."""
+    if geometry not in _overlaps:
+        units = geometry.unit_index
+        overlaps = []
+        for u, unit in enumerate(units):
+            for v, other in enumerate(units):
+                inside = tuple(i for i in unit if i in other)
+                if u != v and len(inside) > 1:
+                    overlaps.append((unit, inside, tuple(i for i in other if i not in inside)))
+        _overlaps[geometry] = overlaps
+    return _overlaps[geometry]
+
+
+def _remove(masks, boxes, digits, changed):
+    """Remove `digits` from `boxes`, appending the boxes changed; False on an emptied box"""
+    for i in boxes:
+        m = masks[i]
+        if m & digits:
+            m &= ~digits
+            if not m:
+                return False
+            masks[i] = m
+            changed.append(i)
+    return True
+
+
+def hidden_pairs(masks, geometry):
+    """Two digits that fit in the same two boxes of a unit, and nowhere else in
+    it, own those boxes: every other candidate is removed from them.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    list or False
+        The indices of the boxes changed, or False on a contradiction
+    """
+    changed = []
+    digit_bits = [1 << d for d in range(geometry.size)]
+    for unit in geometry.unit_index:
+        places = {}
+        for bit in digit_bits:
+            spots = tuple(i for i in unit if masks[i] & bit)
+            if len(spots) == 2:
+                places[spots] = places.get(spots, 0) | bit
+        for spots, pair in places.items():
+            if geometry.bit_count[pair] == 2:
+                for i in spots:
+                    if masks[i] != pair:
+                        masks[i] = pair
+                        changed.append(i)
+    return changed
+
+
+def pointing_pairs(masks, geometry):
+    """Locked candidates: when every place left for a digit in one unit lies
+    inside a second unit (a square and a row, a row and a diagonal, ...), the
+    digit is removed from the rest of that second unit.
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    list or False
+        The indices of the boxes changed, or False on a contradiction
+    """
+    changed = []
+    for unit, inside, outside in _unit_overlaps(geometry):
+        inside_digits = rest_digits = 0
+        for i in unit:
+            if i in inside:
+                inside_digits |= masks[i]
+            else:
+                rest_digits |= masks[i]
+        locked = inside_digits & ~rest_digits
+        # Solved boxes are handled by eliminate, only unsolved digits matter
+        for i in inside:
+            if geometry.bit_count[masks[i]] == 1:
+                locked &= ~masks[i]
+        if locked and not _remove(masks, outside, locked, changed):
+            return False
+    return changed
+
+
+def x_wing(masks, geometry):
+    """When a digit fits in exactly the same two columns of two rows, it must
+    take those columns in those rows and is removed from the rest of both
+    columns (and likewise with rows and columns swapped).
+
+    Parameters
+    ----------
+    masks(list)
+        a list of candidate masks, modified in place
+
+    geometry(Geometry)
+        the board the masks belong to
+
+    Returns
+    -------
+    list or False
+        The indices of the boxes changed, or False on a contradiction
+    """
+    size = geometry.size
+    rows, columns = geometry.unit_index[:size], geometry.unit_index[size:2 * size]
+    changed = []
+    for lines, crossing in ((rows, columns), (columns, rows)):
+        for d in range(size):
+            bit = 1 << d
+            seen = {}
+            for line, boxes in enumerate(lines):
+                spots = tuple(k for k, i in enumerate(boxes) if masks[i] & bit)
+                if len(spots) != 2:
+                    continue
+                if spots not in seen:
+                    seen[spots] = line
+                    continue
+                wing = (seen[spots], line)
+                for k in spots:
+                    others = [i for position, i in enumerate(crossing[k]) if position not in wing]
+                    if not _remove(masks, others, bit, changed):
+                        return False
+    return changed
+
+
+PLUGINS = {
+    'hidden_pairs': hidden_pairs,
+    'pointing_pairs': pointing_pairs,
+    'x_wing': x_wing,
+}
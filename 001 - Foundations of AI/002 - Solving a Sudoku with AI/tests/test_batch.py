@@ -0,0 +1,54 @@
+import unittest
+
+import benchmark
+import bitboard
+from geometry import DIAGONAL, STANDARD, Geometry
+from tests.test_geometry import pattern_grid
+
+try:
+    import numpy as np
+    import batch
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, 'the batch mode requires numpy')
+class TestBatch(unittest.TestCase):
+
+    def test_candidates(self):
+        grid = benchmark.load_corpus('diagonal')[0]
+        candidates = batch.grids2candidates([grid], DIAGONAL)
+        self.assertEqual(candidates.shape, (1, 81, 9))
+        self.assertEqual(batch.candidates2masks(candidates[0]), bitboard.grid2masks(grid))
+
+    def test_reduce_matches_bitboard(self):
+        # Eliminate and only choice alone never remove more than the bitmask engine's propagation
+        grids = benchmark.load_corpus('hard')
+        candidates = batch.grids2candidates(grids, STANDARD)
+        self.assertTrue(batch.reduce_batch(candidates, STANDARD).all())
+        for grid, puzzle in zip(grids, candidates):
+            reduced = bitboard.reduce_puzzle(bitboard.grid2masks(grid, STANDARD), 'queue', None, STANDARD)
+            masks = batch.candidates2masks(puzzle)
+            self.assertTrue(all(m & r == r for m, r in zip(masks, reduced)))
+
+    def test_solve_batch(self):
+        for name, geometry in benchmark.CORPORA.items():
+            grids = benchmark.load_corpus(name)
+            expected = [bitboard.solve(grid, 'queue', geometry=geometry) for grid in grids]
+            self.assertEqual(batch.solve_batch(grids, geometry), expected)
+
+    def test_unsolvable(self):
+        grid = benchmark.load_corpus('diagonal')[0]
+        results = batch.solve_batch([grid, '11' + '.' * 79])
+        self.assertTrue(results[0])
+        self.assertIs(results[1], False)
+
+    def test_larger_board(self):
+        board = Geometry(4)
+        solved = pattern_grid(board)
+        grid = '.' * 40 + solved[40:]
+        self.assertEqual(batch.solve_batch([grid], board), [bitboard.solve(grid, geometry=board)])
+
+
+if __name__ == '__main__':
+    unittest.main()
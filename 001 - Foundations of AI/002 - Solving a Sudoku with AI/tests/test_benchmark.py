@@ -0,0 +1,51 @@
+import sys
+import unittest
+
+import benchmark
+import utils
+from geometry import DIAGONAL, STANDARD
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_corpora(self):
+        for name, geometry in benchmark.CORPORA.items():
+            grids = benchmark.load_corpus(name)
+            self.assertEqual(len(grids), 50)
+            self.assertTrue(all(len(grid) == len(geometry.boxes) for grid in grids))
+
+    def test_run_benchmark(self):
+        label, solve, geometries = benchmark.make_solver('bitboard', propagation='queue')
+        self.assertEqual(label, 'bitboard/queue')
+        self.assertEqual(geometries, (STANDARD, DIAGONAL))
+        result = benchmark.run_benchmark(label, solve, benchmark.load_corpus('hard')[:5], STANDARD, 'hard', 1)
+        self.assertEqual((result['puzzles'], result['solved']), (5, 5))
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(result['puzzles_per_sec'], 0)
+        self.assertGreater(result['peak_kib'], 0)
+
+    def test_legacy_search(self):
+        label, solve, geometries = benchmark.make_solver('function')
+        self.assertEqual(geometries, (STANDARD,))
+        self.assertIs(sys.modules['utils'], utils)
+        grid = benchmark.load_corpus('easy')[0]
+        self.assertTrue(benchmark.is_solution(grid, solve(grid, STANDARD), STANDARD))
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(samples, 50), 50)
+        self.assertEqual(benchmark.percentile(samples, 99), 99)
+        self.assertEqual(benchmark.percentile([3], 99), 3)
+
+    def test_compare(self):
+        before = {'corpus': 'easy', 'solver': 'dict', 'puzzles': 2, 'solved': 2, 'puzzles_per_sec': 100.0,
+                  'p50_ms': 1.0, 'p99_ms': 2.0, 'peak_kib': 1.0}
+        slower = dict(before, puzzles_per_sec=80.0)
+        _, regressions = benchmark.compare(benchmark.make_report([before]), [slower], tolerance=0.1)
+        self.assertEqual(regressions, [('easy', 'dict')])
+        _, regressions = benchmark.compare(benchmark.make_report([before]), [slower], tolerance=0.25)
+        self.assertEqual(regressions, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import bitboard
+import solution
+from tests import test_solution
+from utils import grid2values
+
+
+class TestBitboardConversions(unittest.TestCase):
+    grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def test_round_trip(self):
+        values = grid2values(self.grid)
+        self.assertEqual(bitboard.masks2values(bitboard.grid2masks(self.grid)), values)
+        self.assertEqual(bitboard.values2masks(values), bitboard.grid2masks(self.grid))
+
+    def test_peer_tables(self):
+        self.assertEqual(len(bitboard.UNITS), 29)
+        self.assertEqual(len(bitboard.PEERS[0]), 26)  # A1 lies on a diagonal
+        self.assertEqual(len(bitboard.PEERS[1]), 20)  # A2 does not
+
+
+class TestBitboardEngine(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def test_matches_dict_engine(self):
+        self.assertEqual(solution.solve(self.diagonal_grid, engine='bitboard'),
+                         solution.solve(self.diagonal_grid, engine='dict'))
+
+    def test_queue_propagation(self):
+        self.assertEqual(solution.solve(self.diagonal_grid, engine='bitboard', propagation='queue'),
+                         solution.solve(self.diagonal_grid))
+        self.assertFalse(bitboard.propagate(bitboard.grid2masks('22' + '.' * 79)))
+
+    def test_trail_backtracking(self):
+        for propagation in solution.PROPAGATIONS:
+            self.assertEqual(bitboard.solve(self.diagonal_grid, propagation, backtracking='trail'),
+                             solution.solve(self.diagonal_grid))
+        for propagation in solution.PROPAGATIONS:
+            masks = bitboard.grid2masks(self.diagonal_grid)
+            trail = []
+            bitboard.reduce_puzzle(masks, propagation, trail=trail)
+            before = bitboard.grid2masks(self.diagonal_grid)
+            # Only changes are recorded: masks only shrink, so every recorded mask is a
+            # strict superset of the final one, and a box's first record is its initial mask
+            entries = list(zip(trail[::2], trail[1::2]))
+            self.assertTrue(all(m != masks[i] and m | masks[i] == m for i, m in entries))
+            first = {}
+            for i, m in entries:
+                first.setdefault(i, m)
+            self.assertEqual(first, {i: m for i, m in enumerate(before) if m != masks[i]})
+            bitboard.undo(masks, trail, 0)
+            self.assertEqual((masks, trail), (before, []))
+
+    def test_naked_twins(self):
+        masks = bitboard.naked_twins(bitboard.values2masks(test_solution.TestNakedTwins.before_naked_twins_2))
+        self.assertIn(bitboard.masks2values(masks), test_solution.TestNakedTwins.possible_solutions_2)
+
+    def test_unsolvable(self):
+        self.assertFalse(solution.solve('22' + '.' * 79, engine='bitboard'))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            solution.solve(self.diagonal_grid, engine='numpy')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import random
+import unittest
+
+import generator
+import solution
+from geometry import DIAGONAL
+from tests.test_geometry import is_solution
+
+
+class TestGenerator(unittest.TestCase):
+
+    def test_random_solution(self):
+        rnd = random.Random(0)
+        grids = [generator.random_solution(rnd) for _ in range(3)]
+        self.assertEqual(len(set(grids)), 3)
+        for grid in grids:
+            self.assertTrue(is_solution(DIAGONAL, DIAGONAL.grid2values(grid)))
+
+    def test_generate(self):
+        for difficulty in ('easy', 'medium', (3, 20)):
+            puzzle, rating = generator.generate(random.Random(str(difficulty)), difficulty)
+            fewest, most = generator.DIFFICULTIES.get(difficulty, difficulty)
+            self.assertTrue(fewest <= rating <= most)
+            self.assertEqual(generator.rate(puzzle), rating)
+            self.assertEqual(solution.count_solutions(puzzle, engine='bitboard'), 1)
+
+    def test_generate_many_is_reproducible(self):
+        serial = list(generator.generate_many(3, 'medium', workers=1, seed=7, ordered=True))
+        parallel = list(generator.generate_many(3, 'medium', workers=2, seed=7, ordered=True))
+        self.assertEqual(serial, parallel)
+        self.assertEqual(len(set(serial)), 3)
+
+    def test_unknown_difficulty(self):
+        with self.assertRaises(ValueError):
+            next(generator.generate_many(1, 'fiendish'))
+
+
+if __name__ == '__main__':
+    unittest.main()
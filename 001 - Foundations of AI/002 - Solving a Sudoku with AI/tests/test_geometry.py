@@ -0,0 +1,73 @@
+import random
+import unittest
+
+import bitboard
+import geometry
+import solution
+
+
+def pattern_grid(board):
+    """A solved grid of any size, from the usual shifted-rows pattern"""
+    n, size = board.box_size, board.size
+    return ''.join(board.digits[(n * (r % n) + r // n + c) % size] for r in range(size) for c in range(size))
+
+
+def is_solution(board, values):
+    return all(sorted(values[box] for box in unit) == sorted(board.digits) for unit in board.unitlist)
+
+
+class TestGeometry(unittest.TestCase):
+
+    def test_matches_solution_tables(self):
+        self.assertEqual(geometry.DIAGONAL.unitlist, solution.unitlist)
+        self.assertEqual(geometry.DIAGONAL.peers, solution.peers)
+
+    def test_sizes(self):
+        for box_size in (2, 3, 4, 5):
+            board = geometry.Geometry(box_size)
+            size = box_size * box_size
+            self.assertEqual(len(board.boxes), size * size)
+            self.assertEqual(len(board.unitlist), 3 * size)
+            self.assertTrue(all(len(peers) == 3 * size - 2 * box_size - 1 for peers in board.peer_index))
+
+    def test_extra_units(self):
+        self.assertEqual(len(geometry.windoku_units(3)), 4)
+        self.assertEqual(geometry.windoku_units(3)[0][0], 'B2')
+        self.assertEqual(geometry.anti_diagonal_units(3), [['I1', 'H2', 'G3', 'F4', 'E5', 'D6', 'C7', 'B8', 'A9']])
+        with self.assertRaises(ValueError):
+            geometry.Geometry(3, [['A1', 'A1', 'A2']])
+
+    def test_pickle_reuses_geometry(self):
+        import pickle
+        self.assertIs(pickle.loads(pickle.dumps(geometry.DIAGONAL)), geometry.DIAGONAL)
+
+
+class TestLargeBoards(unittest.TestCase):
+
+    def check_solves(self, board, blanks):
+        solved = pattern_grid(board)
+        rnd = random.Random(board.size)
+        grid = ''.join('.' if rnd.random() < blanks else v for v in solved)
+        for propagation in solution.PROPAGATIONS:
+            values = solution.solve(grid, engine='bitboard', propagation=propagation, geometry=board)
+            self.assertTrue(is_solution(board, values))
+            self.assertTrue(all(v == '.' or v == values[box] for box, v in zip(board.boxes, grid)))
+
+    def test_16x16(self):
+        self.check_solves(geometry.Geometry(4), 0.5)
+
+    def test_25x25(self):
+        self.check_solves(geometry.Geometry(5), 0.35)
+
+    def test_windoku(self):
+        board = geometry.Geometry(3, geometry.windoku_units(3), name='windoku')
+        values = bitboard.solve('.' * 81, geometry=board)
+        self.assertTrue(is_solution(board, values))
+
+    def test_dict_engine_rejects_other_boards(self):
+        with self.assertRaises(ValueError):
+            solution.solve('.' * 81, geometry=geometry.STANDARD)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import solution
+
+try:
+    import PySudoku
+except ImportError:
+    PySudoku = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipIf(PySudoku is None, 'rendering requires pygame')
+class TestRender(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.history = solution.History()
+        self.result = solution.solve(self.diagonal_grid, history=self.history)
+
+    def test_png_frames(self):
+        path = os.path.join(self.directory, 'frames')
+        written = PySudoku.render(solution.grid2values(self.diagonal_grid), self.result, self.history, path,
+                                  step=20)
+        # The start, every 20th assignment and the solved board
+        self.assertEqual(len(written), 2 + (len(self.history) - 1) // 20)
+        self.assertEqual(written, sorted(os.path.join(path, name) for name in os.listdir(path)))
+
+    @unittest.skipIf(Image is None, 'GIF output requires Pillow')
+    def test_gif(self):
+        path = os.path.join(self.directory, 'replay.gif')
+        PySudoku.render(solution.grid2values(self.diagonal_grid), self.result, self.history, path, 'gif', step=10)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, PySudoku.SIZE)
+            self.assertEqual(image.n_frames, 2 + (len(self.history) - 1) // 10)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            PySudoku.render({}, self.result, self.history, self.directory, 'bmp')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ own additional test cases to cover any failed tests shown in the Project Assista
 import unittest
 
 import solution
+import utils
 
 
 class TestNakedTwins(unittest.TestCase):
@@ -99,6 +100,98 @@ class TestDiagonalSudoku(unittest.TestCase):
     def test_solve(self):
         self.assertEqual(solution.solve(self.diagonal_grid), self.solved_diag_sudoku)
 
+    def test_solve_queue_propagation(self):
+        self.assertEqual(solution.solve(self.diagonal_grid, propagation='queue'), self.solved_diag_sudoku)
+
+    def test_solve_trail_backtracking(self):
+        for propagation in solution.PROPAGATIONS:
+            result = solution.solve(self.diagonal_grid, propagation=propagation, backtracking='trail')
+            self.assertEqual(result, self.solved_diag_sudoku)
+            self.assertIs(type(result), dict)
+
+    def test_trail_undo(self):
+        for propagation in solution.PROPAGATIONS:
+            values = solution.grid2values(self.diagonal_grid)
+            before = dict(values)
+            trail = ['A1', '123456789']
+            solution.reduce_puzzle(values, propagation, trail=trail)
+            self.assertNotEqual(values, before)
+            # Only boxes that changed are recorded, each with the value it had
+            changed = trail[2::2]
+            self.assertTrue(all(values[box] != before[box] for box in changed))
+            self.assertEqual(set(changed), {box for box in values if values[box] != before[box]})
+            solution.undo(values, trail, 2)
+            self.assertEqual(values, before)
+            self.assertEqual(trail, ['A1', '123456789'])
+
+    def test_unknown_propagation(self):
+        with self.assertRaises(ValueError):
+            solution.solve(self.diagonal_grid, propagation='lazy')
+
+    def test_count_solutions(self):
+        for engine in solution.ENGINES:
+            self.assertEqual(solution.count_solutions(self.diagonal_grid, engine=engine), 1)
+            # Without its last clues the puzzle has many solutions
+            open_grid = self.diagonal_grid[:70] + '.' * 11
+            self.assertEqual(solution.count_solutions(open_grid, engine=engine), 2)
+            self.assertEqual(solution.count_solutions(open_grid, limit=5, engine=engine), 5)
+            self.assertEqual(solution.count_solutions('22' + self.diagonal_grid[2:], engine=engine), 0)
+
+    def test_iter_solutions(self):
+        open_grid = self.diagonal_grid[:70] + '.' * 11
+        for engine in solution.ENGINES:
+            solutions = list(solution.iter_solutions(open_grid, engine=engine, propagation='queue'))
+            self.assertEqual(solutions[0], solution.solve(open_grid, engine=engine))
+            self.assertEqual(len(set(solution.values2grid(values) for values in solutions)), len(solutions))
+
+    def test_history(self):
+        start = solution.grid2values(self.diagonal_grid)
+        for propagation in solution.PROPAGATIONS:
+            for backtracking in solution.BACKTRACKINGS:
+                history = solution.History()
+                solution.solve(self.diagonal_grid, propagation=propagation, backtracking=backtracking,
+                               history=history)
+                # Failed branches are dropped, so every step is part of the solution
+                self.assertTrue(all(self.solved_diag_sudoku[box] == value for box, value in history))
+                self.assertEqual(solution.reconstruct(self.solved_diag_sudoku, history), list(history))
+                *_, last = history.grids(start)
+                self.assertEqual(last, solution.values2grid(self.solved_diag_sudoku))
+        self.assertIsNone(utils._history)
+
+    def test_history_off(self):
+        history = solution.History()
+        with solution.recording(history):
+            solution.assign_value(solution.grid2values(self.diagonal_grid), 'A2', '6')
+            # A solve without a history of its own records nothing
+            solution.solve(self.diagonal_grid)
+        self.assertEqual(history, [('A2', '6')])
+        self.assertIsNone(utils._history)
+        with self.assertRaises(ValueError):
+            solution.solve(self.diagonal_grid, engine='bitboard', history=history)
+
+class TestSolveMany(unittest.TestCase):
+    grids = [TestDiagonalSudoku.diagonal_grid, '22' + '.' * 79] * 3
+
+    def test_input_order(self):
+        results = list(solution.solve_many(self.grids, workers=2, chunksize=1, engine='bitboard'))
+        self.assertEqual([grid for grid, _ in results], self.grids)
+        self.assertEqual([result for _, result in results],
+                         [TestDiagonalSudoku.solved_diag_sudoku, False] * 3)
+
+    def test_completion_order(self):
+        results = list(solution.solve_many(iter(self.grids), workers=2, chunksize=2, ordered=False))
+        self.assertCountEqual([grid for grid, _ in results], self.grids)
+        for grid, result in results:
+            self.assertEqual(result, solution.solve(grid))
+
+    def test_single_worker(self):
+        results = list(solution.solve_many(self.grids, workers=1))
+        self.assertEqual([result for _, result in results], [solution.solve(grid) for grid in self.grids])
+
+    def test_read_grids(self):
+        lines = ['# diagonal puzzles\n', '\n', TestDiagonalSudoku.diagonal_grid + '\n']
+        self.assertEqual(list(solution.read_grids(lines)), [TestDiagonalSudoku.diagonal_grid])
+
 
 if __name__ == '__main__':
     unittest.main()
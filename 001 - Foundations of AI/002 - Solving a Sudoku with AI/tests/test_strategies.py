@@ -0,0 +1,67 @@
+import unittest
+
+import bitboard
+import solution
+import strategies
+from geometry import STANDARD
+
+
+class TestPlugins(unittest.TestCase):
+    hard_grids = ['4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......',
+                  '52...6.........7.13...........4..8..6......5...........418.........3..2...87.....',
+                  '6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....',
+                  '48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....']
+
+    def test_plugins_keep_the_solution(self):
+        for grid in self.hard_grids:
+            solved = bitboard.values2masks(bitboard.solve(grid, geometry=STANDARD), STANDARD)
+            for name, plugin in strategies.PLUGINS.items():
+                masks = bitboard.propagate(bitboard.grid2masks(grid, STANDARD), geometry=STANDARD)
+                changed = plugin(masks, STANDARD)
+                self.assertIsNot(changed, False, name)
+                self.assertTrue(all(m & s for m, s in zip(masks, solved)), name)
+
+    def test_solve_with_plugins(self):
+        for grid in self.hard_grids:
+            expected = bitboard.solve(grid, geometry=STANDARD)
+            for propagation in solution.PROPAGATIONS:
+                result = bitboard.solve(grid, propagation, geometry=STANDARD, value_order='lcv',
+                                        strategies=tuple(strategies.PLUGINS))
+                self.assertEqual(result, expected)
+
+    def test_x_wing(self):
+        # Digit 1 only fits in columns 2 and 5 of rows A and D
+        masks = [STANDARD.all_digits] * 81
+        for r in (0, 3):
+            for c in range(9):
+                if c not in (1, 4):
+                    masks[r * 9 + c] &= ~1
+        changed = strategies.x_wing(masks, STANDARD)
+        self.assertEqual(sorted(changed), [r * 9 + c for r in (1, 2, 4, 5, 6, 7, 8) for c in (1, 4)])
+        self.assertFalse(masks[9 + 1] & 1)
+        self.assertTrue(masks[1] & 1)
+
+
+class TestSearchStats(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def test_solve_with_stats(self):
+        values, stats = solution.solve_with_stats(self.diagonal_grid, propagation='queue',
+                                                  strategies=('pointing_pairs',))
+        self.assertEqual(values, solution.solve(self.diagonal_grid))
+        self.assertGreaterEqual(stats.nodes, 1)
+        self.assertEqual(stats.nodes, stats.guesses + 1)
+        self.assertLessEqual(stats.backtracks, stats.guesses)
+        self.assertIn('propagate', stats.strategy_time)
+        self.assertIn('pointing_pairs', stats.strategy_changes)
+        self.assertGreater(stats.elapsed, 0)
+
+    def test_dict_engine_rejects_bitboard_options(self):
+        with self.assertRaises(ValueError):
+            solution.solve(self.diagonal_grid, strategies=('x_wing',))
+        with self.assertRaises(ValueError):
+            solution.solve(self.diagonal_grid, engine='bitboard', value_order='random')
+
+
+if __name__ == '__main__':
+    unittest.main()
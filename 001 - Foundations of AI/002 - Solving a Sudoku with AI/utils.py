@@ -1,7 +1,55 @@
+from contextlib import contextmanager
+
 rows = 'ABCDEFGHI'
 cols = '123456789'
 boxes = [r + c for r in rows for c in cols]
-history = {}  # history must be declared here so that it exists in the assign_values scope
+_history = None  # the History being recorded by assign_value, None when recording is off
+
+
+class History(list):
+    """The single-digit assignments of one solve, as (box, value) deltas in order
+
+    Storing deltas instead of full grids keeps recording to one append per
+    assignment; `grids` rebuilds the intermediate grids only when asked for.
+    """
+
+    def grids(self, values):
+        """Yield the grid string reached after each assignment, starting from `values`
+
+        Parameters
+        ----------
+        values(dict)
+            the starting board, in the form {'box_name': '123456789', ...}
+        """
+        grid = list(values2grid(values))
+        position = dict((box, i) for i, box in enumerate(boxes))
+        for box, value in self:
+            grid[position[box]] = value
+            yield ''.join(grid)
+
+
+@contextmanager
+def recording(history):
+    """Record the assignments made through `assign_value` into `history` for
+    the duration of the block; None switches recording off. The previous
+    recorder is restored on exit, so nothing outlives the solve."""
+    global _history
+    previous, _history = _history, history
+    try:
+        yield history
+    finally:
+        _history = previous
+
+
+def history_mark():
+    """Return the current length of the active history, see `history_undo`"""
+    return len(_history) if _history is not None else 0
+
+
+def history_undo(mark):
+    """Forget the assignments recorded since `mark`, e.g. on a failed search branch"""
+    if _history is not None:
+        del _history[mark:]
 
 
 def assign_value(values, box, value):
@@ -23,10 +71,9 @@ def assign_value(values, box, value):
     if values[box] == value:
         return values
 
-    prev = values2grid(values)
     values[box] = value
-    if len(value) == 1:
-        history[values2grid(values)] = (prev, (box, value))
+    if _history is not None and len(value) == 1:
+        _history.append((box, value))
     return values
 
 
@@ -107,10 +154,11 @@ def reconstruct(values, history):
     values(dict)
         a dictionary of the form {'box_name': '123456789', ...}
 
-    history(dict)
-        a dictionary of the form {key: (key, (box, value))} encoding a linked
-        list where each element points to the parent and identifies the value
-        assignment that connects from the parent to the current state
+    history(History or dict)
+        the `History` recorded while solving, or a dictionary of the form
+        {key: (key, (box, value))} encoding a linked list where each element
+        points to the parent and identifies the value assignment that connects
+        from the parent to the current state
 
     Returns
     -------
@@ -118,6 +166,8 @@ def reconstruct(values, history):
         a list of (box, value) assignments that can be applied in order to the
         starting Sudoku puzzle to reach the solution
     """
+    if isinstance(history, History):
+        return list(history)
     path = []
     prev = values2grid(values)
     while prev in history:
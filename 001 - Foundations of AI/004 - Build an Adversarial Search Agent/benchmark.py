@@ -0,0 +1,114 @@
+"""Measure the search speed of the Isolation agents by board size.
+
+For each board size the benchmark plays a few random openings and, from
+each position, times a fixed-depth alpha-beta search (nodes per second,
+counted by `AlphaBetaPlayer.stats`) and random playouts to the end of the
+game (`Board.playout`, playouts per second).
+
+    python benchmark.py --sizes 7x7 10x10 15x15 20x20 --depth 6
+"""
+import argparse
+import random
+import time
+
+from isolation import Board
+from game_agent import AlphaBetaPlayer, custom_score_2
+
+SIZES = ("7x7", "10x10", "15x15", "20x20", "9x15")
+
+
+def parse_size(size):
+    """Return the (width, height) of a "WxH" string."""
+    try:
+        width, height = (int(n) for n in size.lower().split("x"))
+    except ValueError:
+        raise ValueError("Board sizes are written WxH, e.g. 7x7, got {!r}".format(size))
+    return width, height
+
+
+def positions(width, height, count, plies, seed):
+    """Return `count` positions after `plies` random moves."""
+    rnd = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        player = AlphaBetaPlayer(score_fn=custom_score_2)
+        board = Board(player, AlphaBetaPlayer(score_fn=custom_score_2), width, height, seed=rnd.random())
+        for _ in range(plies):
+            if not board.get_legal_moves():
+                break
+            board.apply_move(rnd.choice(board.get_legal_moves()))
+        if board.get_legal_moves():
+            boards.append(board)
+    return boards
+
+
+def bench_size(width, height, depth=6, count=5, plies=4, playouts=200, seed=0):
+    """Benchmark one board size.
+
+    Parameters
+    ----------
+    width, height : int
+        The board size.
+
+    depth : int (optional)
+        The depth of the alpha-beta searches, which are iterative deepening
+        from depth 1 with a fresh transposition table.
+
+    count : int (optional)
+        The number of positions.
+
+    plies : int (optional)
+        The random moves played to reach each position.
+
+    playouts : int (optional)
+        The random playouts run from each position.
+
+    seed : int (optional)
+        The seed of the positions.
+
+    Returns
+    -------
+    dict
+        nodes and nodes_per_sec of the searches, and playouts_per_sec.
+    """
+    nodes = 0
+    search_time = playout_time = 0.
+    for board in positions(width, height, count, plies, seed):
+        player = board.active_player
+        player.time_left = lambda: float("inf")
+        start = time.perf_counter()
+        for search_depth in range(1, depth + 1):
+            player.alphabeta(board, search_depth)
+        search_time += time.perf_counter() - start
+        nodes += sum(stats.nodes for stats in player.stats)
+
+        start = time.perf_counter()
+        for _ in range(playouts):
+            board.playout()
+        playout_time += time.perf_counter() - start
+    return {"nodes": nodes, "nodes_per_sec": nodes / search_time,
+            "playouts_per_sec": count * playouts / playout_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Isolation search speed by board size.")
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="board sizes as WxH (default: {})".format(
+        " ".join(SIZES)))
+    parser.add_argument("--depth", type=int, default=6, help="alpha-beta search depth (default 6)")
+    parser.add_argument("--positions", type=int, default=5, help="positions per size (default 5)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the positions (default 0)")
+    args = parser.parse_args(argv)
+
+    print("{:>7} {:>10} {:>12} {:>12}".format("board", "nodes", "nodes/s", "playouts/s"))
+    results = {}
+    for size in args.sizes:
+        width, height = parse_size(size)
+        result = bench_size(width, height, args.depth, args.positions, seed=args.seed)
+        results[size] = result
+        print("{:>7} {:>10} {:>12.0f} {:>12.0f}".format(size, result["nodes"], result["nodes_per_sec"],
+                                                          result["playouts_per_sec"]))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,11 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
-import random
+import opening_book
+from game_agent import AlphaBetaPlayer
+
+# Cells left blank when the agent starts solving the game exactly
+ENDGAME_BLANKS = 24
 
 
 class SearchTimeout(Exception):
@@ -33,13 +37,23 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    own_moves, opp_moves, _, utility = game.evaluate(player)
+    if utility:
+        return utility
+
+    # Chase the opponent's mobility harder as the board fills up
+    filled = game.move_count / float(game.width * game.height)
+    return float(own_moves - (1. + 2. * filled) * opp_moves)
 
 
-class CustomPlayer:
+class CustomPlayer(AlphaBetaPlayer):
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
+    It plays from the opening book while the position is in it, solves the
+    game exactly in the endgame and otherwise searches with iterative
+    deepening alpha-beta, see `game_agent.AlphaBetaPlayer`.
+
     You must at least implement the get_move() method and a search function
     to complete this class, but you may use any of the techniques discussed
     in lecture or elsewhere on the web -- opening books, MCTS, etc.
@@ -51,20 +65,25 @@ class CustomPlayer:
 
     Parameters
     ----------
-    data : string
-        The name of the search method to use in get_move().
+    data : string (optional)
+        The path of the opening book (see `opening_book.load_book`); the
+        bundled book by default. The book must have been built with this
+        module's custom_score.
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted.  Note that
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    telemetry : callable (optional)
+        Per-move telemetry hook, see `game_agent.AlphaBetaPlayer`.
     """
 
-    def __init__(self, data=None, timeout=1.):
-        self.score = custom_score
-        self.time_left = None
-        self.TIMER_THRESHOLD = timeout
+    def __init__(self, data=None, timeout=1., telemetry=None):
+        book = opening_book.load_book(data or opening_book.BOOK_FILE, score_fn=custom_score)
+        super().__init__(score_fn=custom_score, timeout=timeout, book=book, endgame_blanks=ENDGAME_BLANKS,
+                         telemetry=telemetry)
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +112,4 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        return super().get_move(game, time_left)
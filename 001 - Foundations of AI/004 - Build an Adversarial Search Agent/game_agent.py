@@ -2,6 +2,14 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import json
+
+from collections import namedtuple
+from math import log, sqrt
+
+import opening_book
+from isolation import endgame
+from isolation.isolation import _popcount
 
 
 class SearchTimeout(Exception):
@@ -13,6 +21,12 @@ def distance(position_1: tuple, position_2: tuple) -> float:
     return ((position_1[0] - position_2[0]) ** 2 + (position_1[1] - position_2[1]) ** 2) ** (1 / 2)
 
 
+# Game phases of custom_score_2 and custom_score_3, as the fraction of the
+# board still blank: the thresholds of 40 and 30 blank cells of the 7x7 board
+OPEN_BLANKS = 40. / 49
+MID_BLANKS = 30. / 49
+
+
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -38,14 +52,10 @@ def custom_score(game, player):
         The heuristic value of the current game state to the specified player.
     """
 
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, _, utility = game.evaluate(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return round(own_moves - 2. * opp_moves, 2)
 
 
@@ -72,22 +82,18 @@ def custom_score_2(game, player):
         The heuristic value of the current game state to the specified player.
     """
 
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, opp_moves, free_spaces, utility = game.evaluate(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    free_spaces = len(game.get_blank_spaces())
-    if free_spaces >= 40:
+    cells = game.width * game.height
+    if free_spaces >= OPEN_BLANKS * cells:
         coef_depth = 0.5
-    elif free_spaces >= 30:
+    elif free_spaces >= MID_BLANKS * cells:
         coef_depth = 1
     else:
         coef_depth = 1.5
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return round(own_moves - 2. * coef_depth * opp_moves, 2)
 
 
@@ -114,30 +120,232 @@ def custom_score_3(game, player):
         The heuristic value of the current game state to the specified player.
     """
 
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, free_spaces, utility = game.evaluate(player)
+    if utility:
+        return utility
 
-    free_spaces = len(game.get_blank_spaces())
     distance_players = distance(game.get_player_location(game.active_player),
                                 game.get_player_location(game.inactive_player))
-    if free_spaces >= 40:
+    cells = game.width * game.height
+    if free_spaces >= OPEN_BLANKS * cells:
         coef_depth = 0.5
         coef_dist = 1
-    elif free_spaces >= 30:
+    elif free_spaces >= MID_BLANKS * cells:
         coef_depth = 1
         coef_dist = 2
     else:
         coef_depth = 1.5
         coef_dist = 3
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return round(own_moves - (2. * coef_depth * opp_moves + coef_dist * distance_players), 2)
 
 
+class WeightedScore:
+    """`custom_score_3` with its coefficients as parameters, for tuning (see
+    tune.py). Instances are plain picklable objects, so players using them
+    can be sent to worker processes.
+
+    The game has three phases, by the fraction of the board still blank: at
+    least `open_blanks`, at least `mid_blanks`, and less. In each phase the score
+    is own_moves - 2 * coef_depth * opp_moves - coef_dist * distance between
+    the players, with that phase's coefficients; `custom_score_2` is the
+    special case where every coef_dist is 0.
+
+    Parameters
+    ----------
+    params : sequence<float> (optional)
+        The values of `PARAMETERS`, in order; `DEFAULTS` (the coefficients
+        of `custom_score_3`) if None.
+    """
+    PARAMETERS = ("coef_depth_open", "coef_depth_mid", "coef_depth_late",
+                  "coef_dist_open", "coef_dist_mid", "coef_dist_late",
+                  "open_blanks", "mid_blanks")
+    DEFAULTS = (0.5, 1., 1.5, 1., 2., 3., OPEN_BLANKS, MID_BLANKS)
+
+    def __init__(self, params=None):
+        params = tuple(self.DEFAULTS if params is None else params)
+        if len(params) != len(self.PARAMETERS):
+            raise ValueError("Expected {} parameters, got {}".format(len(self.PARAMETERS), len(params)))
+        self.params = params
+
+    def __repr__(self):
+        return "WeightedScore({!r})".format(self.params)
+
+    def __call__(self, game, player):
+        own_moves, opp_moves, free_spaces, utility = game.evaluate(player)
+        if utility:
+            return utility
+
+        depth_open, depth_mid, depth_late, dist_open, dist_mid, dist_late, open_blanks, mid_blanks = self.params
+        distance_players = distance(game.get_player_location(game.active_player),
+                                    game.get_player_location(game.inactive_player))
+        cells = game.width * game.height
+        if free_spaces >= open_blanks * cells:
+            coef_depth, coef_dist = depth_open, dist_open
+        elif free_spaces >= mid_blanks * cells:
+            coef_depth, coef_dist = depth_mid, dist_mid
+        else:
+            coef_depth, coef_dist = depth_late, dist_late
+        return own_moves - (2. * coef_depth * opp_moves + coef_dist * distance_players)
+
+
+# Alpha-beta time control: the clock is read about once per CLOCK_INTERVAL
+# milliseconds of search, and at least every MAX_CHECK_EVERY nodes
+CLOCK_INTERVAL = 1.
+MAX_CHECK_EVERY = 1024
+# Largest growth factor of the time of an iterative deepening iteration from
+# one depth to the next assumed when predicting whether it can finish. The
+# measured factor is noisy, and stopping too early costs a depth while
+# starting an iteration that times out only costs the idle rest of the turn
+MAX_GROWTH = 1.5
+
+# Bound types of transposition table values
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    """Fixed-size transposition table for alpha-beta search.
+
+    Each slot holds one (key, depth, bound, value, move, age) entry and a
+    key maps to slot `key % size`. A new entry replaces the one in its slot
+    when that slot is empty, was written during an earlier call to
+    `new_search` (i.e. for an earlier move of the game), or holds a result
+    searched no deeper than the new one.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots; memory use is bounded by this many entries.
+    """
+
+    def __init__(self, size=2 ** 16):
+        if size < 1:
+            raise ValueError("The table needs at least one slot, got {}".format(size))
+        self.size = size
+        self.entries = [None] * size
+        self.age = 0
+        # Lookups and successful lookups since the last new_search
+        self.probes = self.hits = 0
+
+    def new_search(self):
+        """Mark every stored entry as old, so the next search may replace it,
+        and reset the lookup counters."""
+        self.age += 1
+        self.probes = self.hits = 0
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups since the last new_search that found their key."""
+        return self.hits / self.probes if self.probes else 0.
+
+    def probe(self, key):
+        """Return the (depth, bound, value, move) stored for a key, or None.
+
+        Parameters
+        ----------
+        key : int
+            The key of the position, see `AlphaBetaPlayer.key`.
+
+        Returns
+        -------
+        (int, int, float, (int, int)) or None
+            The remaining depth the value was searched to, its bound type
+            (EXACT, LOWER or UPPER), the value and the best move found.
+        """
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:5]
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        """Record a search result, subject to the replacement policy.
+
+        Parameters
+        ----------
+        key : int
+            The key of the position.
+
+        depth : int
+            The remaining depth the position was searched to.
+
+        bound : int
+            EXACT, LOWER (the value is a lower bound, after a beta cutoff) or
+            UPPER (an upper bound, when no move raised alpha).
+
+        value : float
+            The value found.
+
+        move : (int, int)
+            The best move found.
+        """
+        slot = key % self.size
+        entry = self.entries[slot]
+        if entry is None or entry[5] != self.age or depth >= entry[1]:
+            self.entries[slot] = (key, depth, bound, value, move, self.age)
+
+
+def bound_type(value, alpha, beta):
+    """Return the bound type of a value searched with the window (alpha, beta)."""
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+class DepthStats(namedtuple("DepthStats", ["depth", "nodes", "expanded", "cutoffs", "first_cutoffs"])):
+    """Search counters of one completed iterative deepening iteration.
+
+    depth is the iteration's search depth, nodes the number of nodes visited
+    (leaves included), expanded the number of nodes whose moves were
+    searched, cutoffs how many of those stopped early on an alpha or beta
+    cutoff and first_cutoffs how many stopped on their first move.
+    """
+    __slots__ = ()
+
+    @property
+    def cutoff_rate(self):
+        """The fraction of expanded nodes that were cut off."""
+        return self.cutoffs / self.expanded if self.expanded else 0.
+
+    @property
+    def first_cutoff_rate(self):
+        """The fraction of cutoffs caused by the first move searched, a measure of move ordering quality."""
+        return self.first_cutoffs / self.cutoffs if self.cutoffs else 0.
+
+    def __str__(self):
+        return "depth {}: {} nodes, {:.1%} cutoffs ({:.1%} on the first move)".format(
+            self.depth, self.nodes, self.cutoff_rate, self.first_cutoff_rate)
+
+
+class JsonLinesTelemetry:
+    """Telemetry hook that appends every record to a file as one line of JSON.
+
+    The file is opened for each record, in append mode, so the hook can be
+    pickled with its player and shared by the processes of a parallel
+    tournament: each line is written by a single small write.
+
+    Parameters
+    ----------
+    path : str
+        The file to append to.
+
+    **fields
+        Constant fields added to every record, e.g. the name of the agent.
+    """
+
+    def __init__(self, path, **fields):
+        self.path = path
+        self.fields = fields
+
+    def __call__(self, record):
+        record = dict(self.fields, **record)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
     constructed or tested directly.
@@ -184,9 +392,13 @@ class MinimaxPlayer(IsolationPlayer):
 
         if game.is_loser(game.active_player) or not depth:  # Terminal condition
             return self.score(game, self)
-        else:
-            return min([self.max_value(game=game.forecast_move(legal_move), depth=depth - 1)
-                        for legal_move in game.get_legal_moves()])
+
+        v = float("inf")
+        for legal_move in game.get_legal_moves():
+            game.apply_move(legal_move)
+            v = min(v, self.max_value(game=game, depth=depth - 1))
+            game.undo_move()
+        return v
 
     def max_value(self, game, depth):
         """ Return the value for a loss (- inf) if the game is over, otherwise return the maximum value over all
@@ -197,9 +409,13 @@ class MinimaxPlayer(IsolationPlayer):
 
         if game.is_loser(game.active_player) or not depth:  # Terminal condition
             return self.score(game, self)
-        else:
-            return max([self.min_value(game=game.forecast_move(legal_move), depth=depth - 1)
-                        for legal_move in game.get_legal_moves()])
+
+        v = float("-inf")
+        for legal_move in game.get_legal_moves():
+            game.apply_move(legal_move)
+            v = max(v, self.min_value(game=game, depth=depth - 1))
+            game.undo_move()
+        return v
 
     # Provided Functions
     def get_move(self, game, time_left):
@@ -293,53 +509,211 @@ class MinimaxPlayer(IsolationPlayer):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
-        return max(game.get_legal_moves(),
-                   key=lambda move: self.min_value(game=game.forecast_move(move), depth=depth - 1))
+        # Search on a private copy with apply_move/undo_move, so that a
+        # timeout part way through never leaves the caller's board modified
+        board = game.copy()
+        best_move = (-1, -1)
+        best_value = float("-inf")
+        for legal_move in board.get_legal_moves():
+            board.apply_move(legal_move)
+            value = self.min_value(game=board, depth=depth - 1)
+            board.undo_move()
+            if value > best_value or best_move == (-1, -1):
+                best_move = legal_move
+                best_value = value
+        return best_move
 
 
 class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    table_size : int (optional)
+        The number of slots of the transposition table.
+
+    book : dict (optional)
+        An opening book (see `opening_book.load_book`); positions found in
+        it are played without searching.
+
+    endgame_blanks : int (optional)
+        Solve the game exactly (see `isolation.endgame`) once at most this
+        many cells are blank or the players' regions have separated. None
+        (the default) never uses the solver.
+
+    telemetry : callable (optional)
+        Called at the end of every get_move with a dict describing the move:
+        move_count, move, source (book, endgame, search or none), depth (the
+        deepest completed iteration), nodes, nodes_per_sec, tt_hit_rate,
+        elapsed_ms, time_left_ms and threshold_ms. See `JsonLinesTelemetry`
+        to log them. None (the default) records nothing.
+
+    predict_depth : bool (optional)
+        Stop iterative deepening when the time the next iteration is
+        expected to take, extrapolated from the growth between the last two
+        iterations, would run past the threshold, instead of starting it and
+        throwing it away at the timeout.
+
+    The search reads the clock every `check_every` nodes rather than at every
+    node, with check_every adapted to the measured node rate (see
+    `check_time`).
+
+    See `IsolationPlayer` for the other parameters.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., table_size=2 ** 16, book=None,
+                 endgame_blanks=None, telemetry=None, predict_depth=True):
+        super().__init__(search_depth, score_fn, timeout)
+        self.book = book
+        self.endgame_blanks = endgame_blanks
+        self.telemetry = telemetry
+        self.predict_depth = predict_depth
+        self.table = TranspositionTable(table_size)
+        self.seat = 0
+        # Move ordering state: two killer moves per ply and a history score per move for each seat
+        self.killers = []
+        self.history = ({}, {})
+        self.root_depth = 0
+        # Search counters, and a DepthStats for every iteration completed in the last get_move
+        self.nodes = self.expanded = self.cutoffs = self.first_cutoffs = 0
+        self.stats = []
+        # Time control: nodes left until the next clock reading, the nodes between readings and the time left
+        # at the last reading; see check_time
+        self.countdown = self.check_every = 1
+        self.last_time_left = None
+        # Value of the root for the last completed iteration
+        self.root_value = None
+
     # Helper functions
+    def key(self, game):
+        """ Return the transposition table key of a position: the board's Zobrist hash and the seat of this
+        player, since the scores stored are from this player's point of view. """
+        return game.hash() << 1 | self.seat
+
+    def probe(self, game, depth, alpha, beta):
+        """ Look the position up in the transposition table. Return (value, move): value is the stored value if
+        it was searched deep enough to settle this node for the (alpha, beta) window, otherwise None; move is
+        the best move stored, to be searched first, or None. """
+        entry = self.table.probe(self.key(game))
+        if entry is None:
+            return None, None
+        stored_depth, bound, value, move = entry
+        if stored_depth >= depth and (bound == EXACT or (bound == LOWER and value >= beta) or
+                                      (bound == UPPER and value <= alpha)):
+            return value, move
+        return None, move
+
+    def ordered_moves(self, game, depth, first_move):
+        """ Return the legal moves of the active player, best candidates first: first_move (the transposition
+        table's best move, i.e. the principal variation of the previous iteration), then the killer moves of
+        this ply, then the other moves by history score and finally by the opponent's mobility after the
+        move, i.e. moves onto one of the opponent's own destinations first. """
+        legal_moves = game.get_legal_moves()
+        if len(legal_moves) < 2:
+            return legal_moves
+        killers = self.killers[self.root_depth - depth]
+        history = self.history[game.move_count & 1]
+        opponent_moves = game.get_legal_moves(game.inactive_player)
+        legal_moves.sort(key=lambda move: (move != first_move, move not in killers, -history.get(move, 0),
+                                           move not in opponent_moves))
+        return legal_moves
+
+    def check_time(self):
+        """ Read the clock and raise SearchTimeout once the time left is below the threshold. Otherwise set the
+        number of nodes to search before the next reading from the node rate measured since the last one, so
+        the clock is read about every CLOCK_INTERVAL ms, and never later than halfway to the threshold. """
+        time_left = self.time_left()
+        if time_left < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        elapsed = None if self.last_time_left is None else self.last_time_left - time_left
+        if elapsed is not None and elapsed > 0:
+            rate = self.check_every / elapsed  # nodes per ms
+            check_every = rate * min(CLOCK_INTERVAL, (time_left - self.TIMER_THRESHOLD) / 2)
+        else:
+            # No time measurable yet: read the clock twice as rarely
+            check_every = 2 * self.check_every
+        self.check_every = self.countdown = max(1, min(int(check_every), MAX_CHECK_EVERY))
+        self.last_time_left = time_left
+
+    def record_cutoff(self, game, depth, move, index):
+        """ Update the counters, killer moves and history scores after `move`, the index-th move searched,
+        caused a cutoff at a node with `depth` plies left. """
+        self.cutoffs += 1
+        if not index:
+            self.first_cutoffs += 1
+        killers = self.killers[self.root_depth - depth]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[game.move_count & 1]
+        history[move] = history.get(move, 0) + depth * depth
+
     def min_value(self, game, depth, alpha, beta):
         """ Return the value for a win (+inf) if the game is over, otherwise return the minimum value over all
         legal child nodes. """
 
-        if self.time_left() < self.TIMER_THRESHOLD:  # Timer check
-            raise SearchTimeout()
+        self.countdown -= 1
+        if not self.countdown:  # Timer check, every check_every nodes
+            self.check_time()
 
+        self.nodes += 1
         if game.is_loser(game.active_player) or not depth:  # Terminal condition
             return self.score(game, self)
 
+        value, tt_move = self.probe(game, depth, alpha, beta)
+        if value is not None:
+            return value
+
+        self.expanded += 1
         v = float("inf")
-        for legal_move in game.get_legal_moves():
-            v = min(v, self.max_value(game=game.forecast_move(legal_move), depth=depth - 1, alpha=alpha,
-                                      beta=beta))
+        best_move = None
+        alpha_0, beta_0 = alpha, beta
+        for index, legal_move in enumerate(self.ordered_moves(game, depth, tt_move)):
+            game.apply_move(legal_move)
+            value = self.max_value(game=game, depth=depth - 1, alpha=alpha, beta=beta)
+            game.undo_move()
+            if value < v or best_move is None:
+                v, best_move = value, legal_move
             if v <= alpha:
-                return v
+                self.record_cutoff(game, depth, legal_move, index)
+                break
             beta = min(beta, v)
+        self.table.store(self.key(game), depth, bound_type(v, alpha_0, beta_0), v, best_move)
         return v
 
     def max_value(self, game, depth, alpha, beta):
         """ Return the value for a win (-inf) if the game is over, otherwise return the minimum value over all
                 legal child nodes. """
 
-        if self.time_left() < self.TIMER_THRESHOLD:  # Timer check
-            raise SearchTimeout()
+        self.countdown -= 1
+        if not self.countdown:  # Timer check, every check_every nodes
+            self.check_time()
 
+        self.nodes += 1
         if game.is_loser(game.active_player) or not depth:  # Terminal condition
             return self.score(game, self)
 
+        value, tt_move = self.probe(game, depth, alpha, beta)
+        if value is not None:
+            return value
+
+        self.expanded += 1
         v = float("-inf")
-        for legal_move in game.get_legal_moves():
-            v = max(v, self.min_value(game=game.forecast_move(legal_move), depth=depth - 1, alpha=alpha,
-                                      beta=beta))
+        best_move = None
+        alpha_0, beta_0 = alpha, beta
+        for index, legal_move in enumerate(self.ordered_moves(game, depth, tt_move)):
+            game.apply_move(legal_move)
+            value = self.min_value(game=game, depth=depth - 1, alpha=alpha, beta=beta)
+            game.undo_move()
+            if value > v or best_move is None:
+                v, best_move = value, legal_move
             if v >= beta:
-                return v
+                self.record_cutoff(game, depth, legal_move, index)
+                break
             alpha = max(alpha, v)
+        self.table.store(self.key(game), depth, bound_type(v, alpha_0, beta_0), v, best_move)
         return v
 
     # Provided Functions
@@ -374,26 +748,95 @@ class AlphaBetaPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        start = time_left()
+        # Entries from earlier moves stay usable, but may now be replaced
+        self.table.new_search()
+        self.stats = []
+        self.nodes = 0
+        # Older history scores count for less
+        for history in self.history:
+            for move in history:
+                history[move] //= 2
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         legal_moves = game.get_legal_moves()
         if not legal_moves:
-            return -1, -1
+            return self.report(game, start, (-1, -1), "none")
         else:
             best_move = legal_moves[0]
 
+        if self.book:
+            move = opening_book.book_move(self.book, game)
+            if move in legal_moves:
+                return self.report(game, start, move, "book")
+
+        if self.endgame_blanks is not None and endgame.in_endgame(game, self.endgame_blanks):
+            # The solver gets half of the time left; if it runs out, search as usual
+            budget = (self.time_left() + self.TIMER_THRESHOLD) / 2
+            try:
+                value, move = endgame.solve(game, expired=lambda: self.time_left() < budget)
+                # Every move loses against perfect play unless the opponent errs, which the
+                # heuristic search is better at provoking, except once the regions are separate
+                if value > 0 or endgame.is_separated(game):
+                    return self.report(game, start, move, "endgame")
+            except endgame.SolverTimeout:
+                pass
+
+        # Read the clock at the first node, then as often as the node rate requires
+        self.countdown = self.check_every = 1
+        self.last_time_left = None
         try:
+            iteration_start, spent_before = self.time_left(), []
             for depth in range(1, 1000):
                 # The try/except block will automatically catch the exception
                 # raised when the timer is about to expire.
+                self.nodes = 0
                 best_move = self.alphabeta(game, depth=depth)
+                # A won or lost root will not change with depth
+                if self.root_value in (float("inf"), float("-inf")):
+                    break
+                # Do not start an iteration that is not expected to finish. Iterations take longer by a
+                # roughly constant factor per depth, measured over two depths since odd and even depths differ
+                now = self.time_left()
+                spent = iteration_start - now
+                if self.predict_depth and len(spent_before) >= 2 and spent_before[-2] > 0:
+                    growth = min(max(1., (spent / spent_before[-2]) ** .5), MAX_GROWTH)
+                    if now - spent * growth < self.TIMER_THRESHOLD:
+                        break
+                iteration_start = now
+                spent_before.append(spent)
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
 
         # Return the best move from the last completed search iteration
-        return best_move
+        return self.report(game, start, best_move, "search")
+
+    def report(self, game, start, move, source):
+        """ Send the telemetry record of a move to self.telemetry, if set, and return the move. start is the time
+        left when get_move was called and source how the move was chosen: "book", "endgame", "search" or "none"
+        (no legal move). """
+        if self.telemetry is None:
+            return move
+        time_left = self.time_left()
+        elapsed = start - time_left
+        # The iteration that timed out, if any, searched self.nodes nodes on top of the completed ones
+        completed = sum(stats.nodes for stats in self.stats)
+        nodes = completed + (self.nodes if source == "search" else 0)
+        self.telemetry({
+            "move_count": game.move_count,
+            "move": list(move),
+            "source": source,
+            "depth": self.stats[-1].depth if self.stats else 0,
+            "nodes": nodes,
+            "nodes_per_sec": round(1000. * nodes / elapsed) if elapsed > 0 else None,
+            "tt_hit_rate": round(self.table.hit_rate, 4),
+            "elapsed_ms": round(elapsed, 3),
+            "time_left_ms": round(time_left, 3),
+            "threshold_ms": self.TIMER_THRESHOLD,
+        })
+        return move
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
@@ -446,16 +889,214 @@ class AlphaBetaPlayer(IsolationPlayer):
         if game.is_loser(game.active_player) or not depth:  # Terminal condition
             return self.score(game, self)
 
+        # Search on a private copy with apply_move/undo_move, see MinimaxPlayer.minimax
+        board = game.copy()
+        # The player to move at the root is this player, whose scores the table holds
+        self.seat = board.move_count % 2
+        _, tt_move = self.probe(board, depth, alpha, beta)
+        self.root_depth = depth
+        self.killers = [[None, None] for _ in range(depth + 1)]
+        self.nodes, self.expanded, self.cutoffs, self.first_cutoffs = 1, 1, 0, 0
+
         best_move = (-1, -1)
         best_value = float("-inf")
-        for legal_move in game.get_legal_moves():
-            value = self.min_value(game=game.forecast_move(legal_move), depth=depth - 1, alpha=alpha, beta=beta)
-
-            if value > best_value:
+        alpha_0 = alpha
+        for legal_move in self.ordered_moves(board, depth, tt_move):
+            board.apply_move(legal_move)
+            value = self.min_value(game=board, depth=depth - 1, alpha=alpha, beta=beta)
+            board.undo_move()
+
+            # A lost position still returns a legal move
+            if value > best_value or best_move == (-1, -1):
                 best_move = legal_move
                 best_value = value
 
             if value >= beta:
-                return best_move
+                break
             alpha = max(alpha, value)
+        if best_move != (-1, -1):
+            self.table.store(self.key(board), depth, bound_type(best_value, alpha_0, beta), best_value, best_move)
+        self.root_value = best_value
+        self.stats.append(DepthStats(depth, self.nodes, self.expanded, self.cutoffs, self.first_cutoffs))
         return best_move
+
+
+def mobility_rollout(cells, blanks, opponent, move_masks, rng):
+    """Rollout policy for `isolation.Board.playout` that plays like
+    `improved_score`: it takes the move that maximises the mover's replies
+    minus the opponent's, breaking ties at random."""
+    best, best_cells = None, []
+    for idx in cells:
+        left = blanks & ~(1 << idx)
+        value = _popcount(move_masks[idx] & left)
+        if opponent is not None:
+            value -= _popcount(move_masks[opponent] & left)
+        if best is None or value > best:
+            best, best_cells = value, [idx]
+        elif value == best:
+            best_cells.append(idx)
+    return rng.choice(best_cells)
+
+
+# Rollout policies by name; None is the uniform random playout of the board
+ROLLOUT_POLICIES = {"random": None, "mobility": mobility_rollout}
+
+
+class MCTSNode:
+    """Node of the Monte Carlo search tree.
+
+    wins and visits count the simulations through the node, wins from the
+    point of view of the player who made `move`, i.e. the inactive player
+    of the node's position. `untried` holds the legal moves of the position
+    that have no child yet.
+    """
+    __slots__ = ("move", "parent", "children", "untried", "wins", "visits")
+
+    def __init__(self, move, parent, untried):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.wins = 0
+        self.visits = 0
+
+    def select_child(self, exploration):
+        """Return the child with the highest UCB1 score."""
+        scale = exploration * sqrt(log(self.visits))
+        return max(self.children, key=lambda child: child.wins / child.visits + scale / sqrt(child.visits))
+
+
+class MCTSPlayer(IsolationPlayer):
+    """Game-playing agent that chooses a move with Monte Carlo tree search
+    (UCT): it grows a game tree one node per simulation, selecting children
+    by UCB1 and scoring new nodes with a random playout to the end of the
+    game, until the time runs out.
+
+    The playouts run on the bitboards of the position (see
+    `isolation.Board.playout`) and the tree is walked with apply_move and
+    undo_move on one copy of the board, so a simulation allocates no Board.
+    The subtree of the position reached after the opponent's reply is kept
+    for the next move.
+
+    Parameters
+    ----------
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted.
+
+    exploration : float (optional)
+        The exploration constant of UCB1.
+
+    rollout : str or callable (optional)
+        The playout policy: "random", "mobility" (see `mobility_rollout`)
+        or a policy callable as described in `isolation.Board.playout`.
+
+    iterations : int (optional)
+        Stop after this many simulations even if time is left. None (the
+        default) only stops on time.
+
+    reuse_tree : bool (optional)
+        Keep the relevant subtree of the previous search.
+    """
+
+    def __init__(self, timeout=10., exploration=sqrt(2), rollout="random", iterations=None, reuse_tree=True):
+        super().__init__(timeout=timeout)
+        if not callable(rollout):
+            if rollout not in ROLLOUT_POLICIES:
+                raise ValueError("Unknown rollout policy {!r}, expected one of {}".format(
+                    rollout, sorted(ROLLOUT_POLICIES)))
+            rollout = ROLLOUT_POLICIES[rollout]
+        self.rollout = rollout
+        self.exploration = exploration
+        self.iterations = iterations
+        self.reuse_tree = reuse_tree
+        # Root of the last search, and the subtree kept for the next one with the hash of its position
+        self.root = None
+        self.subtree = None
+        self.subtree_hash = None
+        self.simulations = 0
+
+    def reuse(self, game):
+        """ Return the node of the kept subtree for the position of `game`, detached from its parent, or None if
+        the position is not the kept one followed by one move. """
+        if self.subtree is None or not game.move_count:
+            return None
+        board = game.copy()
+        move = board.undo_move()
+        if board.hash() != self.subtree_hash:
+            return None
+        for child in self.subtree.children:
+            if child.move == move:
+                child.parent = None
+                return child
+        return None
+
+    def get_move(self, game, time_left):
+        """Search for the best move with MCTS and return it before the time
+        limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            The most visited move at the root; (-1, -1) if there are no
+            available legal moves.
+        """
+        self.time_left = time_left
+        legal_moves = game.get_legal_moves()
+        root = self.reuse(game) if self.reuse_tree else None
+        self.subtree = None
+        if root is None:
+            root = MCTSNode(None, None, legal_moves)
+        self.root = root
+        self.simulations = 0
+        if not legal_moves:
+            return -1, -1
+
+        board = game.copy()
+        rng = board.rng
+        while self.iterations is None or self.simulations < self.iterations:
+            if self.time_left() < self.TIMER_THRESHOLD:
+                break
+            # Selection: descend through fully expanded nodes
+            node = root
+            depth = 0
+            while not node.untried and node.children:
+                node = node.select_child(self.exploration)
+                board.apply_move(node.move)
+                depth += 1
+            # Expansion: add one child for an untried move
+            if node.untried:
+                move = node.untried.pop(rng.randrange(len(node.untried)))
+                board.apply_move(move)
+                depth += 1
+                child = MCTSNode(move, node, board.get_legal_moves())
+                node.children.append(child)
+                node = child
+            # Simulation, and backpropagation of the result for the player who moved into each node
+            won = not board.playout(self.rollout)
+            while node is not None:
+                node.visits += 1
+                node.wins += won
+                won = not won
+                node = node.parent
+            for _ in range(depth):
+                board.undo_move()
+            self.simulations += 1
+
+        if not root.children:
+            return legal_moves[0]
+        best = max(root.children, key=lambda child: child.visits)
+        if self.reuse_tree:
+            board.apply_move(best.move)
+            self.subtree, self.subtree_hash = best, board.hash()
+        return best.move
@@ -0,0 +1,232 @@
+"""
+Exact endgame solver for knights Isolation.
+
+Late in the game there are few blank cells, and once the two players can no
+longer reach a common cell their futures are independent: each one simply
+makes as many moves as its own region allows, and the player who runs out
+first loses. Both cases can be solved exactly with the bitboards of
+`isolation.Board`, so an agent can stop guessing with a heuristic.
+"""
+from .isolation import _popcount
+
+# Check the clock once every this many nodes
+CHECK_EVERY = 256
+
+
+class SolverTimeout(Exception):
+    """Raised by `solve` and `longest_path` when the `expired` callback
+    reports that time is up."""
+    pass
+
+
+def _cells(mask):
+    """Yield the indices of the bits set in a mask."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _reachable(loc, blanks, move_masks):
+    """Return the mask of the blank cells a knight on `loc` can reach in any
+    number of moves through blank cells."""
+    region = 0
+    frontier = 1 << loc
+    while frontier:
+        spread = 0
+        for idx in _cells(frontier):
+            spread |= move_masks[idx]
+        frontier = spread & blanks & ~region
+        region |= frontier
+    return region
+
+
+def _locations(game):
+    """Return the cell indices of the active and inactive players."""
+    if game._initiative:
+        return game._p2_location, game._p1_location
+    return game._p1_location, game._p2_location
+
+
+def reachable(game, player):
+    """Return the cells a player could reach, ignoring the other player.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The game state.
+
+    player : object
+        A player of the game that has already moved.
+
+    Returns
+    -------
+    list<(int, int)>
+        The (row, column) pairs of the blank cells reachable from the
+        player's location through blank cells.
+    """
+    loc = game.get_player_location(player)
+    loc = loc[0] + loc[1] * game.height
+    return [game._coordinates[idx] for idx in _cells(_reachable(loc, game._blanks, game._move_masks))]
+
+
+def is_separated(game):
+    """Return True if both players have moved and can no longer reach a
+    common cell, so that the outcome only depends on `longest_path`."""
+    active, inactive = _locations(game)
+    if active is None or inactive is None:
+        return False
+    masks, blanks = game._move_masks, game._blanks
+    return not _reachable(active, blanks, masks) & _reachable(inactive, blanks, masks)
+
+
+def in_endgame(game, blanks_threshold):
+    """Return True if `solve` applies and is expected to be affordable: both
+    players have moved, and at most `blanks_threshold` blank cells are
+    within reach of either player. Cells that neither player can reach do
+    not change the outcome, so a large board whose players are walled into
+    small regions qualifies, and large separated regions do not."""
+    active, inactive = _locations(game)
+    if active is None or inactive is None:
+        return False
+    blanks = game._blanks
+    if _popcount(blanks) <= blanks_threshold:
+        return True
+    masks = game._move_masks
+    return _popcount(_reachable(active, blanks, masks) | _reachable(inactive, blanks, masks)) <= blanks_threshold
+
+
+def longest_path(game, player, expired=None):
+    """Return the longest sequence of moves a player can make on its own.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The game state.
+
+    player : object
+        A player of the game that has already moved.
+
+    expired : callable (optional)
+        Called every few hundred nodes; when it returns True the search
+        is abandoned with `SolverTimeout`.
+
+    Returns
+    -------
+    (int, (int, int) or None)
+        The number of moves, and the first move of such a sequence (None if
+        the player cannot move).
+    """
+    loc = game.get_player_location(player)
+    loc = loc[0] + loc[1] * game.height
+    return _Solver(game._move_masks, expired).longest_path(loc, game._blanks, game._coordinates)
+
+
+class _Solver(object):
+    """Depth first search of the game to the end, with memoisation of the
+    won and lost positions and exact evaluation of separated ones.
+
+    Both searches count their nodes together and check `expired` every
+    `CHECK_EVERY` of them."""
+
+    def __init__(self, move_masks, expired):
+        self.move_masks = move_masks
+        self.expired = expired
+        self.memo = {}
+        self.paths = {}
+        self.nodes = 0
+
+    def tick(self):
+        """Count a node, and raise SolverTimeout if time is up."""
+        self.nodes += 1
+        if self.expired is not None and not self.nodes % CHECK_EVERY and self.expired():
+            raise SolverTimeout()
+
+    def longest(self, loc, blanks):
+        """Return the largest number of moves a knight on `loc` can make
+        alone through the blank cells."""
+        key = (loc, blanks)
+        if key in self.paths:
+            return self.paths[key]
+        self.tick()
+        best = 0
+        upper = _popcount(blanks)
+        for idx in _cells(self.move_masks[loc] & blanks):
+            best = max(best, 1 + self.longest(idx, blanks & ~(1 << idx)))
+            if best == upper:
+                break
+        self.paths[key] = best
+        return best
+
+    def longest_path(self, loc, blanks, coordinates):
+        """Return the length and first move of the longest path from `loc`,
+        see `longest_path`."""
+        masks = self.move_masks
+        blanks &= _reachable(loc, blanks, masks)
+        best, best_move = 0, None
+        for idx in _cells(masks[loc] & blanks):
+            length = 1 + self.longest(idx, blanks & ~(1 << idx))
+            if length > best:
+                best, best_move = length, coordinates[idx]
+        return best, best_move
+
+    def wins(self, blanks, mover, other):
+        """Return True if the player to move on `mover` wins."""
+        key = (blanks, mover, other)
+        if key in self.memo:
+            return self.memo[key]
+        self.tick()
+
+        masks = self.move_masks
+        moves = masks[mover] & blanks
+        if not moves:
+            result = False
+        else:
+            mover_region = _reachable(mover, blanks, masks)
+            other_region = _reachable(other, blanks, masks)
+            if not mover_region & other_region:
+                # The mover must outlast the other player, who moves second
+                result = self.longest(mover, blanks & mover_region) > self.longest(other, blanks & other_region)
+            else:
+                result = any(not self.wins(blanks & ~(1 << idx), other, idx) for idx in _cells(moves))
+        self.memo[key] = result
+        return result
+
+
+def solve(game, expired=None):
+    """Solve the game exactly for the active player.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The game state; both players must have moved.
+
+    expired : callable (optional)
+        Called every few hundred nodes, including those of the longest path
+        searches; when it returns True the search is abandoned with
+        `SolverTimeout`.
+
+    Returns
+    -------
+    (int, (int, int) or None)
+        +1 if the active player wins with best play and -1 if it loses,
+        and the move to play: a winning move, or when every move loses, the
+        first move of the player's longest path if the players are
+        separated, else the move that leaves the opponent the fewest
+        replies. None if the active player cannot move.
+    """
+    mover, other = _locations(game)
+    if mover is None or other is None:
+        raise ValueError("The endgame solver needs both players on the board.")
+    solver = _Solver(game._move_masks, expired)
+    blanks = game._blanks
+    moves = list(_cells(game._move_masks[mover] & blanks))
+    if not moves:
+        return -1, None
+    for idx in moves:
+        if not solver.wins(blanks & ~(1 << idx), other, idx):
+            return 1, game._coordinates[idx]
+    if is_separated(game):
+        return -1, solver.longest_path(mover, blanks, game._coordinates)[1]
+    idx = min(moves, key=lambda idx: _popcount(game._move_masks[other] & blanks & ~(1 << idx)))
+    return -1, game._coordinates[idx]
@@ -9,15 +9,111 @@ be available to project reviewers.
 """
 import random
 import timeit
-from copy import copy
 
 TIME_LIMIT_MILLIS = 150
 
+# Knight moves as (row, column) offsets
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+_tables = {}
+_zobrist = {}
+_symmetries = {}
+
+
+def _board_tables(width, height):
+    """Return the (move_masks, coordinates) tables of a board size, built once.
+
+    Cells are numbered idx = row + column * height. move_masks[idx] has a bit
+    set for every cell a knight can jump to from idx, and coordinates[idx] is
+    the (row, column) pair of the cell.
+    """
+    if (width, height) not in _tables:
+        coordinates = [(i % height, i // height) for i in range(width * height)]
+        move_masks = []
+        for r, c in coordinates:
+            mask = 0
+            for dr, dc in DIRECTIONS:
+                if 0 <= r + dr < height and 0 <= c + dc < width:
+                    mask |= 1 << (r + dr + (c + dc) * height)
+            move_masks.append(mask)
+        _tables[(width, height)] = move_masks, coordinates
+    return _tables[(width, height)]
+
+
+def _zobrist_keys(width, height):
+    """Return the (blocked, player_1, player_2, initiative) Zobrist keys of a
+    board size, built once.
+
+    blocked[idx], player_1[idx] and player_2[idx] are random 64 bit keys for
+    a blocked cell and for each player standing on it; the hash of a state
+    is the XOR of the keys of its features, so a move updates it with a few
+    XORs. The keys come from a fixed seed and are the same in every process.
+    """
+    if (width, height) not in _zobrist:
+        rnd = random.Random('zobrist-{}x{}'.format(width, height))
+        blocked, player_1, player_2 = ([rnd.getrandbits(64) for _ in range(width * height)]
+                                       for _ in range(3))
+        _zobrist[(width, height)] = blocked, player_1, player_2, rnd.getrandbits(64)
+    return _zobrist[(width, height)]
+
+
+def symmetries(width, height):
+    """Return the symmetries of a board as permutations of its cells.
+
+    Cells are numbered idx = row + column * height, and each permutation
+    maps every cell to its image: perm[idx]. The identity comes first. A
+    rectangular board has 4 symmetries (the identity, the two mirror images
+    and the half turn); a square one has the 8 of the dihedral group.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    Returns
+    -------
+    list<tuple<int>>
+        The permutations, without duplicates. The list is built once per
+        board size and shared, so it must not be modified.
+    """
+    if (width, height) in _symmetries:
+        return _symmetries[(width, height)]
+    h, w = height - 1, width - 1
+    images = [lambda r, c: (r, c), lambda r, c: (h - r, c),
+              lambda r, c: (r, w - c), lambda r, c: (h - r, w - c)]
+    if width == height:
+        images += [lambda r, c: (c, r), lambda r, c: (w - c, h - r),
+                   lambda r, c: (c, h - r), lambda r, c: (w - c, r)]
+    perms = []
+    for image in images:
+        perm = tuple(r + c * height for r, c in (image(i % height, i // height) for i in range(width * height)))
+        if perm not in perms:
+            perms.append(perm)
+    _symmetries[(width, height)] = perms
+    return perms
+
+
+def _popcount(mask):
+    """Return the number of bits set in a non-negative int."""
+    return bin(mask).count('1')
+
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
     a knight in chess.
 
+    The cells are held as bits of Python ints (bit idx = row + column * height
+    is set while the cell is blank), so legal moves are the AND of the blank
+    cells with a precomputed knight-move mask, and counting them is a popcount.
+
     Parameters
     ----------
     player_1 : object
@@ -33,27 +129,80 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    seed : int or str (optional)
+        Seed of the board's random number generator, `rng`, which players
+        that make random choices should draw from so that a game can be
+        replayed exactly. Copies of the board share the generator. None seeds
+        it from the operating system.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7, seed=None):
         self.width = width
         self.height = height
+        self.rng = random.Random(seed)
         self.move_count = 0
         self._player_1 = player_1
         self._player_2 = player_2
         self._active_player = player_1
         self._inactive_player = player_2
 
-        # The last 3 entries of the board state includes initiative (0 for
-        # player 1, 1 for player 2) player 2 last move, and player 1 last move
-        self._board_state = [Board.BLANK] * (width * height + 3)
-        self._board_state[-1] = Board.NOT_MOVED
-        self._board_state[-2] = Board.NOT_MOVED
+        # Blank cells, the cell of each player (None before its first move)
+        # and the initiative (0 for player 1, 1 for player 2)
+        self._move_masks, self._coordinates = _board_tables(width, height)
+        self._blanks = (1 << (width * height)) - 1
+        self._p1_location = Board.NOT_MOVED
+        self._p2_location = Board.NOT_MOVED
+        self._initiative = 0
+        # The location each applied move replaced, for undo_move
+        self._undo = []
+        # Zobrist hash of the state, updated by every move
+        self._keys = _zobrist_keys(width, height)
+        self._hash = 0
 
     def hash(self):
-        return str(self._board_state).__hash__()
+        """Return the Zobrist hash of the current state: blocked cells, player
+        locations and initiative. It is kept up to date incrementally, so this
+        costs nothing.
+        """
+        return self._hash
+
+    def canonical_hash(self):
+        """Return the hash of the state up to board symmetry.
+
+        Every symmetric image of the state (see `symmetries`) is hashed like
+        `hash()`, and the smallest hash is the canonical one: symmetric
+        states, which are the same game, share it. This rehashes every
+        blocked cell once per symmetry, so it is meant for the opening, not
+        for use inside a search.
+
+        Returns
+        -------
+        (int, tuple<int>)
+            The canonical hash, and the symmetry (a permutation of the cells)
+            that maps this state to the canonical image.
+        """
+        blocked_keys, p1_keys, p2_keys, initiative_key = self._keys
+        blocked = []
+        mask = ~self._blanks & ((1 << (self.width * self.height)) - 1)
+        while mask:
+            low = mask & -mask
+            blocked.append(low.bit_length() - 1)
+            mask ^= low
+        best = None
+        for perm in symmetries(self.width, self.height):
+            h = initiative_key if self._initiative else 0
+            for idx in blocked:
+                h ^= blocked_keys[perm[idx]]
+            if self._p1_location is not None:
+                h ^= p1_keys[perm[self._p1_location]]
+            if self._p2_location is not None:
+                h ^= p2_keys[perm[self._p2_location]]
+            if best is None or h < best[0]:
+                best = h, perm
+        return best
 
     @property
     def active_player(self):
@@ -92,11 +241,9 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
-        new_board.move_count = self.move_count
-        new_board._active_player = self._active_player
-        new_board._inactive_player = self._inactive_player
-        new_board._board_state = copy(self._board_state)
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.__dict__.update(self.__dict__)
+        new_board._undo = list(self._undo)
         return new_board
 
     def forecast_move(self, move):
@@ -132,15 +279,13 @@ class Board(object):
         bool
             Returns True if the move is legal, False otherwise
         """
-        idx = move[0] + move[1] * self.height
         return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
-                self._board_state[idx] == Board.BLANK)
+                bool(self._blanks >> (move[0] + move[1] * self.height) & 1))
 
     def get_blank_spaces(self):
         """Return a list of the locations that are still available on the board.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-                if self._board_state[i + j * self.height] == Board.BLANK]
+        return self.__cells(self._blanks)
 
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
@@ -156,24 +301,18 @@ class Board(object):
             The coordinate pair (row, column) of the input player, or None
             if the player has not moved.
         """
-        if player == self._player_1:
-            if self._board_state[-1] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-1]
-        elif player == self._player_2:
-            if self._board_state[-2] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-2]
-        else:
-            raise RuntimeError(
-                "Invalid player in get_player_location: {}".format(player))
-        w = idx // self.height
-        h = idx % self.height
-        return (h, w)
+        idx = self.__location(player)
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coordinates[idx]
 
     def get_legal_moves(self, player=None):
         """Return the list of all legal moves for the specified player.
 
+        The moves are listed in cell order; unlike earlier versions of this
+        class the list is not shuffled, so agents that want random tie
+        breaking must shuffle it themselves.
+
         Parameters
         ----------
         player : object (optional)
@@ -186,9 +325,55 @@ class Board(object):
             The list of coordinate pairs (row, column) of all legal moves
             for the player constrained by the current game state.
         """
-        if player is None:
-            player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+        return self.__cells(self.__moves(self.active_player if player is None else player))
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves for the specified player, which
+        is `len(self.get_legal_moves(player))` without building the list.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            count the legal moves of the active player on the board.
+
+        Returns
+        -------
+        int
+            The number of legal moves of the player.
+        """
+        return _popcount(self.__moves(self.active_player if player is None else player))
+
+    def evaluate(self, player):
+        """Return everything a heuristic usually needs about the state, from
+        the point of view of a player, in one pass over the bitboards.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int, int, float)
+            The number of legal moves of the player and of its opponent, the
+            number of blank cells, and `utility(player)`: +inf if the player
+            has won, -inf if it has lost, 0 while the game goes on.
+        """
+        if player == self._player_1:
+            own, opp = self._p1_location, self._p2_location
+        elif player == self._player_2:
+            own, opp = self._p2_location, self._p1_location
+        else:
+            raise RuntimeError("Invalid player in evaluate: {}".format(player))
+        blanks = self._blanks
+        own_moves = _popcount(blanks if own is None else self._move_masks[own] & blanks)
+        opp_moves = _popcount(blanks if opp is None else self._move_masks[opp] & blanks)
+        if player == self._active_player:
+            utility = 0. if own_moves else float("-inf")
+        else:
+            utility = 0. if opp_moves else float("inf")
+        return own_moves, opp_moves, _popcount(blanks), utility
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -200,20 +385,104 @@ class Board(object):
             the active player on the board.
         """
         idx = move[0] + move[1] * self.height
-        last_move_idx = int(self.active_player == self._player_2) + 1
-        self._board_state[-last_move_idx] = idx
-        self._board_state[idx] = 1
-        self._board_state[-3] ^= 1
+        blocked, p1_keys, p2_keys, initiative_key = self._keys
+        if self._initiative:
+            last = self._p2_location
+            self._hash ^= p2_keys[idx] if last is None else p2_keys[idx] ^ p2_keys[last]
+            self._p2_location = idx
+        else:
+            last = self._p1_location
+            self._hash ^= p1_keys[idx] if last is None else p1_keys[idx] ^ p1_keys[last]
+            self._p1_location = idx
+        self._undo.append(last)
+        self._hash ^= blocked[idx] ^ initiative_key
+        self._blanks &= ~(1 << idx)
+        self._initiative ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def undo_move(self):
+        """Take back the last move applied to the board, in place.
+
+        Together with `apply_move` this lets a search walk the game tree on a
+        single board instead of allocating a copy per node with
+        `forecast_move`. Only legal moves (onto blank cells) can be undone.
+
+        Returns
+        -------
+        (int, int)
+            The coordinate pair (row, column) of the move taken back.
+        """
+        if not self._undo:
+            raise RuntimeError("There is no move to undo.")
+        self._initiative ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        blocked, p1_keys, p2_keys, initiative_key = self._keys
+        last = self._undo.pop()
+        if self._initiative:
+            idx = self._p2_location
+            self._hash ^= p2_keys[idx] if last is None else p2_keys[idx] ^ p2_keys[last]
+            self._p2_location = last
+        else:
+            idx = self._p1_location
+            self._hash ^= p1_keys[idx] if last is None else p1_keys[idx] ^ p1_keys[last]
+            self._p1_location = last
+        self._hash ^= blocked[idx] ^ initiative_key
+        self._blanks |= 1 << idx
+        return self._coordinates[idx]
+
+    def playout(self, policy=None):
+        """Play the game to the end from the current state and report who won,
+        leaving the board unchanged.
+
+        The simulation runs on local copies of the bitboards, so it allocates
+        no Board and keeps no undo information; it is the fast path for Monte
+        Carlo rollouts.
+
+        Parameters
+        ----------
+        policy : callable (optional)
+            Chooses each simulated move, as policy(cells, blanks, opponent,
+            move_masks, rng) -> cell, where `cells` lists the cell indices
+            the player to move can jump to, `blanks` is the bitmask of blank
+            cells, `opponent` the cell index of the other player (None before
+            its first move) and `rng` the board's random number generator.
+            Cells are numbered row + column * height. None picks uniformly at
+            random.
+
+        Returns
+        -------
+        bool
+            True if the active player wins the simulated game.
+        """
+        masks, rng, blanks = self._move_masks, self.rng, self._blanks
+        if self._initiative:
+            mover, other = self._p2_location, self._p1_location
+        else:
+            mover, other = self._p1_location, self._p2_location
+        active_to_move = True
+        while True:
+            mask = blanks if mover is None else masks[mover] & blanks
+            if not mask:
+                return not active_to_move
+            cells = []
+            while mask:
+                low = mask & -mask
+                cells.append(low.bit_length() - 1)
+                mask ^= low
+            idx = rng.choice(cells) if policy is None else policy(cells, blanks, other, masks, rng)
+            blanks &= ~(1 << idx)
+            mover, other = other, idx
+            active_to_move = not active_to_move
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self.__moves(self._active_player)
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self.__moves(self._active_player)
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,7 +506,7 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self.__moves(self._active_player):
 
             if player == self._inactive_player:
                 return float("inf")
@@ -247,20 +516,33 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
-        """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
-        """
-        if loc == Board.NOT_MOVED:
-            return self.get_blank_spaces()
+    def __location(self, player):
+        """Return the cell index of a player, or None if it has not moved."""
+        if player == self._player_1:
+            return self._p1_location
+        elif player == self._player_2:
+            return self._p2_location
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
-        return valid_moves
+    def __moves(self, player):
+        """Return the bitmask of the cells a player can move to: any blank
+        cell before its first move, then the blank cells a knight's jump away.
+        """
+        idx = self.__location(player)
+        if idx == Board.NOT_MOVED:
+            return self._blanks
+        return self._move_masks[idx] & self._blanks
+
+    def __cells(self, mask):
+        """Return the (row, column) pairs of the bits set in a mask, in cell order."""
+        coordinates = self._coordinates
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(coordinates[low.bit_length() - 1])
+            mask ^= low
+        return cells
 
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
@@ -271,18 +553,18 @@ class Board(object):
         the location of each player and indicating which cells have been
         blocked, and which remain open.
         """
-        p1_loc = self._board_state[-1]
-        p2_loc = self._board_state[-2]
+        p1_loc = self._p1_location
+        p2_loc = self._p2_location
 
         col_margin = len(str(self.height - 1)) + 1
         prefix = "{:<" + "{}".format(col_margin) + "}"
         offset = " " * (col_margin + 3)
-        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        out = offset + ''.join('{:<4}'.format(col) for col in range(self.width)).rstrip() + '\n\r'
         for i in range(self.height):
             out += prefix.format(i) + ' | '
             for j in range(self.width):
                 idx = i + j * self.height
-                if not self._board_state[idx]:
+                if self._blanks >> idx & 1:
                     out += ' '
                 elif p1_loc == idx:
                     out += symbols[0]
@@ -295,7 +577,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, clock=timeit.default_timer):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +587,13 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        clock : callable (optional)
+            The clock, in seconds, that measures each turn. The default wall
+            clock also counts the time the process spends waiting for a CPU;
+            `time.process_time` only counts the time actually spent
+            computing, which keeps limits fair when many games share a
+            machine.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -314,7 +603,7 @@ class Board(object):
         """
         move_history = []
 
-        time_millis = lambda: 1000 * timeit.default_timer()
+        time_millis = lambda: 1000 * clock()
 
         while True:
 
@@ -0,0 +1,160 @@
+"""Build and use an opening book for the Isolation agents.
+
+The book maps the canonical hash of a position (see
+`isolation.Board.canonical_hash`) to the move that a deep, offline
+alpha-beta search chose there, written in the orientation of the canonical
+image. Symmetric positions share one entry, so covering the first plies of
+the 7x7 board takes about an eighth of the searches.
+
+The moves are only as good as the heuristic of the search that chose them,
+so a book records the heuristic it was built with and `load_book` can check
+that it matches the player's. Build the bundled book, for
+`competition_agent.CustomPlayer`, with
+
+    python opening_book.py --plies 4 --depth 8
+"""
+import argparse
+import json
+import os
+import time
+
+from isolation import Board
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOOK_FILE = os.path.join(HERE, "opening_book.json")
+
+
+def book_move(book, game):
+    """Return the book move of a position, or None if it is not in the book.
+
+    Parameters
+    ----------
+    book : dict
+        An opening book, see `load_book`.
+
+    game : `isolation.Board`
+        The current game state.
+
+    Returns
+    -------
+    (int, int) or None
+        The move for the active player, mapped back from the canonical
+        orientation to the orientation of `game`.
+    """
+    key, perm = game.canonical_hash()
+    move = book.get(key)
+    if move is None:
+        return None
+    idx = perm.index(move[0] + move[1] * game.height)
+    return idx % game.height, idx // game.height
+
+
+def score_name(score_fn):
+    """Return the name a book records for a heuristic, e.g. "competition_agent.custom_score"."""
+    return "{}.{}".format(score_fn.__module__, getattr(score_fn, "__name__", type(score_fn).__name__))
+
+
+def build_book(plies=4, depth=8, score_fn=None, width=7, height=7, verbose=False):
+    """Search every position of the first plies, up to symmetry.
+
+    Parameters
+    ----------
+    plies : int (optional)
+        The book covers the positions with fewer than this many moves played.
+
+    depth : int (optional)
+        The depth of the alpha-beta search of each position.
+
+    score_fn : callable (optional)
+        The heuristic of the search; defaults to `competition_agent.custom_score`,
+        the heuristic of the player that uses the bundled book.
+
+    width, height : int (optional)
+        The board size.
+
+    verbose : bool (optional)
+        Print the progress.
+
+    Returns
+    -------
+    dict
+        The book, {canonical hash: (row, column)}.
+    """
+    from game_agent import AlphaBetaPlayer
+    from competition_agent import custom_score
+
+    players = [AlphaBetaPlayer(score_fn=score_fn or custom_score) for _ in range(2)]
+    for player in players:
+        player.time_left = lambda: float("inf")
+
+    book = {}
+    frontier = [Board(players[0], players[1], width, height)]
+    for ply in range(plies):
+        start = time.perf_counter()
+        children = {}
+        for game in frontier:
+            key, perm = game.canonical_hash()
+            player = game.active_player
+            for search_depth in range(1, depth + 1):
+                move = player.alphabeta(game, search_depth)
+            idx = perm[move[0] + move[1] * height]
+            book[key] = idx % height, idx // height
+            if ply + 1 < plies:
+                for move in game.get_legal_moves():
+                    child = game.forecast_move(move)
+                    children.setdefault(child.canonical_hash()[0], child)
+        if verbose:
+            print("ply {}: {} positions in {:.1f}s".format(ply, len(frontier), time.perf_counter() - start))
+        frontier = list(children.values())
+    return book
+
+
+def save_book(book, path=BOOK_FILE, **info):
+    """Write a book as JSON, with any keyword arguments saved as its description."""
+    # One position per line, so that rebuilt books diff well
+    lines = ['"{}": {}'.format(key, json.dumps(list(move))) for key, move in sorted(book.items())]
+    with open(path, "w") as f:
+        f.write('{{"info": {},\n"moves": {{\n{}\n}}}}\n'.format(json.dumps(info, sort_keys=True), ",\n".join(lines)))
+
+
+def load_book(path=BOOK_FILE, score_fn=None):
+    """Read a book written by `save_book`.
+
+    Parameters
+    ----------
+    path : str (optional)
+        The book file; defaults to the bundled opening_book.json.
+
+    score_fn : callable (optional)
+        The heuristic of the player that will use the book. A ValueError is
+        raised if the book was built with another one (see `score_name`).
+
+    Returns
+    -------
+    dict
+        The book, {canonical hash: (row, column)}.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if score_fn is not None and data["info"].get("score") != score_name(score_fn):
+        raise ValueError("The opening book {} was built with the heuristic {}, not {}".format(
+            path, data["info"].get("score"), score_name(score_fn)))
+    return {int(key): tuple(move) for key, move in data["moves"].items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the opening book of the Isolation agents.")
+    parser.add_argument("--plies", type=int, default=4, help="plies covered by the book (default 4)")
+    parser.add_argument("--depth", type=int, default=8, help="search depth of each position (default 8)")
+    parser.add_argument("--out", default=BOOK_FILE, help="output file (default opening_book.json)")
+    args = parser.parse_args(argv)
+    from competition_agent import custom_score
+
+    book = build_book(args.plies, args.depth, custom_score, verbose=True)
+    save_book(book, args.out, plies=args.plies, depth=args.depth, score=score_name(custom_score),
+              width=7, height=7)
+    print("{} positions written to {}".format(len(book), args.out))
+
+
+if __name__ == "__main__":
+    main()
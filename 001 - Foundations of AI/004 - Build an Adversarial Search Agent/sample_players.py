@@ -6,8 +6,6 @@ own agent and example heuristic functions.
     ************************************************************************
 """
 
-from random import randint
-
 
 def null_score(game, player):
     """This heuristic presumes no knowledge for non-terminal states, and
@@ -59,13 +57,11 @@ def open_move_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, _, _, utility = game.evaluate(player)
+    if utility:
+        return utility
 
-    return float(len(game.get_legal_moves(player)))
+    return float(own_moves)
 
 
 def improved_score(game, player):
@@ -89,14 +85,10 @@ def improved_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, _, utility = game.evaluate(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves - opp_moves)
 
 
@@ -134,7 +126,8 @@ def center_score(game, player):
 
 
 class RandomPlayer():
-    """Player that chooses a move randomly."""
+    """Player that chooses a move randomly, with the random number generator
+    of the board so that seeded games are reproducible."""
 
     def get_move(self, game, time_left):
         """Randomly select a move from the available legal moves.
@@ -159,7 +152,7 @@ class RandomPlayer():
         legal_moves = game.get_legal_moves()
         if not legal_moves:
             return (-1, -1)
-        return legal_moves[randint(0, len(legal_moves) - 1)]
+        return legal_moves[game.rng.randint(0, len(legal_moves) - 1)]
 
 
 class GreedyPlayer():
@@ -0,0 +1,126 @@
+"""Unit tests for the endgame solver and the opening book"""
+
+import itertools
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import isolation
+import competition_agent
+import game_agent
+import opening_book
+from isolation import endgame
+
+
+def wins(game):
+    """Whether the active player wins, by plain search of the whole game"""
+    return any(not wins(game.forecast_move(move)) for move in game.get_legal_moves())
+
+
+def random_endgame(rnd, width, height, blanks):
+    """A position reached by random moves with at most `blanks` blank cells left"""
+    while True:
+        game = isolation.Board("Player1", "Player2", width, height)
+        while game.get_legal_moves() and len(game.get_blank_spaces()) > blanks:
+            game.apply_move(rnd.choice(game.get_legal_moves()))
+        if game.move_count >= 2:
+            return game
+
+
+class EndgameTest(unittest.TestCase):
+
+    def test_solve_matches_full_search(self):
+        rnd = random.Random(0)
+        for _ in range(100):
+            game = random_endgame(rnd, rnd.choice((4, 5)), rnd.choice((4, 5)), rnd.randint(6, 12))
+            value, move = endgame.solve(game)
+            self.assertEqual(value > 0, wins(game))
+            if value > 0:
+                self.assertFalse(wins(game.forecast_move(move)))
+            elif game.get_legal_moves():
+                self.assertIn(move, game.get_legal_moves())
+
+    def test_separated_regions(self):
+        # Player 1 is alone in the top left corner, player 2 in the bottom right one
+        game = isolation.Board("Player1", "Player2", 7, 7)
+        game.apply_move((0, 0))
+        game.apply_move((6, 6))
+        free = {(0, 0), (1, 2), (2, 4), (6, 6), (5, 4), (4, 2)}
+        for cell in isolation.Board("Player1", "Player2", 7, 7).get_blank_spaces():
+            if cell not in free:
+                game._blanks &= ~(1 << (cell[0] + cell[1] * 7))
+        self.assertTrue(endgame.is_separated(game))
+        self.assertEqual(sorted(endgame.reachable(game, "Player1")), [(1, 2), (2, 4)])
+        self.assertEqual(endgame.longest_path(game, "Player1"), (2, (1, 2)))
+        # Both players have two moves, so the player to move runs out first
+        self.assertEqual(endgame.solve(game), (-1, (1, 2)))
+
+    def test_large_separated_regions(self):
+        # Player 2 is walled into one cell, player 1 has 40: no path covers them all, and
+        # proving it takes the longest path search far longer than any turn
+        game = isolation.Board("Player1", "Player2", 7, 7)
+        game.apply_move((0, 0))
+        game.apply_move((6, 6))
+        for row, col in ((2, 4), (2, 6), (3, 3), (5, 3), (5, 4), (6, 4)):
+            game._blanks &= ~(1 << (row + col * 7))
+        self.assertTrue(endgame.is_separated(game))
+        self.assertEqual(len(endgame.reachable(game, "Player1")), 40)
+        self.assertFalse(endgame.in_endgame(game, 24))
+        self.assertTrue(endgame.in_endgame(game, 41))
+        for search in (lambda expired: endgame.solve(game, expired),
+                       lambda expired: endgame.longest_path(game, "Player1", expired)):
+            calls = itertools.count()
+            start = time.perf_counter()
+            with self.assertRaises(endgame.SolverTimeout):
+                search(lambda: next(calls) >= 10)
+            self.assertLess(time.perf_counter() - start, 1.)
+            self.assertEqual(next(calls), 11)
+
+    def test_solver_timeout(self):
+        game = random_endgame(random.Random(1), 7, 7, 30)
+        with self.assertRaises(endgame.SolverTimeout):
+            endgame.solve(game, expired=lambda: True)
+
+
+class OpeningBookTest(unittest.TestCase):
+
+    def test_book_moves_follow_symmetry(self):
+        book = opening_book.build_book(plies=2, depth=2, width=5, height=5)
+        # One entry for the empty board and one per cell up to symmetry
+        self.assertEqual(len(book), 1 + 6)
+        for first, mirrored in (((0, 1), (4, 3)), ((1, 2), (2, 3))):
+            moves = []
+            for cell in (first, mirrored):
+                game = isolation.Board("Player1", "Player2", 5, 5)
+                game.apply_move(cell)
+                moves.append(opening_book.book_move(book, game))
+                self.assertIn(moves[-1], game.get_legal_moves())
+            perms = [perm for perm in isolation.isolation.symmetries(5, 5)
+                     if perm[first[0] + first[1] * 5] == mirrored[0] + mirrored[1] * 5]
+            self.assertIn(moves[1][0] + moves[1][1] * 5, [perm[moves[0][0] + moves[0][1] * 5] for perm in perms])
+        game = isolation.Board("Player1", "Player2", 5, 5)
+        for move in ((0, 0), (4, 4)):
+            game.apply_move(move)
+        self.assertIsNone(opening_book.book_move(book, game))
+
+    def test_book_records_its_heuristic(self):
+        book = opening_book.build_book(plies=1, depth=2, score_fn=game_agent.custom_score_2, width=5, height=5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.json")
+            opening_book.save_book(book, path, score=opening_book.score_name(game_agent.custom_score_2))
+            self.assertEqual(opening_book.load_book(path, game_agent.custom_score_2), book)
+            self.assertEqual(opening_book.load_book(path), book)
+            with self.assertRaises(ValueError):
+                opening_book.load_book(path, competition_agent.custom_score)
+
+    def test_bundled_book(self):
+        # The book of CustomPlayer was searched with its own heuristic
+        book = opening_book.load_book(score_fn=competition_agent.custom_score)
+        game = isolation.Board("Player1", "Player2")
+        self.assertIn(opening_book.book_move(book, game), game.get_legal_moves())
+
+
+if __name__ == '__main__':
+    unittest.main()
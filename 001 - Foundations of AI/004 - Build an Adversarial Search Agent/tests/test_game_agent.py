@@ -3,14 +3,37 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
 import unittest
 
 import isolation
+import competition_agent
 import game_agent
+import opening_book
+from isolation import endgame
 
 from importlib import reload
 
 
+def minimax_value(game, depth, player):
+    """The plain minimax value of a position for `player`, searched with forecast_move"""
+    if game.is_loser(game.active_player) or not depth:
+        return player.score(game, player)
+    values = [minimax_value(game.forecast_move(move), depth - 1, player) for move in game.get_legal_moves()]
+    return max(values) if game.active_player == player else min(values)
+
+
+def countdown(start=1000.):
+    """A time_left clock that loses 1ms at every reading, so that no search can run forever"""
+    ticks = itertools.count()
+    return lambda: start - next(ticks)
+
+
 class IsolationTest(unittest.TestCase):
     """Unit tests for isolation agents"""
 
@@ -26,9 +49,306 @@ class MinimaxPlayerTest(unittest.TestCase):
 
     def setUp(self):
         reload(game_agent)
-        self.player1 = "Player1"
-        self.player2 = "Player2"
+        self.player1 = game_agent.MinimaxPlayer()
+        self.player2 = game_agent.AlphaBetaPlayer()
         self.game = isolation.Board(self.player1, self.player2)
+        for player in (self.player1, self.player2):
+            player.time_left = lambda: 1000.
+
+    def test_search_leaves_board_unchanged(self):
+        # The same position with the alpha-beta agent to move
+        other = isolation.Board(self.player2, self.player1)
+        for game in (self.game, other):
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+        before = (self.game.to_string(), self.game.hash(), self.game.move_count)
+        for depth in range(1, 6):
+            move = self.player1.minimax(self.game, depth)
+            self.assertIn(move, self.game.get_legal_moves())
+            self.assertEqual(minimax_value(other.forecast_move(self.player2.alphabeta(other, depth)), depth - 1,
+                                           self.player2),
+                             minimax_value(self.game.forecast_move(move), depth - 1, self.player1))
+            self.assertEqual((self.game.to_string(), self.game.hash(), self.game.move_count), before)
+
+    def test_timeout_leaves_board_unchanged(self):
+        before = self.game.to_string()
+        calls = iter(range(100, -1, -1))
+        self.player1.time_left = lambda: next(calls)
+        self.assertIn(self.player1.get_move(self.game, self.player1.time_left), self.game.get_legal_moves())
+        self.assertEqual(self.game.to_string(), before)
+
+
+class AlphaBetaPlayerTest(unittest.TestCase):
+    """ Unit tests for the alpha-beta agent"""
+
+    def setUp(self):
+        reload(game_agent)
+        # A small table, so that entries get replaced
+        self.player1 = game_agent.AlphaBetaPlayer(table_size=512)
+        self.player2 = game_agent.AlphaBetaPlayer()
+        for player in (self.player1, self.player2):
+            player.time_left = lambda: 1000.
+
+    def play_checked_game(self, game, depth=3):
+        """ Play a game with iterative deepening to a fixed depth, checking every move against minimax """
+        while game.get_legal_moves():
+            player = game.active_player
+            player.table.new_search()
+            for search_depth in range(1, depth + 1):
+                move = player.alphabeta(game, search_depth)
+            values = {m: minimax_value(game.forecast_move(m), depth - 1, player) for m in game.get_legal_moves()}
+            self.assertEqual(values[move], max(values.values()))
+            game.apply_move(move)
+
+    def test_table_keeps_moves_optimal(self):
+        # The tables are kept across depths, moves and games, with the players switching seats
+        for players in ((self.player1, self.player2), (self.player2, self.player1)):
+            game = isolation.Board(*players)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            self.play_checked_game(game)
+
+    def test_search_stats(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        calls = iter(range(2000, -1, -1))
+        move = self.player1.get_move(game, lambda: next(calls))
+        self.assertIn(move, game.get_legal_moves())
+        self.assertEqual([stats.depth for stats in self.player1.stats], list(range(1, len(self.player1.stats) + 1)))
+        for stats in self.player1.stats:
+            self.assertTrue(stats.cutoffs <= stats.expanded <= stats.nodes)
+            self.assertTrue(0 <= stats.first_cutoff_rate <= 1)
+        self.assertIn("nodes", str(self.player1.stats[-1]))
+
+    def test_search_stats_count_every_node_once(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        # Depth 1: the root and one leaf per legal move
+        self.player1.alphabeta(game, 1)
+        self.assertEqual(self.player1.stats[-1][1:3], (1 + len(game.get_legal_moves()), 1))
+
+        # Deeper: one node per call of min_value or max_value, plus the root
+        calls = {"nodes": 0}
+        for name in ("min_value", "max_value"):
+            method = getattr(self.player1, name)
+
+            def counted(*args, method=method, **kwargs):
+                calls["nodes"] += 1
+                return method(*args, **kwargs)
+            setattr(self.player1, name, counted)
+        for depth in (2, 4):
+            calls["nodes"] = 0
+            self.player1.alphabeta(game, depth)
+            self.assertEqual(self.player1.stats[-1].nodes, 1 + calls["nodes"])
+
+    def test_move_ordering(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        self.player1.root_depth = 4
+        self.player1.killers = [[None, None] for _ in range(5)]
+        self.player1.killers[2] = [(5, 4), None]
+        self.player1.history[0][(1, 4)] = 10
+        # The first move, the killer, the history move, then moves onto the opponent's destinations
+        moves = self.player1.ordered_moves(game, 2, (4, 1))
+        self.assertEqual(moves[:3], [(4, 1), (5, 4), (1, 4)])
+        self.assertEqual(set(moves[3:5]), {(1, 2), (2, 1)})
+        self.assertEqual(sorted(moves), sorted(game.get_legal_moves()))
+
+    def test_clock_read_every_few_nodes(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        readings = []
+        start = time.perf_counter()
+
+        def time_left():
+            readings.append(None)
+            return 1000. - 1000 * (time.perf_counter() - start)
+        self.player1.time_left = time_left
+        for depth in range(1, 7):
+            self.player1.alphabeta(game, depth)
+        nodes = sum(stats.nodes for stats in self.player1.stats)
+        self.assertGreater(self.player1.check_every, 1)
+        self.assertLess(len(readings), nodes / 4)
+
+        # Close to the threshold the clock is read again before half the time left is used
+        self.player1.last_time_left = 12.
+        self.player1.check_every = 1000
+        self.player1.time_left = lambda: 11.
+        self.player1.check_time()
+        self.assertEqual(self.player1.check_every, 500)
+
+    def test_predicted_depth(self):
+        # Iteration d takes 2 ** d ms: after depths 1 to 5 (62ms) 38ms are left and depth 6 is expected to
+        # take 32 * 1.5 = 48ms, so the search stops instead of starting it and timing out
+        for predict_depth, depths in ((True, [1, 2, 3, 4, 5]), (False, [1, 2, 3, 4, 5, 6])):
+            player = game_agent.AlphaBetaPlayer(predict_depth=predict_depth)
+            game = isolation.Board(player, self.player2)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            clock = {"left": 100.}
+            started = []
+
+            def alphabeta(game, depth, clock=clock, started=started, player=player):
+                started.append(depth)
+                clock["left"] -= 2 ** depth
+                if clock["left"] < player.TIMER_THRESHOLD:
+                    raise game_agent.SearchTimeout()
+                player.root_value = 0.
+                return game.get_legal_moves()[depth % 2]
+            player.alphabeta = alphabeta
+            move = player.get_move(game, lambda: clock["left"])
+            self.assertEqual(started, depths)
+            # Both return the move of depth 5, the last completed iteration
+            self.assertEqual(move, game.get_legal_moves()[1])
+
+    def test_book_and_endgame(self):
+        book = {}
+        player = game_agent.AlphaBetaPlayer(book=book, endgame_blanks=12)
+        game = isolation.Board(player, self.player2, 5, 5)
+        key, perm = game.canonical_hash()
+        book[key] = (2, 2)
+        self.assertEqual(player.get_move(game, countdown()), (2, 2))
+        self.assertEqual(player.stats, [])
+
+        # Play until the solver takes over, then check that it wins what it claims to win
+        rnd = random.Random(0)
+        while game.get_legal_moves() and len(game.get_blank_spaces()) > 12:
+            game.apply_move(rnd.choice(game.get_legal_moves()))
+        if game.active_player is not player:
+            game.apply_move(rnd.choice(game.get_legal_moves()))
+        value, move = endgame.solve(game)
+        if value > 0:
+            self.assertEqual(player.get_move(game, countdown()), move)
+
+    def test_endgame_keeps_to_the_clock(self):
+        # Large separated regions, whose longest paths take far longer than a turn to prove
+        for player in (game_agent.AlphaBetaPlayer(endgame_blanks=41), competition_agent.CustomPlayer()):
+            game = isolation.Board(player, self.player2, 7, 7)
+            game.apply_move((0, 0))
+            game.apply_move((6, 6))
+            for row, col in ((2, 4), (2, 6), (3, 3), (5, 3), (5, 4), (6, 4)):
+                game._blanks &= ~(1 << (row + col * 7))
+            start = time.perf_counter()
+            move = player.get_move(game, lambda: 150. - 1000 * (time.perf_counter() - start))
+            self.assertIn(move, game.get_legal_moves())
+            self.assertLess(time.perf_counter() - start, .15)
+
+    def test_competition_agent(self):
+        player = competition_agent.CustomPlayer()
+        game = isolation.Board(player, self.player2)
+        self.assertEqual(player.get_move(game, countdown()), opening_book.book_move(player.book, game))
+        self.assertEqual(player.get_move(game, countdown()), player.get_move(game.copy(), countdown()))
+
+    def test_telemetry(self):
+        records = []
+        # Search until the timeout, so that the record counts the nodes of an aborted iteration
+        player = game_agent.AlphaBetaPlayer(telemetry=records.append, predict_depth=False)
+        game = isolation.Board(player, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        calls = iter(range(3000, -1, -1))
+        move = player.get_move(game, lambda: next(calls))
+        record, = records
+        self.assertEqual(record["move"], list(move))
+        self.assertEqual((record["source"], record["move_count"]), ("search", 2))
+        self.assertEqual(record["depth"], player.stats[-1].depth)
+        self.assertGreater(record["nodes"], sum(stats.nodes for stats in player.stats[:-1]))
+        self.assertTrue(0 < record["tt_hit_rate"] < 1)
+        # The search stopped at the threshold
+        self.assertLess(record["time_left_ms"], record["threshold_ms"])
+        self.assertEqual(record["elapsed_ms"], 3000 - record["time_left_ms"])
+
+        # A book entry for a legal move, written in the canonical orientation
+        key, perm = game.canonical_hash()
+        row, col = game.get_legal_moves()[0]
+        idx = perm[row + col * game.height]
+        player.book = {key: (idx % game.height, idx // game.height)}
+        self.assertEqual(player.get_move(game, countdown()), (row, col))
+        self.assertEqual((records[-1]["source"], records[-1]["depth"], records[-1]["nodes"]), ("book", 0, 0))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "telemetry.jsonl")
+            hook = game_agent.JsonLinesTelemetry(path, agent="AB")
+            for record in records:
+                hook(record)
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(lines, [dict(record, agent="AB") for record in records])
+
+    def test_large_board(self):
+        game = isolation.Board(self.player1, self.player2, 20, 20)
+        game.apply_move((3, 17))
+        game.apply_move((12, 5))
+        before = game.to_string()
+        for depth in range(1, 4):
+            move = self.player1.alphabeta(game, depth)
+            self.assertIn(move, game.get_legal_moves())
+            self.assertEqual(game.to_string(), before)
+        self.assertIn(self.player1.get_move(game, countdown(100.)), game.get_legal_moves())
+
+    def test_table_size(self):
+        with self.assertRaises(ValueError):
+            game_agent.TranspositionTable(0)
+
+
+class MCTSPlayerTest(unittest.TestCase):
+    """ Unit tests for the Monte Carlo tree search agent"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_finds_winning_moves(self):
+        rnd = random.Random(2)
+        for rollout in ("random", "mobility"):
+            checked = 0
+            while checked < 5:
+                player = game_agent.MCTSPlayer(rollout=rollout, iterations=3000)
+                game = isolation.Board(player, "Player2", 5, 5, seed=checked)
+                while game.get_legal_moves() and len(game.get_blank_spaces()) > 11:
+                    game.apply_move(rnd.choice(game.get_legal_moves()))
+                if game.active_player is not player or not game.get_legal_moves() or endgame.solve(game)[0] < 0:
+                    continue
+                before = game.to_string()
+                move = player.get_move(game, countdown(10 ** 6))
+                self.assertEqual(game.to_string(), before)
+                self.assertEqual(endgame.solve(game.forecast_move(move))[0], -1)
+                self.assertEqual(player.simulations, 3000)
+                checked += 1
+
+    def test_tree_reuse(self):
+        player = game_agent.MCTSPlayer(iterations=500)
+        game = isolation.Board(player, "Player2", seed=0)
+        game.apply_move((3, 3))
+        game.apply_move((2, 2))
+        game.apply_move(player.get_move(game, countdown(10 ** 6)))
+        reply = max(player.subtree.children, key=lambda child: child.visits)
+        game.apply_move(reply.move)
+        visits = reply.visits
+        player.get_move(game, countdown(10 ** 6))
+        self.assertIs(player.root, reply)
+        self.assertIsNone(reply.parent)
+        self.assertEqual(reply.visits, visits + 500)
+
+        # Another game does not reuse the tree
+        game = isolation.Board(player, "Player2", seed=0)
+        player.get_move(game, countdown(10 ** 6))
+        self.assertEqual(player.root.visits, 500)
+
+    def test_time_limit(self):
+        player = game_agent.MCTSPlayer()
+        game = isolation.Board(player, "Player2")
+        calls = iter(range(100, -1, -1))
+        self.assertIn(player.get_move(game, lambda: next(calls)), game.get_legal_moves())
+        # One simulation per clock reading from 100ms down to the 10ms threshold
+        self.assertEqual(player.simulations, 91)
+
+    def test_unknown_rollout(self):
+        with self.assertRaises(ValueError):
+            game_agent.MCTSPlayer(rollout="greedy")
 
 
 if __name__ == '__main__':
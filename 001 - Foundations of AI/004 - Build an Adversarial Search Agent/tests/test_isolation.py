@@ -0,0 +1,149 @@
+"""Unit tests for the bitboard implementation of `isolation.Board`"""
+
+import random
+import unittest
+
+import isolation
+from isolation.isolation import DIRECTIONS, _board_tables, symmetries
+
+
+def knight_moves(game, player):
+    """The legal moves of a player worked out directly from the rules"""
+    location = game.get_player_location(player)
+    blanks = set(game.get_blank_spaces())
+    if location is None:
+        return sorted(blanks, key=lambda move: (move[1], move[0]))
+    r, c = location
+    moves = [(r + dr, c + dc) for dr, dc in DIRECTIONS if (r + dr, c + dc) in blanks]
+    return sorted(moves, key=lambda move: (move[1], move[0]))
+
+
+class BoardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def play_random_game(self, width, height, seed):
+        rnd = random.Random(seed)
+        game = isolation.Board(self.player1, self.player2, width, height)
+        while True:
+            for player in (self.player1, self.player2):
+                self.assertEqual(game.get_legal_moves(player), knight_moves(game, player))
+                self.assertEqual(game.count_legal_moves(player), len(knight_moves(game, player)))
+                self.assertEqual(game.evaluate(player),
+                                 (len(knight_moves(game, player)), len(knight_moves(game, game.get_opponent(player))),
+                                  len(game.get_blank_spaces()), game.utility(player)))
+            moves = game.get_legal_moves()
+            if not moves:
+                return game
+            self.assertFalse(game.is_loser(game.active_player))
+            game.apply_move(rnd.choice(moves))
+
+    def test_random_games(self):
+        for seed in range(20):
+            game = self.play_random_game(7, 7, seed)
+            self.assertTrue(game.is_loser(game.active_player))
+            self.assertTrue(game.is_winner(game.inactive_player))
+            self.assertEqual(game.utility(game.inactive_player), float("inf"))
+            self.assertEqual(game.utility(game.active_player), float("-inf"))
+
+    def test_non_square_board(self):
+        for seed in range(5):
+            game = self.play_random_game(5, 8, seed)
+            self.assertEqual(len(game.get_blank_spaces()), 5 * 8 - game.move_count)
+
+    def test_large_boards(self):
+        # The bitboards are plain ints, so boards of more than 64 cells need no special handling
+        for width, height in ((15, 15), (20, 20), (9, 15)):
+            game = self.play_random_game(width, height, 0)
+            self.assertTrue(game.is_loser(game.active_player))
+            self.assertEqual(len(game.get_blank_spaces()), width * height - game.move_count)
+            # Two-digit column labels stay above their column
+            header, first_row = game.to_string().split('\n\r')[:2]
+            self.assertEqual(header.index(str(width - 1)), first_row.rindex('|') - 2)
+
+    def test_forecast_move_leaves_board_unchanged(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        before = game.to_string()
+        new_game = game.forecast_move((1, 1))
+        self.assertEqual(game.to_string(), before)
+        self.assertNotEqual(new_game.to_string(), before)
+        self.assertEqual(new_game.get_player_location(self.player1), (1, 1))
+        self.assertEqual(game.get_player_location(self.player1), (2, 3))
+        self.assertNotEqual(new_game.hash(), game.hash())
+        self.assertEqual(game.copy().hash(), game.hash())
+
+    def test_undo_move(self):
+        rnd = random.Random(0)
+        game = isolation.Board(self.player1, self.player2)
+        states = []
+        while game.get_legal_moves():
+            states.append((game.to_string(), game.hash(), game.active_player, game.get_legal_moves()))
+            move = rnd.choice(game.get_legal_moves())
+            game.apply_move(move)
+            self.assertEqual(game.copy().undo_move(), move)
+        while states:
+            game.undo_move()
+            self.assertEqual((game.to_string(), game.hash(), game.active_player, game.get_legal_moves()),
+                             states.pop())
+        self.assertEqual(game.move_count, 0)
+        with self.assertRaises(RuntimeError):
+            game.undo_move()
+
+    def test_move_is_legal(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((3, 3))
+        self.assertFalse(game.move_is_legal((3, 3)))
+        self.assertFalse(game.move_is_legal((7, 0)))
+        self.assertFalse(game.move_is_legal((-1, 0)))
+        self.assertTrue(game.move_is_legal((0, 0)))
+
+    def test_seeded_rng(self):
+        games = [isolation.Board(self.player1, self.player2, seed=4) for _ in range(2)]
+        self.assertEqual(games[0].rng.random(), games[1].rng.random())
+        self.assertIs(games[0].copy().rng, games[0].rng)
+
+    def test_symmetries(self):
+        for width, height, count in ((7, 7, 8), (5, 8, 4)):
+            perms = symmetries(width, height)
+            self.assertEqual(len(perms), count)
+            self.assertEqual(perms[0], tuple(range(width * height)))
+            for perm in perms:
+                self.assertEqual(sorted(perm), list(range(width * height)))
+                # Knight moves map to knight moves
+                masks, _ = _board_tables(width, height)
+                for idx, mask in enumerate(masks):
+                    image = sum(1 << perm[i] for i in range(width * height) if mask >> i & 1)
+                    self.assertEqual(image, masks[perm[idx]])
+
+    def test_playout(self):
+        game = isolation.Board(self.player1, self.player2, seed=0)
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        before = (game.to_string(), game.hash(), game.move_count)
+        seen = []
+
+        def policy(cells, blanks, opponent, move_masks, rng):
+            seen.append(cells)
+            return cells[0]
+
+        results = [game.playout(policy) for _ in range(2)] + [game.playout() for _ in range(20)]
+        self.assertEqual((game.to_string(), game.hash(), game.move_count), before)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(set(results), {True, False})
+        self.assertEqual([game._coordinates[idx] for idx in seen[0]], game.get_legal_moves())
+        # The player to move loses at once when it is stuck
+        game = self.play_random_game(5, 5, 0)
+        self.assertFalse(game.playout())
+
+    def test_unknown_player(self):
+        game = isolation.Board(self.player1, self.player2)
+        with self.assertRaises(RuntimeError):
+            game.get_player_location("Player3")
+
+
+if __name__ == '__main__':
+    unittest.main()
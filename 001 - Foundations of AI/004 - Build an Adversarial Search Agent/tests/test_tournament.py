@@ -0,0 +1,111 @@
+"""Unit tests for the parallel tournament runner"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import isolation
+import tournament
+from game_agent import AlphaBetaPlayer, JsonLinesTelemetry
+from sample_players import GreedyPlayer, RandomPlayer
+
+
+class TournamentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu_agents = [tournament.Agent(RandomPlayer(), "Random")]
+        self.test_agents = [tournament.Agent(GreedyPlayer(), "Greedy"), tournament.Agent(RandomPlayer(), "Random")]
+
+    def test_wilson_interval(self):
+        low, high = tournament.wilson_interval(5, 10)
+        self.assertAlmostEqual(low, 0.2366, places=4)
+        self.assertAlmostEqual(high, 0.7634, places=4)
+        self.assertEqual(tournament.wilson_interval(0, 0), (0., 1.))
+        self.assertEqual(tournament.wilson_interval(10, 10)[1], 1.)
+
+    def test_make_games(self):
+        games = tournament.make_games(self.cpu_agents, self.test_agents, 3, seed=1)
+        self.assertEqual(len(games), 3 * 2 * 2)
+        self.assertEqual(len({game.opening for game in games}), 3)
+        self.assertEqual(len({game.seed for game in games}), len(games))
+        for game in games:
+            board = isolation.Board("Player1", "Player2")
+            for move in game.opening:
+                self.assertIn(move, board.get_legal_moves())
+                board.apply_move(move)
+        self.assertEqual(tournament.make_games(self.cpu_agents, self.test_agents, 3, seed=1), games)
+
+        # The games carry their board size to the worker processes
+        games = tournament.make_games(self.cpu_agents, self.test_agents, 3, seed=1, width=9, height=5)
+        self.assertTrue(all((game.width, game.height) == (9, 5) for game in games))
+        results = tournament.run_games(games[:2], self.cpu_agents, self.test_agents, time_limit=1000, workers=1)
+        self.assertEqual(len(results), 2)
+
+    def test_distinct_openings(self):
+        # 49 * 48 openings; the 4 mirror lines hold 7 * 6 of them each
+        self.assertEqual(len(tournament.distinct_openings()), (49 * 48 + 4 * 42) // 8)
+        self.assertEqual(tournament.canonical_opening([(6, 6), (5, 4)]), ((0, 0), (1, 2)))
+        self.assertEqual(len(tournament.distinct_openings(1, 5, 4)), 6)
+        self.assertEqual(len(tournament.choose_openings(None)), 315)
+        self.assertEqual(tournament.choose_openings(10, seed=3), tournament.choose_openings(10, seed=3))
+
+    def test_parallel_tournament(self):
+        for workers in (1, 2):
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                wins = tournament.play_tournament(self.cpu_agents, self.test_agents, 2, time_limit=1000,
+                                                  workers=workers)
+            self.assertEqual(set(wins), {"Greedy", "Random"})
+            self.assertTrue(all(0 <= count <= 4 for count in wins["Greedy"].values()))
+            self.assertIn("95% CI:", output.getvalue())
+
+    def test_seeded_tournament_is_reproducible(self):
+        # Random players draw from the seeded board, whichever process plays the game
+        results = []
+        for workers in (1, 2):
+            with contextlib.redirect_stdout(io.StringIO()):
+                results.append(tournament.play_tournament(self.cpu_agents, self.test_agents, 4, time_limit=1000,
+                                                          workers=workers, seed=5))
+        self.assertEqual(results[0], results[1])
+
+    def test_seeded_serial_tournament_is_reproducible(self):
+        results = []
+        for _ in range(2):
+            with contextlib.redirect_stdout(io.StringIO()):
+                wins = tournament.play_matches(self.cpu_agents, self.test_agents, 4, time_limit=1000, seed=5)
+            results.append([wins[agent.player] for agent in self.test_agents])
+        self.assertEqual(results[0], results[1])
+
+    def test_games_start_from_fresh_players(self):
+        agent = tournament.Agent(AlphaBetaPlayer(), "AB")
+        games = tournament.make_games(self.cpu_agents, [agent], 1, seed=2)
+        tournament.run_games(games, self.cpu_agents, [agent], time_limit=20, workers=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            tournament.play_matches(self.cpu_agents, [agent], 1, time_limit=20, seed=2)
+        # Only copies searched: the agent's own table, killers and history were never touched
+        self.assertEqual((agent.player.table.age, agent.player.killers, agent.player.history), (0, [], ({}, {})))
+        self.assertTrue(all(entry is None for entry in agent.player.table.entries))
+
+    def test_telemetry(self):
+        # Both the parallel and the serial tournaments tie the records to their games
+        for parallel in (True, False):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "telemetry.jsonl")
+                agent = tournament.Agent(AlphaBetaPlayer(telemetry=JsonLinesTelemetry(path, agent="AB")), "AB")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if parallel:
+                        tournament.play_tournament(self.cpu_agents, [agent], 2, time_limit=20, workers=2, seed=1)
+                    else:
+                        tournament.play_matches(self.cpu_agents, [agent], 2, time_limit=20)
+                with open(path) as f:
+                    records = [json.loads(line) for line in f]
+            ends = [record for record in records if "termination" in record]
+            self.assertEqual(len(ends), 4)
+            self.assertEqual(len({record["game"] for record in records}), 4)
+            self.assertTrue(all(record["agent"] == "AB" for record in records))
+            self.assertTrue(all(record["depth"] >= 1 for record in records if record.get("source") == "search"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Unit tests for the heuristic tuning tool"""
+
+import contextlib
+import io
+import pickle
+import random
+import unittest
+
+import isolation
+import game_agent
+import tune
+
+
+class TuneTest(unittest.TestCase):
+
+    def test_weighted_score_defaults(self):
+        score = game_agent.WeightedScore()
+        flat = game_agent.WeightedScore(score.params[:3] + (0., 0., 0.) + score.params[6:])
+        rnd = random.Random(0)
+        for _ in range(50):
+            game = isolation.Board("Player1", "Player2")
+            for _ in range(rnd.randint(2, 30)):
+                if not game.get_legal_moves():
+                    break
+                game.apply_move(rnd.choice(game.get_legal_moves()))
+            for player in ("Player1", "Player2"):
+                self.assertAlmostEqual(score(game, player), game_agent.custom_score_3(game, player), places=1)
+                self.assertAlmostEqual(flat(game, player), game_agent.custom_score_2(game, player))
+        self.assertEqual(pickle.loads(pickle.dumps(score)).params, score.params)
+        with self.assertRaises(ValueError):
+            game_agent.WeightedScore((1., 2.))
+
+    def test_phases_scale_with_the_board(self):
+        # With 80 of 100 cells blank a 10x10 game is in its opening phase, as 40 of 49 blank on 7x7
+        score = game_agent.WeightedScore()
+        for width, height, blanks in ((7, 7, 40), (7, 7, 39), (10, 10, 82), (10, 10, 81)):
+            game = isolation.Board("Player1", "Player2", width, height)
+            rnd = random.Random(0)
+            while len(game.get_blank_spaces()) > blanks:
+                game.apply_move(rnd.choice(game.get_legal_moves()))
+            own, opp, _, _ = game.evaluate("Player1")
+            opening = len(game.get_blank_spaces()) >= game_agent.OPEN_BLANKS * width * height
+            self.assertEqual(opening, blanks in (40, 82))
+            self.assertEqual(game_agent.custom_score_2(game, "Player1"), own - 2 * (.5 if opening else 1.) * opp)
+            self.assertAlmostEqual(score(game, "Player1"), game_agent.custom_score_3(game, "Player1"), places=1)
+
+    def test_clip(self):
+        self.assertEqual(tune.clip([-1., 1., 1., 1., 1., 1., .4, .6]), [0., 1., 1., 1., 1., 1., .4, .4])
+        self.assertEqual(tune.clip([1., 1., 1., 1., 1., 1., 1.2, 1.1]), [1., 1., 1., 1., 1., 1., 1., 1.])
+
+    def test_spsa(self):
+        # The players run out of time at once and play their first legal move, so the games are quick
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            params = tune.spsa(iterations=2, num_matches=1, time_limit=1, workers=1, seed=0, verbose=True)
+        self.assertEqual(len(params), len(game_agent.WeightedScore.PARAMETERS))
+        self.assertEqual(params, tune.clip(params))
+        self.assertEqual(output.getvalue().count("step"), 2)
+        wins, games = tune.win_rate(params, game_agent.WeightedScore.DEFAULTS, 2, time_limit=1, workers=1, seed=0)
+        self.assertEqual(games, 4)
+        self.assertTrue(0 <= wins <= games)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,16 +11,24 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
+import copy
 import itertools
+import math
+import os
 import random
+import time
+import timeit
 import warnings
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 from isolation import Board
+from isolation.isolation import symmetries
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, JsonLinesTelemetry, custom_score,
                         custom_score_2, custom_score_3)
 
 NUM_MATCHES = 5  # number of matches against each opponent
@@ -36,32 +44,74 @@ game_agent.py.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# One game of a parallel tournament: indices into the cpu and test agent
+# lists, the opening moves, whether the test agent moves first, the seed of
+# the board's random number generator and the board size
+Game = namedtuple("Game", ["cpu", "test", "opening", "test_first", "seed", "width", "height"])
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+
+def play_logged(board, game_id, time_limit=TIME_LIMIT, clock=timeit.default_timer):
+    """Play a game to the end with `Board.play`, tying the telemetry of the
+    players to the game.
+
+    The records of every player with a `game_agent.JsonLinesTelemetry` hook
+    are tagged with `game_id`, and the hook gets one more record when the
+    game ends, with its outcome and termination (e.g., timeout or forfeit).
+
+    Returns
+    -------
+    (object, str)
+        The winner and how the game ended.
+    """
+    loggers = [(player, player.telemetry) for player in (board.active_player, board.inactive_player)
+               if isinstance(getattr(player, "telemetry", None), JsonLinesTelemetry)]
+    for _, telemetry in loggers:
+        telemetry.fields["game"] = game_id
+    winner, _, termination = board.play(time_limit=time_limit, clock=clock)
+    for player, telemetry in loggers:
+        telemetry({"move_count": board.move_count, "won": winner == player, "termination": termination})
+    return winner, termination
+
+
+def fresh_players(*players):
+    """Return deep copies of the players, so that a game starts without the
+    state (transposition table, killer moves, search tree) that their
+    previous games left behind. A player given twice is copied once."""
+    memo = {}
+    return [copy.deepcopy(player, memo) for player in players]
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, time_limit=TIME_LIMIT, width=7, height=7,
+               seed=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    Every game is played by fresh copies of the players (see
+    `fresh_players`); with a `seed`, the openings and the boards' random
+    number generators are seeded as in `make_games`, so the round can be
+    replayed.
     """
     timeout_count = 0
     forfeit_count = 0
-    for _ in range(num_matches):
-
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
-
-        # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
+    openings = choose_openings(num_matches, seed, width=width, height=height)
+    for match, opening in enumerate(openings):
+
+        seats = sum([[(cpu_agent.player, agent.player), (agent.player, cpu_agent.player)]
+                     for agent in test_agents], [])
+
+        # play all games from the same opening and tally the results
+        for index, players in enumerate(seats):
+            game_id = "{}-{}-{}".format(cpu_agent.name, match, index)
+            copies = fresh_players(*players)
+            game = Board(*copies, width=width, height=height,
+                         seed=None if seed is None else "{}-{}".format(seed, game_id))
+            for move in opening:
                 game.apply_move(move)
-
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
+            winner, termination = play_logged(game, game_id, time_limit)
+            win_counts[players[copies.index(winner)]] += 1
 
             if termination == "timeout":
                 timeout_count += 1
@@ -77,8 +127,9 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def play_matches(cpu_agents, test_agents, num_matches, time_limit=TIME_LIMIT, width=7, height=7, seed=None):
+    """Play matches between the test agent and each cpu_agent individually,
+    and return the number of wins of each test agent's player. """
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
@@ -93,7 +144,7 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, time_limit, width, height, seed)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -122,9 +173,341 @@ def play_matches(cpu_agents, test_agents, num_matches):
     if total_forfeits:
         print(("\nYour agents forfeited {} games while there were still " +
                "legal moves available to play.\n").format(total_forfeits))
+    return total_wins
+
+
+def wilson_interval(wins, games, z=1.96):
+    """Return the Wilson score interval of a win rate.
+
+    Parameters
+    ----------
+    wins : int
+        The number of games won.
+
+    games : int
+        The number of games played.
+
+    z : float (optional)
+        The standard normal quantile of the confidence level; 1.96 gives a
+        95% interval.
+
+    Returns
+    -------
+    (float, float)
+        The lower and upper bounds of the win rate, (0, 1) if no games were
+        played.
+    """
+    if not games:
+        return 0., 1.
+    rate = wins / games
+    denominator = 1 + z * z / games
+    center = (rate + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return max(0., center - margin), min(1., center + margin)
+
+
+def canonical_opening(opening, width=7, height=7):
+    """Return the representative of an opening's symmetry class: the image
+    of the move sequence, under every symmetry of the board, that sorts
+    first.
+
+    Parameters
+    ----------
+    opening : sequence<(int, int)>
+        The opening moves, as (row, column) pairs.
+
+    width, height : int (optional)
+        The board size.
+
+    Returns
+    -------
+    tuple<(int, int)>
+        The canonical opening; openings that are symmetric images of each
+        other have the same one.
+    """
+    cells = [r + c * height for r, c in opening]
+    return min(tuple((idx % height, idx // height) for idx in (perm[cell] for cell in cells))
+               for perm in symmetries(width, height))
+
+
+def distinct_openings(plies=2, width=7, height=7):
+    """Return every opening of `plies` moves up to board symmetry, sorted.
+
+    There are 2352 two-move openings on the 7x7 board but only 315 up to
+    symmetry: a position and its mirror images are the same game, so playing
+    more than one of them adds no information to a tournament.
+
+    Parameters
+    ----------
+    plies : int (optional)
+        The number of moves in each opening.
+
+    width, height : int (optional)
+        The board size.
+
+    Returns
+    -------
+    list<tuple<(int, int)>>
+        The canonical openings.
+    """
+    openings = set()
+
+    def extend(board, moves):
+        if len(moves) == plies:
+            openings.add(canonical_opening(moves, width, height))
+            return
+        for move in board.get_legal_moves():
+            board.apply_move(move)
+            extend(board, moves + [move])
+            board.undo_move()
 
+    extend(Board("Player1", "Player2", width, height), [])
+    return sorted(openings)
 
-def main():
+
+def choose_openings(num_openings, seed=None, plies=2, width=7, height=7):
+    """Return a reproducible sample of distinct openings.
+
+    Parameters
+    ----------
+    num_openings : int or None
+        The number of openings; None (or more than there are) for all of them.
+
+    seed : int or str (optional)
+        The seed of the sample; None draws a different sample every time.
+
+    plies, width, height : int (optional)
+        As in `distinct_openings`.
+
+    Returns
+    -------
+    list<tuple<(int, int)>>
+        The openings, distinct up to symmetry.
+    """
+    openings = distinct_openings(plies, width, height)
+    if num_openings is None or num_openings >= len(openings):
+        return openings
+    return random.Random(seed).sample(openings, num_openings)
+
+
+def make_games(cpu_agents, test_agents, num_matches, seed=None, width=7, height=7):
+    """Return the games of a tournament, as `Game` tuples.
+
+    Every match plays one opening (a move and a response), distinct up to
+    symmetry from the openings of the other matches, and each test agent
+    plays it against each cpu agent from both seats. Each game gets its own
+    board seed, so with a seed the whole tournament is reproducible: the
+    same openings and the same random choices of the players, whichever
+    process plays which game.
+
+    Parameters
+    ----------
+    cpu_agents, test_agents : list<Agent>
+        The agents of the tournament.
+
+    num_matches : int or None
+        The number of openings played against each cpu agent; None plays
+        every distinct opening.
+
+    seed : int or str (optional)
+        The seed of the tournament; None draws new openings and seeds.
+
+    width, height : int (optional)
+        The board size.
+
+    Returns
+    -------
+    list<Game>
+        The games to play, see `run_games`.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    openings = choose_openings(num_matches, seed, width=width, height=height)
+    games = []
+    for cpu in range(len(cpu_agents)):
+        for opening in openings:
+            for test in range(len(test_agents)):
+                for test_first in (True, False):
+                    games.append(Game(cpu, test, opening, test_first, '{}-{}'.format(seed, len(games)),
+                                      width, height))
+    return games
+
+
+_agents = None
+
+
+def _init_worker(cpu_agents, test_agents):
+    """Receive the agents once per worker process, rather than with every game."""
+    global _agents
+    _agents = cpu_agents, test_agents
+
+
+def play_game(game, time_limit=TIME_LIMIT):
+    """Play one game of a parallel tournament in this process.
+
+    Each turn is timed with `time.process_time`, so the limit counts the
+    time the agent spent computing, however many other games share the
+    machine. The game is played by fresh copies of the players (see
+    `fresh_players`), so its result does not depend on which games this
+    process played before.
+
+    Parameters
+    ----------
+    game : Game
+        The game to play.
+
+    time_limit : numeric (optional)
+        The number of milliseconds allowed for each turn.
+
+    Returns
+    -------
+    (bool, str)
+        Whether the test agent won, and how the game ended (e.g., timeout
+        or forfeit).
+    """
+    cpu_agents, test_agents = _agents
+    cpu_player, test_player = fresh_players(cpu_agents[game.cpu].player, test_agents[game.test].player)
+    if game.test_first:
+        board = Board(test_player, cpu_player, game.width, game.height, seed=game.seed)
+    else:
+        board = Board(cpu_player, test_player, game.width, game.height, seed=game.seed)
+    for move in game.opening:
+        board.apply_move(move)
+    winner, termination = play_logged(board, game.seed, time_limit, clock=time.process_time)
+    return winner == test_player, termination
+
+
+def _play_games(games, time_limit):
+    """Play a chunk of games in a worker process"""
+    return [play_game(game, time_limit) for game in games]
+
+
+def run_games(games, cpu_agents, test_agents, time_limit=TIME_LIMIT, workers=None):
+    """Play the games of a tournament across a pool of worker processes.
+
+    Parameters
+    ----------
+    games : list<Game>
+        The games to play, see `make_games`.
+
+    cpu_agents, test_agents : list<Agent>
+        The agents the games refer to. Every worker gets its own copy.
+
+    time_limit : numeric (optional)
+        The number of milliseconds allowed for each turn.
+
+    workers : int (optional)
+        The number of processes. Defaults to the number of CPUs, since more
+        workers than CPUs would only slow every game down; 1 plays the games
+        in this process.
+
+    Returns
+    -------
+    list<(bool, str)>
+        The result of each game, in the order of `games`, see `play_game`.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(cpu_agents, test_agents)
+        return _play_games(games, time_limit)
+    # Contiguous chunks, a few per worker, so that games of similar length
+    # spread evenly without paying the inter-process overhead per game
+    size = max(1, len(games) // (4 * workers))
+    chunks = [games[i:i + size] for i in range(0, len(games), size)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cpu_agents, test_agents)) as executor:
+        return [result for chunk in executor.map(_play_games, chunks, itertools.repeat(time_limit))
+                for result in chunk]
+
+
+def play_tournament(cpu_agents, test_agents, num_matches, time_limit=TIME_LIMIT, workers=None, seed=None,
+                    width=7, height=7):
+    """Play matches between each test agent and each cpu agent, in parallel,
+    and print the win counts with 95% confidence intervals of the win rates.
+
+    Parameters
+    ----------
+    cpu_agents, test_agents : list<Agent>
+        The agents to compare, as in `play_matches`.
+
+    num_matches : int or None
+        The number of openings played against each cpu agent, None for all
+        distinct openings; every opening is played twice, once from each seat.
+
+    time_limit : numeric (optional)
+        The number of milliseconds allowed for each turn.
+
+    workers : int (optional)
+        The number of processes, see `run_games`.
+
+    seed : int or str (optional)
+        The seed of the openings and of the players' random choices, see
+        `make_games`.
+
+    width, height : int (optional)
+        The board size.
+
+    Returns
+    -------
+    dict
+        The number of wins of each test agent (by name) against each cpu agent
+        (by name), as {test_name: {cpu_name: wins}}.
+    """
+    games = make_games(cpu_agents, test_agents, num_matches, seed, width, height)
+    results = run_games(games, cpu_agents, test_agents, time_limit, workers)
+    num_matches = len(games) // (2 * len(cpu_agents) * len(test_agents))
+
+    wins = {test.name: {cpu.name: 0 for cpu in cpu_agents} for test in test_agents}
+    terminations = {"timeout": 0, "forfeit": 0}
+    for game, (won, termination) in zip(games, results):
+        wins[test_agents[game.test].name][cpu_agents[game.cpu].name] += won
+        if termination in terminations:
+            terminations[termination] += 1
+
+    _total = 2 * num_matches
+    print("\n{:^9}{:^13}".format("Match #", "Opponent") + ''.join(['{:^13}'.format(test.name) for test in test_agents]))
+    print("{:^9}{:^13} ".format("", "") + ' '.join(['{:^5}| {:^5}'.format("Won", "Lost") for _ in test_agents]))
+    for idx, cpu in enumerate(cpu_agents):
+        print("{!s:^9}{:^13} ".format(idx + 1, cpu.name) + ' '.join([
+            '{:^5}| {:^5}'.format(wins[test.name][cpu.name], _total - wins[test.name][cpu.name])
+            for test in test_agents]))
+    print("-" * 74)
+    total_matches = _total * len(cpu_agents)
+    totals = [sum(wins[test.name].values()) for test in test_agents]
+    print('{:^9}{:^13}'.format("", "Win Rate:") +
+          ''.join(['{:^13}'.format("{:.1f}%".format(100 * total / total_matches)) for total in totals]))
+    print('{:^9}{:^13}'.format("", "95% CI:") +
+          ''.join(['{:^13}'.format("{:.0f}-{:.0f}%".format(*(100 * b for b in wilson_interval(total, total_matches))))
+                   for total in totals]))
+
+    if terminations["timeout"]:
+        print(("\nThere were {} timeouts during the tournament -- make sure " +
+               "your agent handles search timeout correctly, and consider " +
+               "increasing the timeout margin for your agent.\n").format(terminations["timeout"]))
+    if terminations["forfeit"]:
+        print(("\nThere were {} games forfeited while there were still " +
+               "legal moves available to play.\n").format(terminations["forfeit"]))
+    return wins
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--matches', type=int, default=NUM_MATCHES,
+                        help='openings played against each opponent (default {})'.format(NUM_MATCHES))
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT,
+                        help='milliseconds per move (default {})'.format(TIME_LIMIT))
+    parser.add_argument('--workers', type=int, nargs='?', const=0,
+                        help='play the games in parallel in this many processes, one per CPU if no number '
+                             'is given; without the flag games are played serially')
+    parser.add_argument('--seed', help='seed of the openings and random players, for a reproducible '
+                                       'tournament')
+    parser.add_argument('--all-openings', action='store_true',
+                        help='in a parallel tournament, play every opening distinct up to symmetry')
+    parser.add_argument('--width', type=int, default=7, help='board columns (default 7)')
+    parser.add_argument('--height', type=int, default=7, help='board rows (default 7)')
+    parser.add_argument('--telemetry', metavar='FILE',
+                        help='append a JSON line per move of every alpha-beta agent to FILE (depth, nodes, '
+                             'nodes/sec, table hit rate, time left) and one per game end')
+    args = parser.parse_args(argv)
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
@@ -146,11 +529,21 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
     ]
 
+    if args.telemetry:
+        for role, agents in (("cpu", cpu_agents), ("test", test_agents)):
+            for agent in agents:
+                if isinstance(agent.player, AlphaBetaPlayer):
+                    agent.player.telemetry = JsonLinesTelemetry(args.telemetry, agent=agent.name, role=role)
+
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if args.workers is None:
+        play_matches(cpu_agents, test_agents, args.matches, args.time_limit, args.width, args.height, args.seed)
+    else:
+        play_tournament(cpu_agents, test_agents, None if args.all_openings else args.matches, args.time_limit,
+                        args.workers, args.seed, args.width, args.height)
 
 
 if __name__ == "__main__":
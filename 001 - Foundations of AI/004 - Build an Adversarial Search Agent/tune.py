@@ -0,0 +1,165 @@
+"""Tune the coefficients of `game_agent.WeightedScore` by self-play.
+
+The search is SPSA (simultaneous perturbation stochastic approximation):
+each iteration perturbs every coefficient at once by a random +/- step,
+plays the two perturbed heuristics against each other in fair matches (see
+tournament.py: distinct openings, each played from both seats) and moves
+the coefficients towards the side that won more games. A match result is
+all the gradient estimate needs, so the cost of an iteration does not grow
+with the number of coefficients.
+
+The games of each iteration run across all cores. The tuned coefficients
+are finally played against the starting ones, and printed with the win rate
+and its 95% confidence interval.
+
+    python tune.py --iterations 50 --matches 20 --time-limit 50
+"""
+import argparse
+import json
+import random
+
+from game_agent import AlphaBetaPlayer, WeightedScore
+from tournament import Agent, make_games, run_games, wilson_interval
+
+# Perturbation size of each parameter for a unit step: the coefficients are
+# multipliers around 1, the phase thresholds fractions of the board (0.06 is
+# 3 cells of the 7x7 board)
+SCALES = (0.25, 0.25, 0.25, 0.5, 0.5, 0.5, 0.06, 0.06)
+
+# Gain sequences of SPSA, a_k = A / (k + 1 + STABILITY) ** ALPHA and
+# c_k = C / (k + 1) ** GAMMA, with the exponents recommended by Spall
+ALPHA, GAMMA = 0.602, 0.101
+STABILITY = 5
+
+
+def clip(params):
+    """Return the parameters moved back into their meaningful range: no
+    negative coefficient, and phase thresholds in decreasing order and at
+    most the whole board."""
+    params = [max(0., value) for value in params]
+    params[6] = min(params[6], 1.)
+    params[7] = min(params[7], params[6])
+    return params
+
+
+def win_rate(test_params, cpu_params, num_matches, time_limit, workers=None, seed=None):
+    """Play two parameter sets against each other in fair matches.
+
+    Parameters
+    ----------
+    test_params, cpu_params : sequence<float>
+        The `WeightedScore` parameters of the two players.
+
+    num_matches : int
+        The number of openings, each played from both seats.
+
+    time_limit : numeric
+        The number of milliseconds allowed for each turn.
+
+    workers : int (optional)
+        The number of processes, see `tournament.run_games`.
+
+    seed : int or str (optional)
+        The seed of the openings and of the games.
+
+    Returns
+    -------
+    (int, int)
+        The number of games won by `test_params`, and the number of games.
+    """
+    test_agents = [Agent(AlphaBetaPlayer(score_fn=WeightedScore(test_params)), "test")]
+    cpu_agents = [Agent(AlphaBetaPlayer(score_fn=WeightedScore(cpu_params)), "cpu")]
+    games = make_games(cpu_agents, test_agents, num_matches, seed)
+    results = run_games(games, cpu_agents, test_agents, time_limit, workers)
+    return sum(won for won, _ in results), len(games)
+
+
+def spsa(start=WeightedScore.DEFAULTS, iterations=50, num_matches=20, time_limit=50, workers=None, seed=None,
+         a=1., c=1., verbose=False):
+    """Search for better `WeightedScore` parameters with SPSA.
+
+    Parameters
+    ----------
+    start : sequence<float> (optional)
+        The initial parameters.
+
+    iterations : int (optional)
+        The number of SPSA steps.
+
+    num_matches : int (optional)
+        The openings played at each step, each from both seats.
+
+    time_limit : numeric (optional)
+        The number of milliseconds allowed for each turn.
+
+    workers : int (optional)
+        The number of processes, see `tournament.run_games`.
+
+    seed : int or str (optional)
+        The seed of the perturbations and of the games.
+
+    a, c : float (optional)
+        The step and perturbation gains, in units of `SCALES`.
+
+    verbose : bool (optional)
+        Print every step.
+
+    Returns
+    -------
+    list<float>
+        The tuned parameters.
+    """
+    rnd = random.Random(seed)
+    params = list(start)
+    for k in range(iterations):
+        a_k = a / (k + 1 + STABILITY) ** ALPHA
+        c_k = c / (k + 1) ** GAMMA
+        delta = [rnd.choice((-1, 1)) for _ in params]
+        plus = clip([p + c_k * s * d for p, s, d in zip(params, SCALES, delta)])
+        minus = clip([p - c_k * s * d for p, s, d in zip(params, SCALES, delta)])
+        wins, games = win_rate(plus, minus, num_matches, time_limit, workers, rnd.getrandbits(64))
+        # (wins - losses) / games estimates f(plus) - f(minus)
+        gradient = (2. * wins - games) / games / (2. * c_k)
+        params = clip([p + a_k * s * gradient * d for p, s, d in zip(params, SCALES, delta)])
+        if verbose:
+            print("step {:>3}: plus won {}/{}, params {}".format(
+                k + 1, wins, games, ", ".join("{:.2f}".format(p) for p in params)))
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the coefficients of custom_score_3 by parallel self-play.")
+    parser.add_argument("--iterations", type=int, default=50, help="SPSA steps (default 50)")
+    parser.add_argument("--matches", type=int, default=20,
+                        help="openings per step, each played from both seats (default 20)")
+    parser.add_argument("--final-matches", type=int, default=100,
+                        help="openings of the final comparison with the starting coefficients (default 100)")
+    parser.add_argument("--time-limit", type=float, default=50, help="milliseconds per move (default 50)")
+    parser.add_argument("--workers", type=int, help="processes (default one per CPU)")
+    parser.add_argument("--step", type=float, default=1., help="SPSA step gain a (default 1)")
+    parser.add_argument("--perturbation", type=float, default=1., help="SPSA perturbation gain c (default 1)")
+    parser.add_argument("--seed", help="seed of the search, for a reproducible run")
+    parser.add_argument("--out", help="write the tuned coefficients to this JSON file")
+    args = parser.parse_args(argv)
+
+    start = WeightedScore.DEFAULTS
+    params = spsa(start, args.iterations, args.matches, args.time_limit, args.workers, args.seed,
+                  args.step, args.perturbation, verbose=True)
+    wins, games = win_rate(params, start, args.final_matches, args.time_limit, args.workers,
+                           None if args.seed is None else "{}-final".format(args.seed))
+    low, high = wilson_interval(wins, games)
+
+    print("\nTuned coefficients:")
+    for name, value in zip(WeightedScore.PARAMETERS, params):
+        print("  {:<16} {:.3f}".format(name, value))
+    print("Win rate against custom_score_3: {:.1f}% ({}/{}), 95% CI: {:.0f}-{:.0f}%".format(
+        100. * wins / games, wins, games, 100 * low, 100 * high))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"params": dict(zip(WeightedScore.PARAMETERS, params)), "wins": wins, "games": games,
+                       "ci95": [low, high]}, f, indent=2)
+    return params
+
+
+if __name__ == "__main__":
+    main()